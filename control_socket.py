@@ -0,0 +1,220 @@
+"""
+Socket Unix de controle do serviço de monitoramento.
+
+O serviço escuta em um socket Unix local e atende comandos em JSON, um por
+linha: {"command": "status"} ou {"command": "wake", "args": {"target": "pc1"}}.
+Cada resposta é uma linha {"ok": true, "result": ...} ou
+{"ok": false, "error": "..."}. Comandos longos (as operações em lote)
+enviam antes da resposta final uma linha {"ok": true, "event": ...} por
+etapa concluída, por exemplo o resultado de cada computador.
+
+A linha de comando usa o socket quando o serviço está em execução, de modo
+que os comandos aproveitam o cadastro, a configuração e as conexões já
+carregados pelo serviço em vez de inicializar tudo de novo.
+"""
+
+import json
+import logging
+import os
+import socket
+
+# Constantes
+CONTROL_SOCKET = "power_monitor.sock"
+CONTROL_TIMEOUT = 5  # segundos para conectar e receber respostas rápidas
+ACTION_TIMEOUT = 120  # segundos aguardando um desligamento ou uma leitura da fonte
+MAX_REQUEST_SIZE = 64 * 1024
+COMMANDS = ("status", "wake", "shutdown", "reload", "probe")
+
+logger = logging.getLogger("PowerMonitor.control")
+
+
+class ControlError(Exception):
+    """Erro retornado pelo serviço ao executar um comando."""
+
+
+class ControlUnavailable(OSError):
+    """O serviço não está em execução ou o socket não está acessível."""
+
+
+def control_supported():
+    """Informa se o sistema suporta sockets Unix."""
+    return hasattr(socket, "AF_UNIX")
+
+
+class ControlServer:
+    """
+    Servidor do socket de controle, executado no loop asyncio do serviço.
+    """
+
+    def __init__(self, path, handlers):
+        """
+        Args:
+            path (str): Caminho do socket.
+            handlers (dict): Comando -> função assíncrona que recebe os argumentos
+            (dict) e retorna um resultado serializável em JSON, ou um gerador
+            assíncrono cujos itens são enviados como eventos.
+        """
+        self.path = path
+        self.handlers = handlers
+        self._server = None
+
+    async def start(self):
+        """Cria o socket (removendo o órfão de uma execução anterior) e começa a escutar."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if os.path.exists(self.path):
+            if is_running(self.path):
+                raise OSError("Outro serviço já escuta em {}".format(self.path))
+            os.remove(self.path)
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.path, limit=MAX_REQUEST_SIZE
+        )
+        # Apenas o usuário do serviço pode enviar comandos
+        os.chmod(self.path, 0o600)
+        logger.info("Socket de controle em %s.", self.path)
+
+    async def close(self):
+        """Para de escutar e remove o socket."""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    async def _handle_connection(self, reader, writer):
+        """Atende as requisições de uma conexão, uma por linha, até o cliente desconectar."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                async for response in self._dispatch(line):
+                    writer.write(json.dumps(response, default=str).encode('utf-8') + b"\n")
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Conexão de controle encerrada: %s", e)
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line):
+        """Executa uma requisição, produzindo os eventos e a resposta final."""
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            args = request.get("args") or {}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            yield {"ok": False, "error": "Requisição inválida"}
+            return
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            yield {"ok": False, "error": "Comando desconhecido: {}".format(command)}
+            return
+
+        try:
+            result = await handler(args)
+            if hasattr(result, "__aiter__"):
+                async for event in result:
+                    yield {"ok": True, "event": event}
+                result = None
+            yield {"ok": True, "result": result}
+        except (ControlError, KeyError, ValueError) as e:
+            yield {"ok": False, "error": str(e)}
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Erro no comando de controle %s: %s", command, e)
+            yield {"ok": False, "error": str(e)}
+
+
+def iter_command(command, path=CONTROL_SOCKET, timeout=CONTROL_TIMEOUT, **args):
+    """
+    Envia um comando ao serviço, produzindo os eventos à medida que chegam.
+
+    A conexão só é aberta na primeira iteração. O resultado final do comando
+    é o valor de retorno do gerador (StopIteration.value).
+
+    Args:
+        command (str): Comando (status, wake, shutdown, reload ou probe).
+        path (str): Caminho do socket.
+        timeout (float): Tempo limite de conexão e de cada resposta (em segundos).
+        **args: Argumentos do comando.
+
+    Yields:
+        Eventos enviados pelo serviço antes da resposta final.
+
+    Raises:
+        ControlUnavailable: Se o serviço não estiver em execução.
+        ControlError: Se o serviço retornar um erro.
+    """
+    if not control_supported():
+        raise ControlUnavailable("Sockets Unix não são suportados neste sistema")
+
+    # pylint: disable-next=no-member
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise ControlUnavailable(str(e)) from e
+
+        request = {"command": command, "args": args}
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        with sock.makefile('rb') as reader:
+            while True:
+                line = reader.readline(MAX_REQUEST_SIZE)
+                if not line:
+                    raise ControlUnavailable("O serviço encerrou a conexão")
+                response = json.loads(line)
+                if not response.get("ok"):
+                    raise ControlError(response.get("error", "Erro desconhecido"))
+                if "event" not in response:
+                    return response.get("result")
+                yield response["event"]
+
+
+def send_command(command, path=CONTROL_SOCKET, timeout=CONTROL_TIMEOUT, **args):
+    """
+    Envia um comando ao serviço e aguarda a resposta final, ignorando os eventos.
+
+    Args:
+        command (str): Comando (status, wake, shutdown, reload ou probe).
+        path (str): Caminho do socket.
+        timeout (float): Tempo limite de conexão e de cada resposta (em segundos).
+        **args: Argumentos do comando.
+
+    Returns:
+        Resultado do comando.
+
+    Raises:
+        ControlUnavailable: Se o serviço não estiver em execução.
+        ControlError: Se o serviço retornar um erro.
+    """
+    responses = iter_command(command, path, timeout, **args)
+    while True:
+        try:
+            next(responses)
+        except StopIteration as done:
+            return done.value
+
+
+def is_running(path=CONTROL_SOCKET):
+    """
+    Informa se há um serviço atendendo no socket de controle.
+
+    Args:
+        path (str): Caminho do socket.
+
+    Returns:
+        bool: True se o serviço respondeu ao comando status.
+    """
+    if not control_supported() or not os.path.exists(path):
+        return False
+    try:
+        send_command("status", path, timeout=1)
+        return True
+    except (ControlUnavailable, ControlError, OSError, ValueError):
+        return False
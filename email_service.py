@@ -1,27 +1,32 @@
 """
 Modulo para envio de notificacoes por email usando SMTP.
 Suporta mensagens HTML formatadas com templates Jinja2.
+
+O Jinja2 e a pilha SMTP sao importados apenas no primeiro envio, e o
+template padrao e criado no primeiro uso (ou por warm_templates()), para
+que importar este modulo nao tenha custo nem efeitos colaterais.
 """
 
 import datetime
 import json
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-
-from jinja2 import Environment, FileSystemLoader
 
 # Constantes
 EMAIL_CONFIG_FILE = "email_config.json"
 TEMPLATES_DIR = "templates"
 GENERATED_HTML = "notification.html"
+TEMPLATE_CACHE_DIR = os.path.join(TEMPLATES_DIR, ".cache")
 # URL corrigido para acesso direto à imagem raw do GitHub
 LOGO_URL = "https://raw.githubusercontent.com/elielprado/wol_automation/main/assets/wol_logo.png"
-
-# Verificar se a pasta de templates existe, senao criar
-if not os.path.exists(TEMPLATES_DIR):
-    os.makedirs(TEMPLATES_DIR)
+DEFAULT_SMTP_TIMEOUT = 10  # segundos
+DEFAULT_NOTIFICATION_EVENTS = {
+    "power_disconnected": True,
+    "power_restored": True,
+    "shutdown_initiated": True,
+    "poweron_initiated": True,
+    "low_battery": True,
+    "shutdown_aborted": True,
+}
 
 
 def load_email_config():
@@ -30,17 +35,15 @@ def load_email_config():
         "enabled": False,
         "smtp_server": "smtp.gmail.com",
         "smtp_port": 587,
+        "smtp_starttls": True,
+        "smtp_timeout": DEFAULT_SMTP_TIMEOUT,  # segundos para conectar e para cada comando
+        # Servidores alternativos, com as mesmas chaves (smtp_server, smtp_port, ...)
+        "fallback_servers": [],
         "username": "",
         "password": "",
         "from_address": "",
         "recipients": [],
-        "notification_events": {
-            "power_disconnected": True,
-            "power_restored": True,
-            "shutdown_initiated": True,
-            "poweron_initiated": True,
-            "low_battery": True,
-        },
+        "notification_events": dict(DEFAULT_NOTIFICATION_EVENTS),
     }
 
     if os.path.exists(EMAIL_CONFIG_FILE):
@@ -69,8 +72,173 @@ def load_email_config():
 
 def save_email_config(config):
     """Salva a configuracao de email no arquivo JSON."""
+    global _email_config  # pylint: disable=global-statement
     with open(EMAIL_CONFIG_FILE, 'w', encoding='utf-8') as f:
         json.dump(config, f, indent=4)
+    # A proxima leitura usa o arquivo recem-gravado
+    _email_config = None
+
+
+def validate_email_config(config):
+    """
+    Normaliza os tipos da configuracao de email, corrigindo valores invalidos.
+
+    Args:
+        config (dict): Configuracao lida do arquivo
+
+    Returns:
+        dict: Configuracao validada
+    """
+    config["enabled"] = bool(config["enabled"])
+
+    try:
+        config["smtp_port"] = int(config["smtp_port"])
+    except (TypeError, ValueError):
+        print("Porta SMTP invalida: {}. Usando 587.".format(config["smtp_port"]))
+        config["smtp_port"] = 587
+
+    recipients = config["recipients"]
+    if isinstance(recipients, str):
+        recipients = recipients.split(",")
+    config["recipients"] = [str(r).strip() for r in recipients or [] if str(r).strip()]
+
+    if not isinstance(config["fallback_servers"], list):
+        print("fallback_servers invalido. Usando apenas o servidor principal.")
+        config["fallback_servers"] = []
+    config["fallback_servers"] = [
+        server for server in config["fallback_servers"] if isinstance(server, dict)
+    ]
+
+    if not isinstance(config["notification_events"], dict):
+        print("notification_events invalido. Usando os eventos padrao.")
+        config["notification_events"] = dict(DEFAULT_NOTIFICATION_EVENTS)
+    return config
+
+
+def _file_signature(path):
+    """Retorna (mtime, tamanho) do arquivo, ou None se ele nao existir."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Configuracao de email validada mantida em memoria e a assinatura do arquivo lido
+_email_config = None
+_email_config_signature = None
+
+
+def get_email_config():
+    """
+    Retorna a configuracao de email validada, relendo o arquivo apenas se ele mudou.
+
+    Returns:
+        dict: Configuracao de email (nao deve ser alterada pelo chamador)
+    """
+    global _email_config, _email_config_signature  # pylint: disable=global-statement
+    signature = _file_signature(EMAIL_CONFIG_FILE)
+    if _email_config is not None and signature == _email_config_signature:
+        return _email_config
+
+    _email_config = validate_email_config(load_email_config())
+    # Lida depois da carga, que cria o arquivo se ele nao existir
+    _email_config_signature = _file_signature(EMAIL_CONFIG_FILE)
+    return _email_config
+
+
+# Ambiente Jinja2 compartilhado e controle do template padrao
+_environment = None
+_default_template_checked = False
+
+
+def get_template_environment():
+    """
+    Retorna o ambiente Jinja2 compartilhado, criando-o na primeira chamada.
+
+    Os templates compilados ficam em cache na memoria (recompilados apenas
+    quando o arquivo muda) e em disco, em TEMPLATE_CACHE_DIR, para que um
+    novo processo nao precise compilar o template de novo.
+
+    Returns:
+        Environment: Ambiente Jinja2
+    """
+    global _environment  # pylint: disable=global-statement
+    if _environment is None:
+        # pylint: disable-next=import-outside-toplevel
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        try:
+            os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+        except OSError as e:
+            print("Cache de templates em disco desabilitado: {}".format(e))
+            bytecode_cache = None
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            auto_reload=True,
+            bytecode_cache=bytecode_cache,
+        )
+    return _environment
+
+
+# Sessao SMTP compartilhada e a configuracao usada para cria-la
+_smtp_manager = None
+_smtp_manager_config = None
+
+
+def get_smtp_relays(config):
+    """
+    Monta a lista de servidores SMTP em ordem de preferencia.
+
+    Os servidores alternativos herdam do principal as chaves que nao definirem.
+
+    Args:
+        config (dict): Configuracao de email
+
+    Returns:
+        list: Servidores no formato do SMTPConnectionManager
+    """
+    primary = {
+        "host": config["smtp_server"],
+        "port": config["smtp_port"],
+        "username": config["username"],
+        "password": config["password"],
+        "starttls": config["smtp_starttls"],
+    }
+    relays = [primary]
+    for server in config["fallback_servers"]:
+        relays.append(
+            {
+                "host": server.get("smtp_server", primary["host"]),
+                "port": int(server.get("smtp_port", primary["port"])),
+                "username": server.get("username", primary["username"]),
+                "password": server.get("password", primary["password"]),
+                "starttls": server.get("smtp_starttls", primary["starttls"]),
+            }
+        )
+    return relays
+
+
+def get_smtp_manager(config):
+    """
+    Retorna a sessao SMTP compartilhada, recriando-a se a configuracao mudou.
+
+    Args:
+        config (dict): Configuracao de email validada
+
+    Returns:
+        SMTPConnectionManager: Sessao reutilizavel
+    """
+    global _smtp_manager, _smtp_manager_config  # pylint: disable=global-statement
+    if _smtp_manager is None or config is not _smtp_manager_config:
+        from smtp_pool import SMTPConnectionManager  # pylint: disable=import-outside-toplevel
+
+        if _smtp_manager is not None:
+            _smtp_manager.close()
+        _smtp_manager = SMTPConnectionManager(get_smtp_relays(config), config["smtp_timeout"])
+        _smtp_manager_config = config
+    return _smtp_manager
 
 
 def render_template(template_name, context):
@@ -84,13 +252,35 @@ def render_template(template_name, context):
     Returns:
         str: HTML renderizado
     """
-    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
-    template = env.get_template(template_name)
+    template = get_template_environment().get_template(template_name)
     return template.render(**context)
 
 
+def warm_templates():
+    """
+    Cria o template padrao, se necessario, e o compila antecipadamente.
+
+    Chamado no inicio do servico, para que a primeira notificacao de uma
+    queda de energia nao pague pela compilacao do template.
+    """
+    create_default_template()
+    try:
+        get_template_environment().get_template(GENERATED_HTML)
+    except Exception as e:  # pylint: disable=broad-except
+        print("Erro ao compilar o template de email: {}".format(e))
+
+
 def create_default_template():
-    """Cria um template padrao se nao existir."""
+    """Cria um template padrao se nao existir (verificado uma vez por processo)."""
+    global _default_template_checked  # pylint: disable=global-statement
+    if _default_template_checked:
+        return
+    _default_template_checked = True
+
+    # Verificar se a pasta de templates existe, senao criar
+    if not os.path.exists(TEMPLATES_DIR):
+        os.makedirs(TEMPLATES_DIR)
+
     template_path = os.path.join(TEMPLATES_DIR, GENERATED_HTML)
     if not os.path.exists(template_path):
         with open(template_path, 'w', encoding='utf-8') as f:
@@ -251,7 +441,7 @@ def send_email(subject, template_name, context):
     Returns:
         bool: True se o email foi enviado com sucesso, False caso contrario
     """
-    config = load_email_config()
+    config = get_email_config()
 
     # Verifica se o envio de emails esta habilitado
     if not config["enabled"]:
@@ -284,6 +474,9 @@ def send_email(subject, template_name, context):
         print("Erro ao renderizar o template de email: {}".format(e))
         return False
 
+    from email.mime.multipart import MIMEMultipart  # pylint: disable=import-outside-toplevel
+    from email.mime.text import MIMEText  # pylint: disable=import-outside-toplevel
+
     # Configura a mensagem
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
@@ -296,12 +489,9 @@ def send_email(subject, template_name, context):
 
     # Tenta enviar o email
     try:
-        server = smtplib.SMTP(config["smtp_server"], config["smtp_port"])
-        server.ehlo()
-        server.starttls()
-        server.login(config["username"], config["password"])
-        server.sendmail(config["from_address"], config["recipients"], msg.as_string())
-        server.close()
+        get_smtp_manager(config).send(
+            config["from_address"], config["recipients"], msg.as_string()
+        )
         print("Email enviado com sucesso para: {}".format(", ".join(config["recipients"])))
         return True
     except Exception as e:  # pylint: disable=broad-except
@@ -309,6 +499,24 @@ def send_email(subject, template_name, context):
         return False
 
 
+def is_notification_enabled(event_type):
+    """
+    Verifica se uma notificacao para o evento seria enviada.
+
+    Args:
+        event_type (str): Tipo de evento
+
+    Returns:
+        bool: True se o envio esta habilitado, ha destinatarios e o evento esta habilitado
+    """
+    config = get_email_config()
+    return bool(
+        config["enabled"]
+        and config["recipients"]
+        and config["notification_events"].get(event_type)
+    )
+
+
 def send_notification(event_type, message, extra_context=None):
     """
     Envia uma notificacao por email para um evento especifico.
@@ -321,7 +529,7 @@ def send_notification(event_type, message, extra_context=None):
     Returns:
         bool: True se a notificacao foi enviada, False caso contrario
     """
-    config = load_email_config()
+    config = get_email_config()
 
     # Verifica se o evento esta habilitado para notificacao
     if (
@@ -338,6 +546,7 @@ def send_notification(event_type, message, extra_context=None):
         "shutdown_initiated": "Alerta: Desligamento Iniciado",
         "poweron_initiated": "Informação: Inicialização Remota",
         "low_battery": "Alerta Crítico: Bateria Fraca",
+        "shutdown_aborted": "Informação: Desligamento Interrompido",
     }
 
     title = event_titles.get(event_type, "Notificação do Sistema")
@@ -389,7 +598,3 @@ def test_email_config():
     create_default_template()
 
     return send_email("WoL Automation - Teste de Email", GENERATED_HTML, context)
-
-
-# Garante que o template padrao seja criado quando o modulo e importado
-create_default_template()
@@ -0,0 +1,330 @@
+"""
+Registro consultável de quedas de energia e das ações executadas.
+
+Os eventos (início e fim de quedas, gatilhos de desligamento, religamento)
+e o resultado de cada ação por computador (desligamento ou Wake-on-LAN,
+com a duração) são gravados apenas por inserção em um banco SQLite
+indexado, permitindo relatórios como o p95 da latência de desligamento
+por computador.
+"""
+
+import argparse
+import datetime
+import sqlite3
+import threading
+import time
+
+# Constantes
+JOURNAL_FILE = "power_journal.db"
+DEFAULT_REPORT_DAYS = 90
+DEFAULT_PERCENTILE = 95
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    outage_id INTEGER,
+    timestamp REAL NOT NULL,
+    kind TEXT NOT NULL,
+    detail TEXT,
+    battery_percent INTEGER
+);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_outage ON events (outage_id, kind);
+
+CREATE TABLE IF NOT EXISTS host_actions (
+    id INTEGER PRIMARY KEY,
+    outage_id INTEGER,
+    timestamp REAL NOT NULL,
+    host TEXT NOT NULL,
+    action TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    duration REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS host_actions_host ON host_actions (action, host, timestamp);
+CREATE INDEX IF NOT EXISTS host_actions_timestamp ON host_actions (timestamp);
+"""
+
+
+def percentile(values, rank):
+    """
+    Calcula um percentil pelo método do posto mais próximo.
+
+    Args:
+        values (list): Valores já ordenados.
+        rank (float): Percentil desejado (0-100).
+
+    Returns:
+        float: Valor do percentil, ou None se a lista estiver vazia.
+    """
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(-(-rank * len(values) // 100)) - 1))
+    return values[index]
+
+
+class EventJournal:
+    """
+    Banco de eventos de energia, apenas com inserções.
+
+    Pode ser usado por várias threads: um lock serializa as gravações.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        """
+        Args:
+            path (str): Caminho do banco SQLite (criado se não existir).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """Fecha o banco."""
+        with self._lock:
+            self._connection.close()
+
+    def _insert(self, sql, params):
+        """Executa uma inserção em uma transação e retorna o id gerado."""
+        with self._lock, self._connection:
+            return self._connection.execute(sql, params).lastrowid
+
+    def record_event(  # pylint: disable=too-many-arguments
+        self, kind, outage_id=None, detail=None, battery_percent=None, timestamp=None
+    ):
+        """
+        Registra um evento.
+
+        Args:
+            kind (str): Tipo do evento (outage_start, shutdown_trigger, power_restored...).
+            outage_id (int, optional): Id do evento que iniciou a queda.
+            detail (str, optional): Informação adicional (por exemplo, o gatilho).
+            battery_percent (int, optional): Porcentagem da bateria no momento.
+            timestamp (float, optional): Momento do evento (padrão: agora).
+
+        Returns:
+            int: Id do evento.
+        """
+        return self._insert(
+            "INSERT INTO events (outage_id, timestamp, kind, detail, battery_percent)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                outage_id,
+                timestamp if timestamp is not None else time.time(),
+                kind,
+                detail,
+                battery_percent,
+            ),
+        )
+
+    def start_outage(self, battery_percent=None, timestamp=None):
+        """
+        Registra o início de uma queda de energia.
+
+        O id da queda é o próprio id deste evento (que fica com outage_id nulo).
+
+        Returns:
+            int: Id da queda, usado nos eventos e ações seguintes.
+        """
+        return self.record_event(
+            "outage_start", battery_percent=battery_percent, timestamp=timestamp
+        )
+
+    def record_host_action(  # pylint: disable=too-many-arguments
+        self, host, action, success, duration=None, error=None, outage_id=None
+    ):
+        """
+        Registra o resultado de uma ação em um computador.
+
+        Args:
+            host (str): Nome do computador.
+            action (str): "shutdown" ou "wake".
+            success (bool): Se a ação foi bem-sucedida.
+            duration (float, optional): Duração da ação (em segundos).
+            error (str, optional): Mensagem de erro.
+            outage_id (int, optional): Id da queda relacionada.
+
+        Returns:
+            int: Id do registro.
+        """
+        return self._insert(
+            "INSERT INTO host_actions"
+            " (outage_id, timestamp, host, action, success, duration, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (outage_id, time.time(), host, action, int(bool(success)), duration, error),
+        )
+
+    def host_latency_report(self, action="shutdown", days=DEFAULT_REPORT_DAYS, rank=None):
+        """
+        Calcula estatísticas de duração das ações por computador.
+
+        Args:
+            action (str): "shutdown" ou "wake".
+            days (float): Período analisado (em dias).
+            rank (float, optional): Percentil (padrão: 95).
+
+        Returns:
+            list: Dicionários com host, count (ações), failures, p50, pN e max,
+            ordenados do computador mais lento para o mais rápido. As durações
+            consideram apenas as ações bem-sucedidas: uma falha por tempo limite
+            mediria o timeout, não o computador.
+        """
+        rank = DEFAULT_PERCENTILE if rank is None else rank
+        since = time.time() - days * 86400
+
+        durations = {}
+        counts = {}
+        failures = {}
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT host, success, duration FROM host_actions"
+                " WHERE action = ? AND timestamp >= ? ORDER BY host, duration",
+                (action, since),
+            ).fetchall()
+
+        for host, success, duration in rows:
+            durations.setdefault(host, [])
+            counts[host] = counts.get(host, 0) + 1
+            failures.setdefault(host, 0)
+            if not success:
+                failures[host] += 1
+            elif duration is not None:
+                durations[host].append(duration)
+
+        report = []
+        for host, values in durations.items():
+            report.append(
+                {
+                    "host": host,
+                    "count": counts[host],
+                    "failures": failures[host],
+                    "p50": percentile(values, 50),
+                    "p{}".format(int(rank)): percentile(values, rank),
+                    "max": values[-1] if values else None,
+                }
+            )
+        report.sort(key=lambda row: row["p{}".format(int(rank))] or 0, reverse=True)
+        return report
+
+    def outage_report(self, days=DEFAULT_REPORT_DAYS):
+        """
+        Lista as quedas de energia do período com os eventos de cada uma.
+
+        Args:
+            days (float): Período analisado (em dias).
+
+        Returns:
+            list: Dicionários com id, start, end, duration (s) e events.
+        """
+        since = time.time() - days * 86400
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT COALESCE(outage_id, id) AS outage, timestamp, kind, detail FROM events"
+                " WHERE COALESCE(outage_id, id) IN (SELECT id FROM events"
+                " WHERE kind = 'outage_start' AND timestamp >= ?)"
+                " ORDER BY outage, timestamp",
+                (since,),
+            ).fetchall()
+
+        outages = {}
+        for outage_id, timestamp, kind, detail in rows:
+            outage = outages.setdefault(
+                outage_id, {"id": outage_id, "start": None, "end": None, "events": []}
+            )
+            if kind == "outage_start":
+                outage["start"] = timestamp
+            elif kind == "outage_end":
+                outage["end"] = timestamp
+            else:
+                outage["events"].append((timestamp, kind, detail))
+
+        for outage in outages.values():
+            outage["duration"] = (
+                outage["end"] - outage["start"] if outage["end"] and outage["start"] else None
+            )
+        return list(outages.values())
+
+
+def format_seconds(value):
+    """Formata uma duração em segundos para exibição."""
+    return "-" if value is None else "{:.1f} s".format(value)
+
+
+def print_latency_report(journal, action, days, rank):
+    """Exibe o relatório de latência por computador."""
+    report = journal.host_latency_report(action, days, rank)
+    if not report:
+        print("Nenhuma ação '{}' registrada nos últimos {} dias.".format(action, days))
+        return
+
+    key = "p{}".format(int(rank))
+    print(
+        "{:<24} {:>6} {:>7} {:>10} {:>10} {:>10}".format(
+            "Computador", "Ações", "Falhas", "p50", key, "máx"
+        )
+    )
+    for row in report:
+        print(
+            "{:<24} {:>6} {:>7} {:>10} {:>10} {:>10}".format(
+                row["host"],
+                row["count"],
+                row["failures"],
+                format_seconds(row["p50"]),
+                format_seconds(row[key]),
+                format_seconds(row["max"]),
+            )
+        )
+
+
+def print_outage_report(journal, days):
+    """Exibe as quedas de energia do período."""
+    outages = journal.outage_report(days)
+    if not outages:
+        print("Nenhuma queda de energia registrada nos últimos {} dias.".format(days))
+        return
+
+    for outage in outages:
+        start = datetime.datetime.fromtimestamp(outage["start"])
+        print(
+            "Queda #{} em {} - duração: {}".format(
+                outage["id"],
+                start.strftime("%d/%m/%Y %H:%M:%S"),
+                format_seconds(outage["duration"]) if outage["end"] else "em andamento",
+            )
+        )
+        for timestamp, kind, detail in outage["events"]:
+            print(
+                "   +{:>8.1f} s  {}{}".format(
+                    timestamp - outage["start"], kind, " ({})".format(detail) if detail else ""
+                )
+            )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Relatórios do histórico de quedas de energia.')
+    parser.add_argument('--file', default=JOURNAL_FILE, help='Banco de eventos')
+    subparsers = parser.add_subparsers(dest='report', help='Relatórios disponíveis')
+
+    latency_parser = subparsers.add_parser('latency', help='Latência das ações por computador')
+    latency_parser.add_argument('--action', choices=['shutdown', 'wake'], default='shutdown')
+    latency_parser.add_argument('--days', type=float, default=DEFAULT_REPORT_DAYS)
+    latency_parser.add_argument('--percentile', type=float, default=DEFAULT_PERCENTILE)
+
+    outages_parser = subparsers.add_parser('outages', help='Quedas de energia e eventos')
+    outages_parser.add_argument('--days', type=float, default=DEFAULT_REPORT_DAYS)
+
+    args = parser.parse_args()
+    journal = EventJournal(args.file)
+
+    if args.report == 'latency':
+        print_latency_report(journal, args.action, args.days, args.percentile)
+    elif args.report == 'outages':
+        print_outage_report(journal, args.days)
+    else:
+        parser.print_help()
+
+    journal.close()
@@ -0,0 +1,253 @@
+"""
+Resultados por computador das operações em lote (ligar e desligar).
+
+As operações em lote são geradores: cada computador produz um HostResult
+assim que termina (com o status, o erro e a duração de cada etapa), de
+modo que quem chama pode reagir a uma falha imediatamente, sem esperar o
+computador mais lento. Com max_workers > 1, os computadores são
+processados ao mesmo tempo e os resultados chegam na ordem de conclusão.
+"""
+
+import collections
+import contextlib
+import datetime
+import json
+import logging
+import sys
+import time
+
+# Constantes
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"  # não executado: a operação foi interrompida antes
+
+logger = logging.getLogger("PowerMonitor.fleet")
+
+# Funções chamadas com cada HostResult produzido (por exemplo, as métricas do serviço)
+_listeners = []
+
+HostResult = collections.namedtuple(
+    "HostResult", ["host", "action", "status", "error", "duration", "phases", "finished"]
+)
+HostResult.__doc__ = """
+Resultado de uma ação em um computador.
+
+Attributes:
+    host (str): Nome do computador.
+    action (str): "shutdown" ou "wake".
+    status (str): OK, FAILED ou SKIPPED.
+    error (str): Descrição da falha, ou None.
+    duration (float): Duração total (em segundos).
+    phases (dict): Etapa (por exemplo, "connect", "command") -> duração em segundos.
+    finished (datetime.datetime): Momento da conclusão.
+"""
+
+
+def add_result_listener(listener):
+    """
+    Registra uma função chamada com cada HostResult, de qualquer operação em lote.
+
+    Args:
+        listener (callable): Função (HostResult). Pode ser chamada de várias threads.
+    """
+    _listeners.append(listener)
+
+
+def remove_result_listener(listener):
+    """Remove uma função registrada por add_result_listener()."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify_listeners(result):
+    for listener in list(_listeners):
+        try:
+            listener(result)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Erro ao repassar o resultado de %s: %s", result.host, e)
+    return result
+
+
+class HostReport:
+    """Coleta a duração de cada etapa e o erro de uma ação em um computador."""
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self.error = None
+        self._last = time.monotonic()
+
+    def lap(self, name):
+        """Encerra uma etapa: registra o tempo desde o fim da etapa anterior (ou do início)."""
+        now = time.monotonic()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def fail(self, error):
+        """Registra a descrição da falha (a primeira é mantida)."""
+        if self.error is None:
+            self.error = str(error)
+
+
+def iter_results(action, computers, run_host, max_workers=1, on_start=None, should_abort=None):
+    """
+    Executa uma ação em vários computadores, produzindo o resultado de cada um ao terminar.
+
+    Args:
+        action (str): "shutdown" ou "wake".
+        computers (list): Computadores a processar.
+        run_host (callable): Função (computador, HostReport) que executa a ação e
+        retorna True em caso de sucesso.
+        max_workers (int): Computadores processados ao mesmo tempo. Com 1, a ação
+        é executada na própria thread de quem consome o gerador, em ordem.
+        on_start (callable, optional): Chamada com o computador antes da ação
+        (com max_workers > 1, a partir de várias threads).
+        should_abort (callable, optional): Consultada antes de cada computador;
+        depois que retornar True, os restantes são marcados como SKIPPED.
+
+    Yields:
+        HostResult: Resultado de cada computador, na ordem de conclusão.
+    """
+    aborted = []
+
+    def run(comp):
+        if aborted or (should_abort is not None and should_abort()):
+            aborted.append(True)
+            now = datetime.datetime.now()
+            return _notify_listeners(
+                HostResult(comp["name"], action, SKIPPED, None, 0.0, {}, now)
+            )
+
+        if on_start is not None:
+            on_start(comp)
+
+        report = HostReport()
+        started = time.monotonic()
+        try:
+            success = run_host(comp, report)
+        except Exception as e:  # pylint: disable=broad-except
+            report.fail(e)
+            success = False
+        if not success and report.error is None:
+            report.error = "Falha sem detalhes (veja o log)"
+        return _notify_listeners(
+            HostResult(
+                comp["name"],
+                action,
+                OK if success else FAILED,
+                None if success else report.error,
+                round(time.monotonic() - started, 3),
+                {name: round(duration, 3) for name, duration in report.phases.items()},
+                datetime.datetime.now(),
+            )
+        )
+
+    if max_workers <= 1 or len(computers) <= 1:
+        for comp in computers:
+            yield run(comp)
+        return
+
+    # Carregado só quando há paralelismo: o import de main.py não paga por concurrent.futures
+    # pylint: disable-next=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    executor = ThreadPoolExecutor(min(max_workers, len(computers)), thread_name_prefix=action)
+    futures = [executor.submit(run, comp) for comp in computers]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Se o consumidor parar antes do fim, os computadores ainda não iniciados são cancelados
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def aiter_results(results, executor=None):
+    """
+    Percorre um gerador de resultados a partir de um loop asyncio, sem bloqueá-lo.
+
+    Args:
+        results (iterator): Gerador retornado por iter_results() (ou iter_shutdown/iter_wake).
+        executor (Executor, optional): Onde o gerador é executado (padrão: o do loop).
+
+    Yields:
+        HostResult: Resultado de cada computador, na ordem de conclusão.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    done = object()
+    try:
+        while True:
+            result = await loop.run_in_executor(executor, next, results, done)
+            if result is done:
+                return
+            yield result
+    finally:
+        results.close()
+
+
+def result_to_dict(result):
+    """Converte um HostResult em um dicionário serializável em JSON."""
+    data = result._asdict()
+    data["finished"] = result.finished.isoformat()
+    return data
+
+
+def result_from_dict(data):
+    """Reconstrói um HostResult convertido por result_to_dict()."""
+    data = dict(data)
+    data["finished"] = datetime.datetime.fromisoformat(data["finished"])
+    return HostResult(**data)
+
+
+def print_results(results, total, summary, json_lines=False):
+    """
+    Exibe o resultado de cada computador à medida que as ações terminam.
+
+    Args:
+        results (iterator): Resultados (HostResult) da operação.
+        total (int): Número de computadores da operação.
+        summary (str): Formato do resumo final, com o número de sucessos e o total
+        (por exemplo, "{} de {} computadores foram ligados com sucesso.").
+        json_lines (bool): Exibe um objeto JSON por linha, sem o resumo. As
+        mensagens das funções de ligar/desligar vão para a saída de erro.
+
+    Returns:
+        int: Número de computadores com sucesso.
+    """
+    out = sys.stdout
+    success_count = 0
+    redirect = contextlib.redirect_stdout(sys.stderr) if json_lines else contextlib.nullcontext()
+
+    with redirect:
+        for position, result in enumerate(results, 1):
+            if result.status == OK:
+                success_count += 1
+
+            if json_lines:
+                out.write(json.dumps(result_to_dict(result), ensure_ascii=False) + "\n")
+                out.flush()
+                continue
+
+            phases = ", ".join(
+                "{} {:.1f} s".format(name, duration) for name, duration in result.phases.items()
+            )
+            if result.status == OK:
+                outcome = "ok em {:.1f} s".format(result.duration)
+            elif result.status == SKIPPED:
+                outcome = "não executado (operação interrompida)"
+            else:
+                outcome = "falhou: {}".format(result.error)
+            print(
+                "[{}/{}] {}: {}{}".format(
+                    position, total, result.host, outcome, " ({})".format(phases) if phases else ""
+                ),
+                file=out,
+                flush=True,
+            )
+
+    if not json_lines:
+        print("\n" + summary.format(success_count, total))
+    return success_count
@@ -0,0 +1,586 @@
+"""
+API HTTP/JSON local para operar os computadores sem iniciar um processo por comando.
+
+O servidor roda em um loop asyncio e atende várias conexões ao mesmo tempo
+(com keep-alive). As operações em lote (ligar e desligar) viram jobs:
+executados em segundo plano com as funções de remote_poweron e
+remote_shutdown, no máximo max_jobs ao mesmo tempo, e acompanhados em
+tempo real por um fluxo de eventos em JSON, um por linha.
+
+Endpoints:
+    GET  /computers            cadastro de computadores (sem as senhas)
+    GET  /status               estado publicado pelo serviço de monitoramento
+    POST /probe                leitura avulsa da fonte de energia
+    POST /wake                 {"targets": ["pc1", ...]} ou {"selection": "all" | "auto"}
+    POST /shutdown             {"targets": ["pc1", ...]} ou {"selection": "all" | "auto"}
+    GET  /jobs                 jobs recentes
+    GET  /jobs/<id>            estado e eventos de um job
+    GET  /jobs/<id>/events     progresso do job em tempo real (NDJSON)
+
+Com ?stream=1, POST /wake e POST /shutdown respondem diretamente com o
+progresso do job, em vez do identificador.
+
+Toda requisição precisa do cabeçalho "Authorization: Bearer <token>" e todo
+POST precisa de "Content-Type: application/json": um navegador não consegue
+enviar nenhum dos dois para outra origem sem uma verificação prévia (CORS),
+que este servidor não atende.
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import hmac
+import http
+import itertools
+import json
+import logging
+import os
+import socket
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from control_socket import (
+    ACTION_TIMEOUT,
+    CONTROL_SOCKET,
+    ControlError,
+    ControlUnavailable,
+    send_command,
+)
+from fleet_results import OK, aiter_results, result_to_dict
+from remote_poweron import CONFIG_FILE as COMPUTERS_FILE
+from remote_poweron import iter_wake, load_computers
+from remote_shutdown import configure_logging, iter_shutdown
+from status_segment import STATUS_SEGMENT_FILE, read_status, snapshot_to_dict
+
+# Constantes
+API_HOST = "127.0.0.1"
+API_PORT = 8787
+MAX_JOBS = 2  # operações em lote executadas ao mesmo tempo
+MAX_PARALLEL = 8  # computadores processados ao mesmo tempo em um job
+MAX_CONNECTIONS = 32
+MAX_BODY_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+KEPT_JOBS = 50  # jobs concluídos mantidos para consulta
+REQUEST_TIMEOUT = 30  # segundos aguardando uma requisição em uma conexão ociosa
+JOB_PATH_PARTS = 2  # /jobs/<id>
+JOB_EVENTS_PATH_PARTS = 3  # /jobs/<id>/events
+PRIVATE_FIELDS = ("password",)
+ACTIONS = {
+    "wake": ("auto_power_on", iter_wake),
+    "shutdown": ("auto_power_off", iter_shutdown),
+}
+
+logger = logging.getLogger("PowerMonitor.api")
+
+
+class HTTPError(Exception):
+    """Erro que vira uma resposta HTTP com {"error": mensagem}."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """
+    Operação em lote e os eventos de progresso de cada computador.
+
+    Os eventos são acrescentados no loop asyncio; quem acompanha o job
+    aguarda novos eventos sem consultar periodicamente.
+    """
+
+    def __init__(self, job_id, action, computers, parallel=1):
+        """
+        Args:
+            job_id (int): Identificador do job.
+            action (str): "wake" ou "shutdown".
+            computers (list): Computadores do job.
+            parallel (int): Computadores processados ao mesmo tempo.
+        """
+        self.id = job_id
+        self.action = action
+        self.computers = computers
+        self.parallel = parallel
+        self.state = "queued"
+        self.created = datetime.datetime.now()
+        self.finished = None
+        self.success_count = 0
+        self.events = []
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.state in {"done", "failed"}
+
+    def add_event(self, event):
+        """Acrescenta um evento e acorda quem acompanha o job."""
+        event.setdefault("job", self.id)
+        event.setdefault("time", datetime.datetime.now().isoformat())
+        self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self, events=True):
+        """Representação em JSON do job."""
+        data = {
+            "id": self.id,
+            "action": self.action,
+            "state": self.state,
+            "hosts": [comp["name"] for comp in self.computers],
+            "created": self.created.isoformat(),
+            "finished": self.finished.isoformat() if self.finished else None,
+            "success_count": self.success_count,
+        }
+        if events:
+            data["events"] = self.events
+        return data
+
+    async def follow(self):
+        """
+        Percorre os eventos do job, do primeiro ao último, aguardando os novos até o fim.
+
+        Yields:
+            dict: Eventos do job.
+        """
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+class FleetAPI:  # pylint: disable=too-many-instance-attributes
+    """Servidor HTTP/JSON das operações nos computadores."""
+
+    def __init__(
+        self,
+        host=API_HOST,
+        port=API_PORT,
+        token="",
+        max_jobs=MAX_JOBS,
+        max_connections=MAX_CONNECTIONS,
+        status_file=STATUS_SEGMENT_FILE,
+        control_socket=CONTROL_SOCKET,
+        probe_timeout=ACTION_TIMEOUT,
+    ):
+        """
+        Args:
+            host (str): Endereço de escuta (padrão: apenas a máquina local).
+            port (int): Porta de escuta.
+            token (str): Exigido no cabeçalho "Authorization: Bearer <token>".
+            max_jobs (int): Operações em lote executadas ao mesmo tempo.
+            max_connections (int): Conexões atendidas ao mesmo tempo.
+            status_file (str): Segmento de status publicado pelo serviço.
+            control_socket (str): Socket de controle do serviço, usado pela leitura avulsa.
+            probe_timeout (float): Tempo limite da leitura avulsa pelo serviço (em segundos).
+        """
+        self.host = host
+        self.port = port
+        self.token = token
+        self.max_jobs = max_jobs
+        self.max_connections = max_connections
+        self.status_file = status_file
+        self.control_socket = control_socket
+        self.probe_timeout = probe_timeout
+        self.jobs = collections.OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._job_slots = None
+        self._connection_slots = None
+        self._server = None
+        self._computers = None
+        self._computers_signature = None
+        # Uma thread por job em execução e uma para as leituras avulsas
+        self.executor = ThreadPoolExecutor(max_jobs + 1, thread_name_prefix="api")
+        self.routes = {
+            ("GET", "/computers"): self.get_computers,
+            ("GET", "/status"): self.get_status,
+            ("POST", "/probe"): self.probe,
+            ("POST", "/wake"): self.start_wake,
+            ("POST", "/shutdown"): self.start_shutdown,
+            ("GET", "/jobs"): self.list_jobs,
+        }
+
+    async def start(self):
+        """
+        Começa a escutar.
+
+        Raises:
+            ValueError: Se nenhum token tiver sido configurado.
+        """
+        if not self.token:
+            raise ValueError("Defina o token da API HTTP (http_api.token no service_config.json)")
+        self._job_slots = asyncio.Semaphore(self.max_jobs)
+        self._connection_slots = asyncio.Semaphore(self.max_connections)
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_SIZE
+        )
+        logger.info("API HTTP em http://%s:%s.", self.host, self.port)
+
+    async def close(self):
+        """Para de escutar e libera as threads."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.executor.shutdown(wait=False)
+
+    async def serve_forever(self):
+        """Inicia o servidor e atende até ser cancelado."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _handle_connection(self, reader, writer):
+        """Atende as requisições de uma conexão até o cliente encerrá-la."""
+        async with self._connection_slots:
+            try:
+                while True:
+                    try:
+                        request = await asyncio.wait_for(
+                            _read_request(reader), REQUEST_TIMEOUT
+                        )
+                    except HTTPError as e:
+                        await _write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                        break
+                    if request is None:
+                        break
+                    if not await self._respond(writer, *request):
+                        break
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+    async def _respond(self, writer, method, target, headers, body):
+        """
+        Executa uma requisição e escreve a resposta.
+
+        Returns:
+            bool: True se a conexão pode continuar aberta.
+        """
+        keep_alive = headers.get("connection", "").lower() != "close"
+        parsed = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(parsed.query)
+        try:
+            authorization = headers.get("authorization", "")
+            if not hmac.compare_digest(
+                authorization.encode('utf-8'), "Bearer {}".format(self.token).encode('utf-8')
+            ):
+                raise HTTPError(401, "Token inválido ou ausente")
+            result = await self._route(method, parsed.path.rstrip("/") or "/", query, body)
+        except HTTPError as e:
+            await _write_json(writer, e.status, {"error": str(e)}, keep_alive)
+            return keep_alive
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Erro na requisição %s %s: %s", method, target, e)
+            await _write_json(writer, 500, {"error": str(e)}, keep_alive)
+            return keep_alive
+
+        status, payload = result
+        if isinstance(payload, Job):
+            await _write_stream(writer, status, payload.follow(), keep_alive)
+        else:
+            await _write_json(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _route(self, method, path, query, body):
+        """Encontra e executa o handler do endpoint."""
+        handler = self.routes.get((method, path))
+        if handler is not None:
+            return await handler(query, body)
+
+        parts = path.strip("/").split("/")
+        if parts[0] == "jobs" and len(parts) in {JOB_PATH_PARTS, JOB_EVENTS_PATH_PARTS}:
+            if method != "GET":
+                raise HTTPError(405, "Método não permitido")
+            job = self.jobs.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                raise HTTPError(404, "Job não encontrado")
+            if len(parts) == JOB_EVENTS_PATH_PARTS and parts[2] == "events":
+                return 200, job
+            if len(parts) == JOB_PATH_PARTS:
+                return 200, job.to_dict()
+
+        if any(route_path == path for _, route_path in self.routes):
+            raise HTTPError(405, "Método não permitido")
+        raise HTTPError(404, "Endpoint não encontrado")
+
+    def load_registry(self):
+        """Cadastro de computadores, relido apenas quando o arquivo muda."""
+        try:
+            stat = os.stat(COMPUTERS_FILE)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if self._computers is None or signature != self._computers_signature:
+            self._computers = load_computers()
+            self._computers_signature = signature
+        return self._computers
+
+    async def get_computers(self, query, body):  # pylint: disable=unused-argument
+        """GET /computers"""
+        return 200, [
+            {key: value for key, value in comp.items() if key not in PRIVATE_FIELDS}
+            for comp in self.load_registry()
+        ]
+
+    async def get_status(self, query, body):  # pylint: disable=unused-argument
+        """GET /status"""
+        snapshot = read_status(self.status_file)
+        if snapshot is None:
+            raise HTTPError(503, "Serviço de monitoramento não está em execução")
+        return 200, snapshot_to_dict(snapshot)
+
+    async def probe(self, query, body):  # pylint: disable=unused-argument
+        """POST /probe"""
+        loop = asyncio.get_running_loop()
+        return 200, await loop.run_in_executor(self.executor, self._probe)
+
+    def _probe(self):
+        """
+        Lê a fonte de energia pelo serviço em execução ou, sem ele, diretamente.
+
+        Raises:
+            HTTPError: Se o serviço estiver em execução mas não concluir a leitura.
+        """
+        if self.control_socket:
+            try:
+                return send_command("probe", self.control_socket, self.probe_timeout)
+            except ControlUnavailable:
+                pass
+            except ControlError as e:
+                raise HTTPError(502, "O serviço não concluiu a leitura: {}".format(e)) from e
+            except socket.timeout as e:
+                raise HTTPError(504, "O serviço não respondeu à leitura a tempo") from e
+            except (OSError, ValueError) as e:
+                raise HTTPError(503, "Falha na comunicação com o serviço: {}".format(e)) from e
+
+        # Sem o serviço: psutil/upsd só são carregados quando necessários
+        # pylint: disable-next=import-outside-toplevel
+        from monitor_service import create_power_source, load_service_config
+
+        sampler = create_power_source(load_service_config())
+        try:
+            return sampler.sample()._asdict()
+        finally:
+            sampler.close()
+
+    async def start_wake(self, query, body):
+        """POST /wake"""
+        return self.start_job("wake", query, body)
+
+    async def start_shutdown(self, query, body):
+        """POST /shutdown"""
+        return self.start_job("shutdown", query, body)
+
+    async def list_jobs(self, query, body):  # pylint: disable=unused-argument
+        """GET /jobs"""
+        return 200, [job.to_dict(events=False) for job in self.jobs.values()]
+
+    def start_job(self, action, query, body):
+        """
+        Cria e agenda um job de ligação ou desligamento.
+
+        Args:
+            action (str): "wake" ou "shutdown".
+            query (dict): Parâmetros da URL (stream=1 para acompanhar o progresso).
+            body (dict): {"targets": [nomes]} ou {"selection": "all" | "auto"} (os
+            marcados com auto_power_on/auto_power_off), e opcionalmente "parallel".
+
+        Returns:
+            tuple: (status HTTP, job ou representação do job).
+        """
+        flag, _ = ACTIONS[action]
+        registry = self.load_registry()
+        targets = body.get("targets")
+        selection = body.get("selection")
+        if (targets is None) == (selection is None):
+            raise HTTPError(400, "Informe targets ou selection (all ou auto)")
+        if selection is not None:
+            if selection not in {"all", "auto"}:
+                raise HTTPError(400, "Seleção inválida: {}".format(selection))
+            computers = [comp for comp in registry if selection == "all" or comp.get(flag, False)]
+        else:
+            if not isinstance(targets, list) or not all(isinstance(name, str) for name in targets):
+                raise HTTPError(400, "targets deve ser uma lista de nomes")
+            by_name = {comp["name"].lower(): comp for comp in registry}
+            missing = [name for name in targets if name.lower() not in by_name]
+            if missing:
+                raise HTTPError(404, "Computadores não encontrados: {}".format(", ".join(missing)))
+            computers = [by_name[name.lower()] for name in targets]
+
+        parallel = body.get("parallel", 1)
+        if not isinstance(parallel, int) or not 1 <= parallel <= MAX_PARALLEL:
+            raise HTTPError(400, "parallel deve ser um inteiro de 1 a {}".format(MAX_PARALLEL))
+
+        job = Job(next(self._job_ids), action, computers, parallel)
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        asyncio.ensure_future(self._run_job(job))
+
+        if query.get("stream", ["0"])[0] not in {"0", ""}:
+            return 200, job
+        return 202, job.to_dict()
+
+    def _forget_old_jobs(self):
+        """Descarta os jobs concluídos mais antigos além de KEPT_JOBS."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[: max(0, len(self.jobs) - KEPT_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _run_job(self, job):
+        """Executa o job em uma thread, publicando o progresso de cada computador."""
+        loop = asyncio.get_running_loop()
+        _, iterate = ACTIONS[job.action]
+
+        def on_start(comp):
+            loop.call_soon_threadsafe(job.add_event, {"event": "started", "host": comp["name"]})
+
+        async with self._job_slots:
+            job.state = "running"
+            job.add_event({"event": "running", "action": job.action})
+            try:
+                results = iterate(job.computers, max_workers=job.parallel, on_start=on_start)
+                async for result in aiter_results(results, self.executor):
+                    event = result_to_dict(result)
+                    event["event"] = "result"
+                    job.add_event(event)
+                    if result.status == OK:
+                        job.success_count += 1
+                state = "done"
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Erro no job %s (%s): %s", job.id, job.action, e)
+                state = "failed"
+                job.add_event({"event": "error", "error": str(e)})
+
+        # O job só termina depois dos eventos já publicados pela thread
+        await asyncio.sleep(0)
+        job.state = state
+        job.finished = datetime.datetime.now()
+        job.add_event(
+            {
+                "event": "finished",
+                "state": job.state,
+                "success_count": job.success_count,
+                "total": len(job.computers),
+            }
+        )
+
+
+async def _read_request(reader):
+    """
+    Lê uma requisição HTTP/1.1.
+
+    Returns:
+        tuple: (método, alvo, cabeçalhos, corpo em JSON), ou None se a conexão terminou.
+
+    Raises:
+        HTTPError: Se a requisição for inválida ou um POST não for application/json.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPError(400, "Requisição incompleta") from e
+    except asyncio.LimitOverrunError as e:
+        raise HTTPError(431, "Cabeçalhos muito grandes") from e
+
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError as e:
+        raise HTTPError(400, "Linha de requisição inválida") from e
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError as e:
+        raise HTTPError(400, "Content-Length inválido") from e
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "Corpo da requisição muito grande")
+    method = method.upper()
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if method == "POST" and content_type != "application/json":
+        raise HTTPError(415, "O corpo deve ser enviado como application/json")
+    body = {}
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except asyncio.IncompleteReadError as e:
+            raise HTTPError(400, "Corpo da requisição incompleto") from e
+        except ValueError as e:
+            raise HTTPError(400, "JSON inválido: {}".format(e)) from e
+        if not isinstance(body, dict):
+            raise HTTPError(400, "O corpo deve ser um objeto JSON")
+    return method, target, headers, body
+
+
+def _status_line(status, headers, keep_alive):
+    """Monta a linha de status e os cabeçalhos da resposta."""
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+    lines = ["HTTP/1.1 {} {}".format(status, http.HTTPStatus(status).phrase)]
+    lines.extend("{}: {}".format(name, value) for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+async def _write_json(writer, status, payload, keep_alive):
+    """Escreve uma resposta JSON completa."""
+    body = json.dumps(payload, default=str, ensure_ascii=False).encode('utf-8')
+    headers = {"Content-Type": "application/json; charset=utf-8", "Content-Length": len(body)}
+    writer.write(_status_line(status, headers, keep_alive) + body)
+    await writer.drain()
+
+
+async def _write_stream(writer, status, events, keep_alive):
+    """Escreve os eventos em JSON, um por linha, à medida que acontecem (chunked)."""
+    headers = {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"}
+    writer.write(_status_line(status, headers, keep_alive))
+    async for event in events:
+        line = json.dumps(event, default=str, ensure_ascii=False).encode('utf-8') + b"\n"
+        writer.write("{:x}\r\n".format(len(line)).encode('ascii') + line + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def run_api(settings=None):
+    """
+    Executa a API até ser interrompida.
+
+    Args:
+        settings (dict, optional): host, port, token, max_jobs, max_connections,
+        status_file e control_socket.
+    """
+    api = FleetAPI(**(settings or {}))
+    try:
+        asyncio.run(api.serve_forever())
+    except ValueError as e:
+        logger.error("API HTTP não iniciada: %s", e)
+    except KeyboardInterrupt:
+        logger.info("API HTTP encerrada.")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='API HTTP para operar os computadores.')
+    parser.add_argument('--host', default=API_HOST, help='Endereço de escuta')
+    parser.add_argument('--port', type=int, default=API_PORT, help='Porta de escuta')
+    parser.add_argument('--token', default="", help='Token exigido no cabeçalho Authorization')
+    parser.add_argument('--max-jobs', type=int, default=MAX_JOBS, help='Jobs simultâneos')
+
+    args = parser.parse_args()
+    configure_logging()
+    run_api({"host": args.host, "port": args.port, "token": args.token, "max_jobs": args.max_jobs})
@@ -5,6 +5,7 @@ além de configurar o serviço de monitoramento.
 """
 
 import argparse
+import datetime
 import json
 import os
 import platform
@@ -12,14 +13,43 @@ import subprocess
 import sys
 
 import email_service
+from control_socket import (
+    ACTION_TIMEOUT,
+    CONTROL_SOCKET,
+    CONTROL_TIMEOUT,
+    ControlError,
+    ControlUnavailable,
+    iter_command,
+    send_command,
+)
+from fleet_results import print_results, result_from_dict
+from power_history import HISTORY_FILE, print_history
 
 # Importando os módulos necessários
-from remote_poweron import load_computers, wake_on_lan, wake_on_lan_by_name, wake_on_lan_menu
-from remote_shutdown import shutdown_by_name, shutdown_menu
+from remote_poweron import (
+    WAKE_SUMMARY,
+    discover_macs,
+    iter_wake,
+    load_computers,
+    read_arp_table,
+    resolve_hostname,
+    wake_on_lan,
+    wake_on_lan_by_name,
+    wake_on_lan_menu,
+)
+from remote_shutdown import (
+    SHUTDOWN_SUMMARY,
+    configure_logging,
+    iter_shutdown,
+    shutdown_by_name,
+    shutdown_menu,
+)
+from service_settings import CONFIG_FILE as SERVICE_CONFIG_FILE
+from service_settings import default_service_config, read_service_config
+from status_segment import STATUS_SEGMENT_FILE, print_status, read_status
 
 # Constantes
 CONFIG_FILE = "computers.json"
-SERVICE_CONFIG_FILE = "service_config.json"
 MAX_BATTERY_THRESHOLD = 100
 INVALID_ENTRY = "Entrada inválida. Digite um número."
 MONITOR_SERVICE_SCRIPT = "monitor_service.py"
@@ -49,14 +79,13 @@ def save_computers(computers):
 
 
 def load_service_config():
-    """Carrega a configuração do serviço do arquivo JSON."""
-    default_config = {
-        "battery_threshold": 25,
-        "time_without_charger": 10,  # minutos
-        "delay_after_power_restore": 2,  # minutos
-        "last_execution": None,
-        "power_failure_detected": False,
-    }
+    """
+    Carrega a configuração do serviço para edição, criando o arquivo se necessário.
+
+    Os comandos que apenas consultam uma chave usam read_service_config(), que
+    não grava nada.
+    """
+    default_config = default_service_config()
 
     if os.path.exists(SERVICE_CONFIG_FILE):
         try:
@@ -89,7 +118,15 @@ def add_computer():
 
     name = input("Nome do computador (identificador único): ")
     hostname = input("Hostname ou IP: ")
-    mac = input("Endereço MAC (formato XX:XX:XX:XX:XX:XX): ")
+    mac = input("Endereço MAC (formato XX:XX:XX:XX:XX:XX, vazio para descobrir): ")
+
+    if not mac:
+        ip = resolve_hostname(hostname)
+        mac = read_arp_table().get(ip, "") if ip else ""
+        if mac:
+            print("Endereço MAC descoberto: {}".format(mac))
+        else:
+            print("MAC não encontrado na tabela ARP. Use 'discover' mais tarde.")
 
     # Determina o tipo de sistema operacional
     os_type = input("Sistema Operacional (windows/linux): ").lower()
@@ -170,6 +207,48 @@ def list_computers():
         print()
 
 
+def discover_computers(subnet=None, fix=False):
+    """Preenche ou verifica os endereços MAC a partir da tabela ARP."""
+    computers = load_computers()
+
+    if not computers:
+        print("Nenhum computador cadastrado.")
+        return
+
+    try:
+        results = discover_macs(computers, subnet=subnet, fix=fix)
+    except ValueError as e:
+        print("Erro: {}".format(e))
+        return
+
+    status_labels = {
+        "filled": "MAC preenchido",
+        "ok": "MAC confere",
+        "mismatch": "MAC divergente",
+        "fixed": "MAC corrigido",
+        "not_found": "não encontrado na tabela ARP",
+        "unresolved": "hostname não resolvido",
+    }
+
+    print("\n=== Descoberta de Endereços MAC ===")
+    for result in results:
+        print(
+            "{} ({}): {} {}".format(
+                result["name"],
+                result["ip"] or "-",
+                status_labels[result["status"]],
+                result["mac"] or "",
+            ).rstrip()
+        )
+
+    if any(result["status"] in {"filled", "fixed"} for result in results):
+        save_computers(computers)
+        print("Cadastro atualizado.")
+
+    if not fix and any(result["status"] == "mismatch" for result in results):
+        print("Use a opção de correção para substituir os endereços divergentes.")
+
+
 def configure_service():
     """Configura o serviço de monitoramento."""
     config = load_service_config()
@@ -233,6 +312,79 @@ def configure_service():
         print("Opção inválida.")
 
 
+def run_on_service(command, timeout=ACTION_TIMEOUT, **args):
+    """
+    Executa um comando pelo socket de controle do serviço em execução.
+
+    Args:
+        command (str): Comando (status, wake, shutdown, reload ou probe).
+        timeout (float): Tempo limite da resposta (em segundos).
+        **args: Argumentos do comando.
+
+    Returns:
+        bool: True se o serviço atendeu o comando (com sucesso ou erro),
+        False se o serviço não estiver em execução.
+    """
+    path = read_service_config().get("control_socket", CONTROL_SOCKET)
+    if not path:
+        return False
+    try:
+        result = send_command(command, path, timeout, **args)
+    except ControlUnavailable:
+        return False
+    except ControlError as e:
+        print("Erro: {}".format(e))
+        return True
+    except (OSError, ValueError) as e:
+        print("Erro na comunicação com o serviço: {}".format(e))
+        return True
+
+    if command == "status":
+        print_service_status(result)
+    else:
+        print(json.dumps(result, indent=4, ensure_ascii=False, default=str))
+    return True
+
+
+def print_service_status(status):
+    """
+    Exibe o estado retornado pelo comando status do serviço.
+
+    Args:
+        status (dict): Resultado do comando status.
+    """
+    sample = status["sample"] or {}
+    power = status["power_status"]
+    if sample.get("on_power") is None:
+        supply = "-"
+    else:
+        supply = "rede elétrica" if sample["on_power"] else "bateria"
+    percent = sample.get("percent")
+
+    print("Serviço está em execução (PID: {})".format(status["pid"]))
+    print("  Fonte de energia: {}".format(status["power_source"]))
+    print("  Alimentação: {}".format(supply))
+    print("  Bateria: {}".format("-" if percent is None else "{}%".format(percent)))
+    print("  Fase: {}{}".format(status["phase"], " (em execução)" if status["fleet_busy"] else ""))
+    print("  Última verificação: {}".format(power.get("last_check") or "-"))
+    print("  Notificações pendentes: {}".format(status["pending_notifications"]))
+
+
+def show_service_status():
+    """
+    Exibe o status do serviço em execução, lido do segmento de status ou,
+    se ele estiver desabilitado, pelo socket de controle.
+
+    Returns:
+        bool: True se o serviço está em execução e o status foi exibido.
+    """
+    snapshot = read_status(read_service_config().get("status_file", STATUS_SEGMENT_FILE))
+    if snapshot is not None:
+        print_status(snapshot)
+        return True
+    return run_on_service("status", CONTROL_TIMEOUT)
+
+
 def start_stop_service():
     """Inicia ou para o serviço de monitoramento."""
 
@@ -287,6 +439,8 @@ def start_stop_service():
                 print("Erro ao parar o serviço: {}".format(e))
 
     elif choice == "3":
+        if show_service_status():
+            return
         if system == "Windows":
             print("Para verificar o status no Windows, confira o Gerenciador de Tarefas.")
         else:  # Linux
@@ -454,6 +608,7 @@ def configure_notification_events(config):
         "shutdown_initiated": "Desligamento iniciado",
         "poweron_initiated": "Inicialização remota",
         "low_battery": "Bateria fraca",
+        "shutdown_aborted": "Desligamento interrompido",
     }
 
     while True:
@@ -499,6 +654,7 @@ def main_menu():
         print("6. Configurar serviço de monitoramento")
         print("7. Iniciar/parar serviço de monitoramento")
         print("8. Configurar notificações por email")  # Nova opção
+        print("9. Descobrir endereços MAC")
         print("0. Sair")
 
         choice = input("\nEscolha uma opção: ")
@@ -550,6 +706,11 @@ def main_menu():
         elif choice == "8":  # Nova opção para configuração de email
             configure_email()
 
+        elif choice == "9":
+            subnet = input("Sub-rede para varredura (ex: 192.168.0.0/24, vazio para pular): ")
+            fix = input("Corrigir endereços divergentes? (s/n): ").lower() == 's'
+            discover_computers(subnet or None, fix)
+
         elif choice == "0":
             print("Saindo...")
             sys.exit(0)
@@ -558,6 +719,83 @@ def main_menu():
             print("Opção inválida. Tente novamente.")
 
 
+def run_bulk_on_service(command, args, summary):
+    """
+    Executa uma operação em lote pelo socket de controle do serviço em execução.
+
+    Args:
+        command (str): "wake" ou "shutdown".
+        args (argparse.Namespace): Argumentos do comando wol ou shutdown.
+        summary (str): Formato do resumo final (veja print_results).
+
+    Returns:
+        bool: True se o serviço atendeu o comando (com sucesso ou erro),
+        False se o serviço não estiver em execução.
+    """
+    path = read_service_config().get("control_socket", CONTROL_SOCKET)
+    if not path:
+        return False
+    events = iter_command(
+        command,
+        path,
+        ACTION_TIMEOUT,
+        selection='auto' if args.auto else 'all',
+        parallel=args.parallel,
+    )
+    try:
+        total = next(events)["total"]
+    except ControlUnavailable:
+        return False
+    except ControlError as e:
+        print("Erro: {}".format(e))
+        return True
+    except (OSError, ValueError, KeyError, StopIteration) as e:
+        print("Erro na comunicação com o serviço: {}".format(e))
+        return True
+
+    def results():
+        try:
+            for event in events:
+                yield result_from_dict(event)
+        except (ControlError, OSError, ValueError) as e:
+            print("Erro na comunicação com o serviço: {}".format(e))
+
+    print_results(results(), total, summary, json_lines=args.json)
+    return True
+
+
+def run_bulk(args):
+    """
+    Liga ou desliga vários computadores, exibindo o resultado de cada um assim que termina.
+
+    Com o serviço em execução, a operação é executada por ele.
+
+    Args:
+        args (argparse.Namespace): Argumentos do comando wol ou shutdown.
+    """
+    if args.command == 'wol':
+        command, summary = 'wake', WAKE_SUMMARY
+    else:
+        command, summary = 'shutdown', SHUTDOWN_SUMMARY
+    if run_bulk_on_service(command, args, summary):
+        return
+
+    if command == 'wake':
+        flag, iterate = 'auto_power_on', iter_wake
+    else:
+        flag, iterate = 'auto_power_off', iter_shutdown
+    computers = load_computers()
+    if args.auto:
+        computers = [comp for comp in computers if comp.get(flag, False)]
+
+    print_results(
+        iterate(computers, max_workers=args.parallel),
+        len(computers),
+        summary,
+        json_lines=args.json,
+    )
+
+
 def handle_command_line():
     """Processa argumentos de linha de comando
     para acesso direto às funções."""
@@ -566,23 +804,79 @@ def handle_command_line():
 
     # Comando wake-on-lan
     wol_parser = subparsers.add_parser('wol', help='Enviar comando Wake-on-LAN')
-    wol_parser.add_argument('target', help='Nome do computador cadastrado ou endereço MAC')
+    wol_parser.add_argument(
+        'target', nargs='?', help='Nome do computador cadastrado ou endereço MAC'
+    )
 
     # Comando shutdown
     shutdown_parser = subparsers.add_parser('shutdown', help='Desligar computador remoto')
-    shutdown_parser.add_argument('target', help='Nome do computador cadastrado ou hostname')
+    shutdown_parser.add_argument(
+        'target', nargs='?', help='Nome do computador cadastrado ou hostname'
+    )
+
+    # Operações em lote: progresso de cada computador à medida que termina
+    for bulk_parser, flag in ((wol_parser, 'auto_power_on'), (shutdown_parser, 'auto_power_off')):
+        bulk_parser.add_argument(
+            '--all', action='store_true', help='Todos os computadores cadastrados'
+        )
+        bulk_parser.add_argument(
+            '--auto', action='store_true', help='Os computadores marcados como {}'.format(flag)
+        )
+        bulk_parser.add_argument(
+            '--parallel', type=int, default=1, help='Computadores processados ao mesmo tempo'
+        )
+        bulk_parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Um resultado JSON por linha, à medida que cada computador termina',
+        )
 
     # Comando list
     subparsers.add_parser('list', help='Listar computadores cadastrados')
 
+    # Comando discover
+    discover_parser = subparsers.add_parser(
+        'discover', help='Descobrir endereços MAC pela tabela ARP'
+    )
+    discover_parser.add_argument(
+        '--subnet', help='Sub-rede a varrer antes da leitura (ex: 192.168.0.0/24)'
+    )
+    discover_parser.add_argument(
+        '--fix', action='store_true', help='Substituir endereços MAC divergentes'
+    )
+
+    # Comando history
+    history_parser = subparsers.add_parser('history', help='Consultar o histórico de energia')
+    history_parser.add_argument(
+        '--hours', type=float, default=24, help='Últimas N horas (padrão: 24)'
+    )
+    history_parser.add_argument('--csv', action='store_true', help='Saída em formato CSV')
+
+    # Comando report
+    report_parser = subparsers.add_parser('report', help='Relatórios de quedas e ações')
+    report_parser.add_argument(
+        'report',
+        choices=['latency', 'outages'],
+        help='Latência das ações por computador ou quedas de energia',
+    )
+    report_parser.add_argument('--action', choices=['shutdown', 'wake'], default='shutdown')
+    report_parser.add_argument('--days', type=float, help='Período em dias (padrão: 90)')
+    report_parser.add_argument('--percentile', type=float, help='Percentil (padrão: 95)')
+
     # Comando start/stop
     service_parser = subparsers.add_parser('service', help='Controlar serviço de monitoramento')
     service_parser.add_argument(
         'action',
-        choices=['start', 'stop', 'status'],
-        help='Ação para o serviço (start, stop, status)',
+        choices=['start', 'stop', 'status', 'reload', 'probe'],
+        help='Ação para o serviço (start, stop, status, reload, probe)',
     )
 
+    # Comando api
+    api_parser = subparsers.add_parser('api', help='Iniciar a API HTTP local')
+    api_parser.add_argument('--host', help='Endereço de escuta (padrão: 127.0.0.1)')
+    api_parser.add_argument('--port', type=int, help='Porta de escuta (padrão: 8787)')
+    api_parser.add_argument('--token', help='Token exigido no cabeçalho Authorization')
+
     # Comando email
     email_parser = subparsers.add_parser('email', help='Configurar notificações por email')
     email_parser.add_argument(
@@ -593,20 +887,57 @@ def handle_command_line():
 
     args = parser.parse_args()
 
-    if args.command == 'wol':
-        # Verifica se o alvo é um MAC ou nome de computador
-        if ':' in args.target or '-' in args.target:
-            wake_on_lan(args.target)
-        else:
-            wake_on_lan_by_name(args.target)
+    if args.command in {'wol', 'shutdown'} and (args.all or args.auto):
+        run_bulk(args)
+
+    elif args.command in {'wol', 'shutdown'} and not args.target:
+        parser.error("informe o computador ou use --all/--auto")
+
+    elif args.command == 'wol':
+        # Com o serviço em execução, o comando é executado por ele
+        if not run_on_service('wake', target=args.target):
+            # Verifica se o alvo é um MAC ou nome de computador
+            if ':' in args.target or '-' in args.target:
+                wake_on_lan(args.target)
+            else:
+                wake_on_lan_by_name(args.target)
 
     elif args.command == 'shutdown':
         # Verifica se o alvo é um hostname ou nome de computador
-        shutdown_by_name(args.target)
+        if not run_on_service('shutdown', target=args.target):
+            shutdown_by_name(args.target)
 
     elif args.command == 'list':
         list_computers()
 
+    elif args.command == 'discover':
+        discover_computers(args.subnet, args.fix)
+
+    elif args.command == 'history':
+        since = datetime.datetime.now() - datetime.timedelta(hours=args.hours)
+        print_history(read_service_config().get("history_file", HISTORY_FILE), since, csv=args.csv)
+
+    elif args.command == 'report':
+        # sqlite3 só é carregado pelos comandos que usam o registro de eventos
+        # pylint: disable-next=import-outside-toplevel
+        from event_journal import (
+            DEFAULT_PERCENTILE,
+            DEFAULT_REPORT_DAYS,
+            JOURNAL_FILE,
+            EventJournal,
+            print_latency_report,
+            print_outage_report,
+        )
+
+        days = DEFAULT_REPORT_DAYS if args.days is None else args.days
+        rank = DEFAULT_PERCENTILE if args.percentile is None else args.percentile
+        journal = EventJournal(read_service_config().get("journal_file", JOURNAL_FILE))
+        if args.report == 'latency':
+            print_latency_report(journal, args.action, days, rank)
+        else:
+            print_outage_report(journal, days)
+        journal.close()
+
     elif args.command == 'service':
 
         script_path = os.path.abspath(MONITOR_SERVICE_SCRIPT)
@@ -635,7 +966,13 @@ def handle_command_line():
             except Exception as e:  # pylint disable=too-broad-except
                 print("Erro ao parar o serviço: {}".format(e))
 
+        elif args.action in {'reload', 'probe'}:
+            if not run_on_service(args.action):
+                print(SERVICE_NOT_RUNNING)
+
         elif args.action == 'status':
+            if show_service_status():
+                return
             try:
 
                 if platform.system() == "Windows":
@@ -649,6 +986,19 @@ def handle_command_line():
             except Exception as e:  # pylint disable=too-broad-except
                 print("Erro ao verificar o status: {}".format(e))
 
+    elif args.command == 'api':
+        # pylint: disable-next=import-outside-toplevel
+        from http_api import run_api
+
+        settings = dict(read_service_config().get("http_api", {}))
+        if args.host:
+            settings["host"] = args.host
+        if args.port:
+            settings["port"] = args.port
+        if args.token:
+            settings["token"] = args.token
+        run_api(settings)
+
     elif args.command == 'email':
         if args.action == 'configure':
             configure_email()
@@ -664,6 +1014,7 @@ def handle_command_line():
 
 
 if __name__ == "__main__":
+    configure_logging()
     if len(sys.argv) > 1:
         handle_command_line()
     else:
@@ -0,0 +1,405 @@
+"""
+Métricas do serviço de monitoramento no formato OpenMetrics (Prometheus).
+
+As métricas são atualizadas sem locks no caminho das leituras e das
+ações: contadores e histogramas apenas acrescentam a observação a uma
+deque (operação atômica no CPython) e os gauges apenas trocam um valor em
+um dicionário. As observações pendentes são agregadas quando o endpoint
+/metrics é consultado ou, se ninguém o consultar, a cada MAX_PENDING
+observações, para que a deque não cresça sem limite.
+"""
+
+import collections
+import logging
+import math
+import threading
+
+from outage_workflow import TRANSITIONS
+
+# Constantes
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9877
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Limites (em segundos) dos histogramas de duração
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_REQUEST_SIZE = 16 * 1024
+MAX_PENDING = 1024  # observações acumuladas antes de agregar sem esperar a consulta
+REQUEST_TIMEOUT = 10  # segundos
+MAX_EXACT_INTEGER = 1e15  # acima disso, floats inteiros são escritos com repr()
+
+logger = logging.getLogger("PowerMonitor.metrics")
+
+
+def _format_value(value):
+    """Formata um número como o OpenMetrics espera."""
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < MAX_EXACT_INTEGER else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    """Monta {nome="valor",...} (vazio se não houver labels)."""
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + "}"
+
+
+class Metric:
+    """Família de métricas com labels."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): Nome da família (sem os sufixos _total, _bucket etc.).
+            documentation (str): Descrição exibida em # HELP.
+            labelnames (tuple): Nomes dos labels, na ordem usada nas séries.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self):
+        """
+        Agrega as observações pendentes.
+
+        Returns:
+            list: Linhas das séries da família (sem HELP e TYPE).
+        """
+        raise NotImplementedError
+
+    def render(self):
+        """Texto da família no formato OpenMetrics."""
+        lines = [
+            "# TYPE {} {}".format(self.name, self.kind),
+            "# HELP {} {}".format(self.name, _escape(self.documentation)),
+        ]
+        lines.extend(self.collect())
+        return lines
+
+
+class BufferedMetric(Metric):
+    """Métrica cujas observações são acumuladas em uma deque e agregadas depois."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._pending = collections.deque()
+        # Serializa apenas a agregação; o registro das observações continua sem lock
+        self._fold_lock = threading.Lock()
+
+    def _record(self, key, value):
+        """Acumula uma observação, agregando as pendentes ao atingir MAX_PENDING."""
+        self._pending.append((key, value))
+        # Se outra thread já estiver agregando, ela também consome esta observação
+        if len(self._pending) >= MAX_PENDING and self._fold_lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self._fold_lock.release()
+
+    def _fold(self):
+        """Agrega as observações pendentes (com _fold_lock adquirido)."""
+        while self._pending:
+            self._apply(*self._pending.popleft())
+
+    def _apply(self, key, value):
+        """Soma uma observação à série das labels."""
+        raise NotImplementedError
+
+    def collect(self):
+        with self._fold_lock:
+            self._fold()
+            return self._lines()
+
+    def _lines(self):
+        """Linhas das séries já agregadas."""
+        raise NotImplementedError
+
+
+class Counter(BufferedMetric):
+    """Contador crescente."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """Incrementa o contador das labels informadas."""
+        self._record(self._key(labels), amount)
+
+    def _apply(self, key, value):
+        self._values[key] = self._values.get(key, 0) + value
+
+    def _lines(self):
+        return [
+            "{}_total{} {}".format(
+                self.name, _format_labels(self.labelnames, key), _format_value(value)
+            )
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Valor instantâneo."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        """Define o valor das labels informadas (None remove a série)."""
+        key = self._key(labels)
+        if value is None:
+            self._values.pop(key, None)
+        else:
+            self._values[key] = value
+
+    def collect(self):
+        return [
+            "{}{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(value))
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(BufferedMetric):
+    """Distribuição de valores (normalmente durações) em faixas cumulativas."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # labels -> [contagem por faixa..., soma]
+
+    def observe(self, value, **labels):
+        """Registra uma observação para as labels informadas."""
+        self._record(self._key(labels), value)
+
+    def _apply(self, key, value):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-1] += value
+
+    def _lines(self):
+        lines = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append("{}_bucket{} {}".format(self.name, labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            lines.append("{}_count{} {}".format(self.name, labels, cumulative))
+            lines.append("{}_sum{} {}".format(self.name, labels, _format_value(series[-1])))
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas pelo endpoint."""
+
+    def __init__(self):
+        self._metrics = []
+        # Apenas a agregação (na consulta do endpoint) é serializada
+        self._collect_lock = threading.Lock()
+
+    def register(self, metric):
+        """Acrescenta uma métrica e a retorna."""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Texto completo no formato OpenMetrics.
+
+        Returns:
+            str: Todas as famílias, terminando em "# EOF".
+        """
+        with self._collect_lock:
+            lines = []
+            for metric in self._metrics:
+                lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MonitorMetrics:
+    """Métricas do serviço de monitoramento."""
+
+    def __init__(self, registry=None):
+        """
+        Args:
+            registry (MetricsRegistry, optional): Onde registrar as métricas (padrão: um novo).
+        """
+        self.registry = registry or MetricsRegistry()
+        metric = self.registry
+        self.battery_percent = metric.gauge("wol_battery_percent", "Porcentagem da bateria")
+        self.on_power = metric.gauge("wol_on_power", "1 se conectado à energia elétrica")
+        self.battery_runtime = metric.gauge(
+            "wol_battery_runtime_seconds", "Autonomia informada pela fonte de energia"
+        )
+        self.outage_phase = metric.gauge(
+            "wol_outage_phase", "1 na fase atual do fluxo da queda", ("phase",)
+        )
+        self.tick_duration = metric.histogram(
+            "wol_tick_duration_seconds", "Duração de cada ciclo de leitura e decisão"
+        )
+        self.host_actions = metric.counter(
+            "wol_host_actions",
+            "Ações nos computadores por resultado",
+            ("action", "host", "status"),
+        )
+        self.host_action_duration = metric.histogram(
+            "wol_host_action_duration_seconds",
+            "Duração das ações nos computadores por etapa (total = ação completa)",
+            ("action", "host", "phase"),
+        )
+        self.notification_delivery = metric.histogram(
+            "wol_notification_delivery_seconds",
+            "Duração da entrega das notificações",
+            ("channel",),
+        )
+        self.notifications = metric.counter(
+            "wol_notifications", "Entregas de notificações por resultado", ("channel", "status")
+        )
+
+    def observe_sample(self, sample, phase):
+        """
+        Atualiza os gauges com uma leitura da fonte de energia.
+
+        Args:
+            sample (BatterySample): Leitura do ciclo.
+            phase (str): Fase atual do fluxo da queda.
+        """
+        self.battery_percent.set(sample.percent)
+        self.on_power.set(1 if sample.on_power else 0)
+        self.battery_runtime.set(sample.runtime)
+        for name in TRANSITIONS:
+            self.outage_phase.set(1 if name == phase else 0, phase=name)
+
+    def observe_host_result(self, result):
+        """
+        Registra o resultado de uma ação em um computador.
+
+        Args:
+            result (HostResult): Resultado produzido por fleet_results.iter_results().
+        """
+        self.host_actions.inc(action=result.action, host=result.host, status=result.status)
+        if result.status == "skipped":
+            return
+        for phase, duration in result.phases.items():
+            self.host_action_duration.observe(
+                duration, action=result.action, host=result.host, phase=phase
+            )
+        self.host_action_duration.observe(
+            result.duration, action=result.action, host=result.host, phase="total"
+        )
+
+    def observe_delivery(self, channel, duration, delivered):
+        """
+        Registra a entrega de uma notificação (ou de um lote).
+
+        Args:
+            channel (str): Canal (email, webhook, syslog, unix).
+            duration (float): Duração da entrega (em segundos).
+            delivered (bool): True se a entrega foi bem-sucedida.
+        """
+        self.notification_delivery.observe(duration, channel=channel)
+        self.notifications.inc(channel=channel, status="ok" if delivered else "failed")
+
+
+class MetricsServer:
+    """Endpoint HTTP /metrics, executado no loop asyncio do serviço."""
+
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT):
+        """
+        Args:
+            registry (MetricsRegistry): Métricas exportadas.
+            host (str): Endereço de escuta.
+            port (int): Porta de escuta.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """Começa a escutar."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_REQUEST_SIZE
+        )
+        logger.info("Métricas em http://%s:%s/metrics.", self.host, self.port)
+
+    async def close(self):
+        """Para de escutar."""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        """Atende uma requisição e encerra a conexão."""
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            request_line = head.split(b"\r\n", 1)[0].decode('latin-1').split()
+            if len(request_line) > 1 and request_line[0] == "GET":
+                path = request_line[1].split("?", 1)[0]
+            else:
+                path = None
+
+            if path == "/metrics":
+                status, content_type = "200 OK", CONTENT_TYPE
+                body = self.registry.render().encode('utf-8')
+            else:
+                status, content_type = "404 Not Found", "text/plain; charset=utf-8"
+                body = b"Use GET /metrics\n"
+
+            writer.write(
+                "HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n"
+                "Connection: close\r\n\r\n".format(status, content_type, len(body)).encode(
+                    'latin-1'
+                )
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except ConnectionError as e:
+            logger.debug("Conexão de métricas encerrada: %s", e)
+        finally:
+            writer.close()
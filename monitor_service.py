@@ -3,82 +3,192 @@ Serviço de monitoramento do status da bateria para desligamento automático
 de computadores em caso de falha de energia.
 """
 
+import asyncio
+import collections
+import contextlib
+import copy
 import datetime
 import json
 import logging
 import os
 import platform
+import signal
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
 
-import psutil
-
 import email_service
-from remote_poweron import load_computers, wake_on_lan_all_auto
+from control_socket import ControlError, ControlServer, control_supported
+from event_journal import EventJournal
+from fleet_results import (
+    OK,
+    SKIPPED,
+    add_result_listener,
+    aiter_results,
+    remove_result_listener,
+    result_to_dict,
+)
+from metrics import MetricsServer, MonitorMetrics
+from notification_outbox import NotificationOutbox
+from notification_policy import NotificationPolicy
+from notifier import CallbackSink, Notifier, create_sinks
+from nut_client import NUT_DEFAULT_PORT, NUT_DEFAULT_TIMEOUT, NutClient, NutError
+from outage_workflow import (
+    IDLE,
+    ON_BATTERY,
+    SHUT_DOWN,
+    SHUTTING_DOWN,
+    WAKING,
+    OutageWorkflow,
+)
+from power_events import PowerEventDetector
+from power_history import PowerHistoryFile
+from remote_poweron import CONFIG_FILE as COMPUTERS_FILE
+from remote_poweron import iter_wake, load_computers, wake_on_lan, wake_on_lan_all_auto
 
 # Importando as funções de desligamento e ligação
-from remote_shutdown import shutdown_all_auto
+from remote_shutdown import iter_shutdown, shutdown_all_auto
+from runtime_estimator import DrainHistory
+from service_settings import CONFIG_FILE, default_service_config
+from status_segment import HEARTBEAT_INTERVAL, StatusSegment
 
 # Configuração de logging
 LOG_FILE = "power_monitor.log"
 LOG_MAX_SIZE = 50 * 1024 * 1024  # 50MB em bytes
 LOG_BACKUP_COUNT = 3  # Número de arquivos de backup a manter
 
-# Certifique-se de que o diretório do arquivo de log existe
-os.makedirs(
-    os.path.dirname(LOG_FILE) if os.path.dirname(LOG_FILE) else '.',
-    exist_ok=True,
-)
-
-# Configura o logger para gravar no arquivo e exibir no console
 logger = logging.getLogger("PowerMonitor")
-logger.setLevel(logging.INFO)
-
-# Limpa os manipuladores existentes para evitar duplicação
-if logger.handlers:
-    logger.handlers.clear()
-
-# Adiciona o manipulador de arquivo com rotação
-file_handler = RotatingFileHandler(
-    LOG_FILE,
-    maxBytes=LOG_MAX_SIZE,
-    backupCount=LOG_BACKUP_COUNT,
-    encoding='utf-8',
-)
-file_handler.setLevel(logging.INFO)
-file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
-# Adiciona o manipulador de console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
+
+
+def configure_logging():
+    """
+    Configura o log do serviço no arquivo com rotação e no console.
+
+    Os logs do desligamento remoto (remote_shutdown) vão para os mesmos
+    destinos. Chamado apenas ao iniciar o serviço, e não ao importar o módulo.
+    """
+    # Certifique-se de que o diretório do arquivo de log existe
+    os.makedirs(
+        os.path.dirname(LOG_FILE) if os.path.dirname(LOG_FILE) else '.',
+        exist_ok=True,
+    )
+
+    # Adiciona o manipulador de arquivo com rotação
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=LOG_MAX_SIZE,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+    )
+    file_handler.setLevel(logging.INFO)
+    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(file_formatter)
+
+    # Adiciona o manipulador de console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    console_handler.setFormatter(console_formatter)
+
+    # Configura o logger para gravar no arquivo e exibir no console
+    for name in ("PowerMonitor", "remote_shutdown"):
+        target = logging.getLogger(name)
+        target.setLevel(logging.INFO)
+        # Limpa os manipuladores existentes para evitar duplicação
+        target.handlers.clear()
+        target.addHandler(file_handler)
+        target.addHandler(console_handler)
+        target.propagate = False
+
 
 # Constantes
-CONFIG_FILE = "service_config.json"
+MAX_CONTROL_PARALLEL = 8  # computadores ao mesmo tempo nas operações em lote pelo socket
 STATUS_FILE = "power_status.json"
 
 # Intervalo de verificação (em segundos)
 CHECK_INTERVAL = 60
 
+# Faixa (em pontos percentuais acima do limite) em que o intervalo encolhe até o mínimo
+NEAR_THRESHOLD_MARGIN = 10
+
+# Diretório das fontes de energia no Linux e atributos lidos de cada tipo
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+BATTERY_ATTRIBUTES = (
+    "status",
+    "capacity",
+    "energy_now",
+    "energy_full",
+    "charge_now",
+    "charge_full",
+)
+ADAPTER_ATTRIBUTES = ("online",)
+ADAPTER_TYPES = {"Mains", "USB", "USB_C", "USB_PD", "USB_PD_DRP", "UPS"}
+ON_POWER_BATTERY_STATUSES = {"Charging", "Full", "Not charging"}
+
+# Chaves do status que mudam a cada ciclo e não justificam uma gravação
+VOLATILE_STATUS_KEYS = {"last_check"}
+
+
+def atomic_write_json(path, data):
+    """
+    Grava um arquivo JSON de forma atômica (escrita em arquivo temporário,
+    fsync e rename), para que uma queda no meio da gravação nunca deixe
+    o arquivo truncado.
+
+    Args:
+        path (str): Caminho do arquivo de destino.
+        data: Conteúdo serializável em JSON.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = "{}.tmp".format(path)
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+    # Garante que o rename em si seja persistido (não suportado no Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def get_file_signature(path):
+    """
+    Obtém uma assinatura barata (mtime e tamanho) para detectar alterações em um arquivo.
+
+    Args:
+        path (str): Caminho do arquivo.
+
+    Returns:
+        tuple: (mtime_ns, tamanho), ou None se o arquivo não existir.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
-def load_service_config():
+def load_service_config(fallback=None):
     """
     Carrega a configuração do serviço do arquivo JSON.
 
+    Args:
+        fallback (dict, optional): Configuração retornada se o arquivo
+        estiver inválido. Por padrão, a configuração padrão.
+
     Returns:
         dict: Configuração do serviço.
     """
-    default_config = {
-        "battery_threshold": 25,
-        "time_without_charger": 10,  # minutos
-        "delay_after_power_restore": 2,  # minutos
-        "last_execution": None,
-        "power_failure_detected": False,
-    }
+    default_config = default_service_config()
 
     if os.path.exists(CONFIG_FILE):
         try:
@@ -90,6 +200,12 @@ def load_service_config():
                         config[key] = value
                 return config
         except json.JSONDecodeError:
+            if fallback is not None:
+                logger.error(
+                    "Erro ao ler %s. Mantendo a configuração anterior.",
+                    CONFIG_FILE,
+                )
+                return fallback
             logger.error(
                 "Erro ao ler %s. Usando configuração padrão.",
                 CONFIG_FILE,
@@ -97,8 +213,7 @@ def load_service_config():
             return default_config
     else:
         # Cria um arquivo de configuração padrão
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, indent=4)
+        atomic_write_json(CONFIG_FILE, default_config)
         return default_config
 
 
@@ -109,8 +224,7 @@ def save_service_config(config):
     Args:
         config (dict): Configuração do serviço.
     """
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4)
+    atomic_write_json(CONFIG_FILE, config)
 
 
 def load_power_status():
@@ -126,6 +240,9 @@ def load_power_status():
         "shutdown_executed": False,
         "computers_to_wake": [],
         "power_restored_time": None,
+        "shutdown_duration": None,
+        "shutdown_trigger": None,
+        "outage_id": None,
     }
 
     if os.path.exists(STATUS_FILE):
@@ -142,8 +259,7 @@ def load_power_status():
             return default_status
     else:
         # Cria um arquivo de status padrão
-        with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(default_status, f, indent=4)
+        atomic_write_json(STATUS_FILE, default_status)
         return default_status
 
 
@@ -154,73 +270,469 @@ def save_power_status(status):
     Args:
         status (dict): Status de energia.
     """
-    with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(status, f, indent=4)
+    atomic_write_json(STATUS_FILE, status)
 
 
-def get_battery_status():  # pylint: disable=too-many-return-statements
+class MonitorState:
     """
-    Obtém o status da bateria do sistema.
+    Configuração e status de energia mantidos em memória entre os ciclos.
 
-    Returns:
-        tuple: (porcentagem_bateria, conectado_energia)
+    A configuração só é relida quando o arquivo muda ou quando um SIGHUP
+    é recebido, e o status só é gravado em disco quando há uma transição.
+    """
+
+    def __init__(self):
+        self.config = load_service_config()
+        self.config_signature = get_file_signature(CONFIG_FILE)
+        self.status = load_power_status()
+        self.persisted_status = self._snapshot()
+        self.reload_requested = False
+        # Protege o status das gravações feitas pela thread das ações em lote
+        self.lock = threading.Lock()
+
+    def _snapshot(self):
+        """Retorna uma cópia do status sem as chaves voláteis."""
+        return copy.deepcopy(
+            {key: value for key, value in self.status.items() if key not in VOLATILE_STATUS_KEYS}
+        )
+
+    def status_snapshot(self):
+        """Retorna uma cópia do status tirada sob o lock."""
+        with self.lock:
+            return copy.deepcopy(self.status)
+
+    def request_reload(self, signum=None, frame=None):  # pylint: disable=unused-argument
+        """Solicita a releitura da configuração no próximo ciclo (handler de SIGHUP)."""
+        self.reload_requested = True
+
+    def refresh_config(self):
+        """
+        Relê a configuração se o arquivo mudou ou se houve solicitação explícita.
+
+        Returns:
+            bool: True se a configuração foi recarregada.
+        """
+        signature = get_file_signature(CONFIG_FILE)
+        if not self.reload_requested and signature == self.config_signature:
+            return False
+
+        self.reload_requested = False
+        self.config_signature = signature
+        self.config = load_service_config(fallback=self.config)
+        logger.info("Configuração do serviço recarregada.")
+        return True
+
+    def persist_status(self):
+        """
+        Grava o status em disco apenas se houve alguma transição desde a última gravação.
+
+        Returns:
+            bool: True se o status foi gravado.
+        """
+        snapshot = self._snapshot()
+        if snapshot == self.persisted_status:
+            return False
+
+        save_power_status(self.status)
+        self.persisted_status = snapshot
+        return True
+
+
+BatterySample = collections.namedtuple(
+    "BatterySample", ["percent", "on_power", "timestamp", "runtime"], defaults=(None,)
+)
+BatterySample.__doc__ = """
+Leitura imutável da bateria, obtida uma única vez por ciclo.
+
+Attributes:
+    percent (int): Porcentagem da bateria, ou None se indisponível.
+    on_power (bool): True se conectado à energia elétrica.
+    timestamp (datetime.datetime): Momento da leitura.
+    runtime (int): Autonomia informada pela fonte (em segundos), ou None.
+"""
+
+
+class PowerSupply:
     """
-    system = platform.system()
+    Fonte de energia do sysfs com os arquivos de atributos mantidos abertos.
 
-    if system == "Windows":
+    Attributes:
+        name (str): Nome do diretório (por exemplo, "BAT0" ou "AC").
+        kind (str): Valor do atributo "type" (por exemplo, "Battery" ou "Mains").
+        files (dict): Atributo -> arquivo aberto, apenas para os atributos existentes.
+    """
+
+    def __init__(self, path, kind, attributes):
+        self.name = os.path.basename(path)
+        self.kind = kind
+        self.files = {}
+        for attribute in attributes:
+            attribute_path = os.path.join(path, attribute)
+            if os.path.exists(attribute_path):
+                # pylint: disable-next=consider-using-with
+                self.files[attribute] = open(attribute_path, 'rb', buffering=0)
+
+    def read(self, attribute):
+        """
+        Relê um atributo a partir do início do arquivo.
+
+        Args:
+            attribute (str): Nome do atributo.
+
+        Returns:
+            str: Valor do atributo, ou None se a fonte não o expuser.
+        """
+        handle = self.files.get(attribute)
+        if handle is None:
+            return None
+        handle.seek(0)
+        return handle.read().decode('utf-8').strip()
+
+    def read_int(self, attribute):
+        """Relê um atributo numérico (None se ausente)."""
+        value = self.read(attribute)
+        return int(value) if value is not None else None
+
+    def close(self):
+        """Fecha os arquivos abertos."""
+        for handle in self.files.values():
+            try:
+                handle.close()
+            except OSError:
+                pass
+        self.files = {}
+
+
+class BatterySampler:
+    """
+    Obtém leituras da bateria do sistema.
+
+    No Linux, todas as entradas de /sys/class/power_supply são enumeradas
+    uma única vez e classificadas pelo atributo "type": baterias do sistema
+    (ignorando as de periféricos) e adaptadores de energia. Os arquivos de
+    atributos permanecem abertos entre as leituras; a enumeração só é
+    refeita após um hotplug (rescan()) ou uma falha de leitura.
+    """
+
+    def __init__(self, power_supply_dir=POWER_SUPPLY_DIR):
+        self.system = platform.system()
+        self.power_supply_dir = power_supply_dir
+        self.discovered = False
+        self.batteries = []
+        self.adapters = []
+
+    def _discover(self):
+        """Enumera e classifica as fontes de energia, abrindo os arquivos de leitura."""
         try:
-            # Verifica se existe uma bateria
-            battery = psutil.sensors_battery()
-            if battery:
-                return battery.percent, battery.power_plugged
-            else:
-                logger.error("Não foi possível obter o status da bateria (sem bateria).")
-                return (
-                    None,
-                    True,
-                )  # Assume conectado à energia se não houver bateria
-        except Exception as e:  # pylint: disable=broad-except
-            logger.error("Erro ao obter status da bateria: %s", e)
+            names = sorted(os.listdir(self.power_supply_dir))
+        except OSError:
+            names = []
+
+        for name in names:
+            path = os.path.join(self.power_supply_dir, name)
+            try:
+                with open(os.path.join(path, "type"), 'r', encoding='utf-8') as f:
+                    kind = f.read().strip()
+            except OSError:
+                continue
+
+            if kind == "Battery":
+                try:
+                    with open(os.path.join(path, "scope"), 'r', encoding='utf-8') as f:
+                        scope = f.read().strip()
+                except OSError:
+                    scope = "System"
+                # Baterias de periféricos (mouse, teclado) não alimentam o sistema
+                if scope == "Device":
+                    continue
+                self.batteries.append(PowerSupply(path, kind, BATTERY_ATTRIBUTES))
+            elif kind in ADAPTER_TYPES:
+                self.adapters.append(PowerSupply(path, kind, ADAPTER_ATTRIBUTES))
+
+        self.discovered = True
+        logger.info(
+            "Fontes de energia encontradas: baterias %s, adaptadores %s",
+            [battery.name for battery in self.batteries] or "-",
+            [adapter.name for adapter in self.adapters] or "-",
+        )
+        return bool(self.batteries or self.adapters)
+
+    def close(self):
+        """Fecha os arquivos abertos e esquece as fontes descobertas."""
+        for supply in self.batteries + self.adapters:
+            supply.close()
+        self.discovered = False
+        self.batteries = []
+        self.adapters = []
+
+    def rescan(self):
+        """Força uma nova enumeração das fontes na próxima leitura (após um hotplug)."""
+        self.close()
+
+    def _aggregate_capacity(self):
+        """
+        Calcula a carga total das baterias, ponderada pela energia de cada uma.
+
+        Usa energy_now/energy_full (µWh) quando todas as baterias os expõem,
+        depois charge_now/charge_full (µAh) e, por fim, a média simples de
+        capacity.
+
+        Returns:
+            int: Porcentagem agregada, ou None se não houver baterias.
+        """
+        if not self.batteries:
+            return None
+
+        for now_attribute, full_attribute in (
+            ("energy_now", "energy_full"),
+            ("charge_now", "charge_full"),
+        ):
+            if all(
+                now_attribute in battery.files and full_attribute in battery.files
+                for battery in self.batteries
+            ):
+                total_now = sum(battery.read_int(now_attribute) for battery in self.batteries)
+                total_full = sum(battery.read_int(full_attribute) for battery in self.batteries)
+                if total_full > 0:
+                    return min(100, round(total_now * 100 / total_full))
+
+        capacities = [battery.read_int("capacity") for battery in self.batteries]
+        capacities = [capacity for capacity in capacities if capacity is not None]
+        if not capacities:
+            return None
+        return round(sum(capacities) / len(capacities))
+
+    def _read_on_power(self):
+        """
+        Verifica se o sistema está conectado à energia elétrica.
+
+        Lê o atributo "online" dos adaptadores; sem adaptadores, usa o
+        status das baterias ("Not charging" também indica energia conectada).
+
+        Returns:
+            bool: True se conectado à energia.
+        """
+        online = [adapter.read_int("online") for adapter in self.adapters]
+        online = [value for value in online if value is not None]
+        if online:
+            return any(online)
+
+        statuses = [battery.read("status") for battery in self.batteries]
+        return any(status in ON_POWER_BATTERY_STATUSES for status in statuses)
+
+    def _read_linux(self):
+        """
+        Lê a bateria no Linux.
+
+        Returns:
+            tuple: (porcentagem_bateria, conectado_energia)
+        """
+        if not self.discovered and not self._discover():
+            logger.error("Não foi possível encontrar informações da bateria.")
+            return None, True
+
+        if not self.batteries and not self.adapters:
             return None, True
 
-    elif system == "Linux":
         try:
-            # Verifica se existe uma bateria
-            battery_path = "/sys/class/power_supply/BAT0"
-            if not os.path.exists(battery_path):
-                battery_path = "/sys/class/power_supply/BAT1"
-                if not os.path.exists(battery_path):
-                    logger.error("Não foi possível encontrar informações da bateria.")
-                    return None, True
-
-            # Obtém o status atual
-            with open("{}/status".format(battery_path), 'r', encoding='utf-8') as f:
-                status = f.read().strip()
-
-            # Obtém a porcentagem da bateria
-            with open("{}/capacity".format(battery_path), 'r', encoding='utf-8') as f:
-                capacity = int(f.read().strip())
-
-            # Verifica se está conectado à energia
-            connected = status in {"Charging", "Full"}
-
-            return capacity, connected
+            return self._aggregate_capacity(), self._read_on_power()
+        except (OSError, ValueError):
+            # Uma fonte pode ter sido removida; refaz a descoberta no próximo ciclo
+            self.close()
+            raise
+
+    def _read_windows(self):
+        """
+        Lê a bateria no Windows.
+
+        Returns:
+            tuple: (porcentagem_bateria, conectado_energia)
+        """
+        import psutil  # pylint: disable=import-outside-toplevel
+
+        battery = psutil.sensors_battery()
+        if battery:
+            return battery.percent, battery.power_plugged
+
+        logger.error("Não foi possível obter o status da bateria (sem bateria).")
+        # Assume conectado à energia se não houver bateria
+        return None, True
+
+    def sample(self):
+        """
+        Obtém uma leitura da bateria.
+
+        Returns:
+            BatterySample: Leitura atual. Em caso de erro, assume conectado à energia.
+        """
+        now = datetime.datetime.now()
+
+        try:
+            if self.system == "Windows":
+                percent, on_power = self._read_windows()
+            elif self.system == "Linux":
+                percent, on_power = self._read_linux()
+            else:
+                logger.error("Sistema operacional não suportado: %s", self.system)
+                percent, on_power = None, True
         except Exception as e:  # pylint: disable=broad-except
             logger.error("Erro ao obter status da bateria: %s", e)
-            return None, True
+            percent, on_power = None, True
+
+        return BatterySample(percent, on_power, now)
+
+
+_default_sampler = BatterySampler()
+
+# Despachante de notificações do serviço em execução (None fora dele)
+_notifier = None
+
+
+class NutPowerSource:
+    """
+    Fonte de energia baseada em um nobreak monitorado pelo Network UPS Tools.
+
+    Tem a mesma interface do BatterySampler (sample(), rescan() e close()) e
+    expõe probe() para a detecção rápida de mudanças na alimentação.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def sample(self):
+        """
+        Obtém uma leitura do nobreak.
+
+        Returns:
+            BatterySample: Leitura atual. Em caso de erro, assume conectado à energia.
+        """
+        now = datetime.datetime.now()
+        try:
+            percent, on_power, runtime = self.client.read_status()
+        except (NutError, ValueError) as e:
+            logger.error("Erro ao obter status do nobreak: %s", e)
+            return BatterySample(None, True, now)
+        return BatterySample(percent, on_power, now, runtime)
+
+    def probe(self):
+        """Informa se o nobreak está na energia elétrica (usado pelo detector de eventos)."""
+        return self.client.read_on_power()
+
+    def rescan(self):
+        """Não há fontes locais a enumerar."""
+
+    def close(self):
+        """Encerra a conexão com o upsd."""
+        self.client.close()
+
+
+def get_power_source_settings(service_config):
+    """
+    Extrai da configuração os parâmetros que definem a fonte de energia.
+
+    Args:
+        service_config (dict): Configuração do serviço.
+
+    Returns:
+        tuple: Parâmetros comparáveis entre recarregamentos da configuração.
+    """
+    nut = service_config.get("nut") or {}
+    return service_config.get("power_source", "local"), tuple(sorted(nut.items()))
+
+
+def create_power_source(service_config):
+    """
+    Cria a fonte de energia configurada.
+
+    Args:
+        service_config (dict): Configuração do serviço.
+
+    Returns:
+        BatterySampler ou NutPowerSource: Fonte com o método sample().
+    """
+    if service_config.get("power_source", "local") == "nut":
+        nut = service_config.get("nut") or {}
+        client = NutClient(
+            host=nut.get("host", "localhost"),
+            port=nut.get("port", NUT_DEFAULT_PORT),
+            ups=nut.get("ups", "ups"),
+            username=nut.get("username", ""),
+            password=nut.get("password", ""),
+            timeout=nut.get("timeout", NUT_DEFAULT_TIMEOUT),
+        )
+        logger.info("Usando o nobreak %s@%s como fonte de energia.", client.ups, client.host)
+        return NutPowerSource(client)
+
+    return _default_sampler
+
+
+def windows_power_probe():
+    """
+    Informa se o sistema está conectado à energia no Windows, para a detecção de eventos.
+
+    Returns:
+        bool: True se conectado à energia (ou sem bateria).
+    """
+    import psutil  # pylint: disable=import-outside-toplevel
+
+    battery = psutil.sensors_battery()
+    return battery.power_plugged if battery else True
+
+
+def create_event_detector(source):
+    """
+    Cria o detector de mudanças na alimentação adequado à fonte e ao sistema operacional.
+
+    Args:
+        source: Fonte de energia em uso.
 
+    Returns:
+        PowerEventDetector: Detector ainda não iniciado.
+    """
+    probe = getattr(source, "probe", None)
+    if probe is not None:
+        return PowerEventDetector(probe=probe)
+    if platform.system() == "Windows":
+        return PowerEventDetector(probe=windows_power_probe)
+    return PowerEventDetector(sysfs_root=POWER_SUPPLY_DIR)
+
+
+def get_battery_status():
+    """
+    Obtém o status da bateria do sistema.
+
+    Returns:
+        tuple: (porcentagem_bateria, conectado_energia)
+    """
+    sample = _default_sampler.sample()
+    return sample.percent, sample.on_power
+
+
+def notify(event_type, message, additional_info=None):
+    """
+    Envia uma notificação pela tarefa de notificações do serviço ou, fora
+    dele, diretamente.
+
+    Args:
+        event_type (str): Tipo do evento.
+        message (str): Mensagem da notificação.
+        additional_info (dict, optional): Informações adicionais.
+    """
+    if _notifier is not None:
+        _notifier(event_type, message, additional_info)
     else:
-        logger.error("Sistema operacional não suportado: %s", system)
-        return None, True
+        email_service.send_notification(event_type, message, additional_info)
 
 
-def should_shutdown(power_status, service_config):
+def should_shutdown(power_status, service_config, sample, history=None):
     """
     Verifica se deve desligar os computadores com base no status da bateria.
 
     Args:
         power_status (dict): Status de energia atual.
         service_config (dict): Configuração do serviço.
+        sample (BatterySample): Leitura da bateria do ciclo atual.
+        history (DrainHistory, optional): Histórico de descarga para estimar a autonomia.
 
     Returns:
         bool: True se deve desligar, False caso contrário.
@@ -229,7 +741,7 @@ def should_shutdown(power_status, service_config):
     if power_status["shutdown_executed"]:
         return False
 
-    battery_percent, on_power = get_battery_status()
+    battery_percent, on_power = sample.percent, sample.on_power
 
     # Se estiver conectado à energia elétrica, não precisa desligar
     if on_power:
@@ -237,13 +749,13 @@ def should_shutdown(power_status, service_config):
         power_status["on_battery_since"] = None
         return False
 
-    current_time = datetime.datetime.now().isoformat()
+    current_time = sample.timestamp.isoformat()
 
     # Se acabou de desconectar da energia
     if power_status["on_battery_since"] is None:
         power_status["on_battery_since"] = current_time
         logger.info("Desconectado da energia elétrica. Iniciando monitoramento.")
-        email_service.send_notification(
+        notify(
             "power_disconnected",
             "O sistema detectou que a energia elétrica foi desconectada. "
             f"O monitoramento de bateria foi iniciado e o comando de desligamento será executado em {service_config['time_without_charger']} minutos ou se a bateria do monitor cair para {service_config['battery_threshold']}%.",
@@ -253,9 +765,7 @@ def should_shutdown(power_status, service_config):
 
     # Verifica quanto tempo está sem energia
     on_battery_since = datetime.datetime.fromisoformat(power_status["on_battery_since"])
-    time_on_battery = (
-        datetime.datetime.now() - on_battery_since
-    ).total_seconds() / 60  # em minutos
+    time_on_battery = (sample.timestamp - on_battery_since).total_seconds() / 60  # em minutos
 
     # Informa se a bateria está próxima do limite
     # Se a porcentagem estiver a 5% do limite, avisa
@@ -265,7 +775,7 @@ def should_shutdown(power_status, service_config):
             battery_percent,
             service_config["battery_threshold"],
         )
-        email_service.send_notification(
+        notify(
             "low_battery",
             "Atenção: A bateria está em {}%, próximo do limite de {}%. O desligamento é iminente".format(
                 battery_percent, service_config["battery_threshold"]
@@ -280,9 +790,12 @@ def should_shutdown(power_status, service_config):
     # Condições para desligamento:
     # 1. Bateria abaixo do limite configurado
     # 2. Tempo sem energia acima do limite configurado
-    if (
-        battery_percent is not None and battery_percent <= service_config["battery_threshold"]
-    ) or (time_on_battery >= service_config["time_without_charger"]):
+    if battery_percent is not None and battery_percent <= service_config["battery_threshold"]:
+        power_status["shutdown_trigger"] = "battery_threshold"
+    elif time_on_battery >= service_config["time_without_charger"]:
+        power_status["shutdown_trigger"] = "time_without_charger"
+
+    if power_status.get("shutdown_trigger"):
         logger.warning(
             "Condição para desligamento atingida: "
             "Bateria: %s%% (limite: %s%%), "
@@ -294,16 +807,34 @@ def should_shutdown(power_status, service_config):
         )
         return True
 
+    # 3. Autonomia estimada menor que o tempo necessário para desligar todos
+    if history is not None and service_config["runtime_prediction"]:
+        remaining = history.time_to_empty(sample, service_config["runtime_reserve_percent"])
+        shutdown_duration = (
+            power_status.get("shutdown_duration") or service_config["default_shutdown_duration"]
+        )
+        required = shutdown_duration + service_config["runtime_margin"]
+        if remaining is not None and remaining <= required:
+            power_status["shutdown_trigger"] = "runtime_prediction"
+            logger.warning(
+                "Condição para desligamento atingida: "
+                "Autonomia estimada: %.0f s (necessário: %.0f s para desligar os computadores)",
+                remaining,
+                required,
+            )
+            return True
+
     return False
 
 
-def should_poweron(power_status, service_config):
+def should_poweron(power_status, service_config, sample):
     """
     Verifica se deve ligar os computadores após restauração de energia.
 
     Args:
         power_status (dict): Status de energia atual.
         service_config (dict): Configuração do serviço.
+        sample (BatterySample): Leitura da bateria do ciclo atual.
 
     Returns:
         bool: True se deve ligar, False caso contrário.
@@ -312,7 +843,7 @@ def should_poweron(power_status, service_config):
     if not power_status["shutdown_executed"]:
         return False
 
-    battery_percent, on_power = get_battery_status()
+    battery_percent, on_power = sample.percent, sample.on_power
 
     # Se não estiver conectado à energia elétrica, não pode ligar
     if not on_power:
@@ -321,14 +852,14 @@ def should_poweron(power_status, service_config):
     # Verifica se já passou o tempo de atraso após a restauração da energia
     if power_status.get("power_restored_time") is None:
         # Primeira vez que detecta a restauração da energia
-        power_status["power_restored_time"] = datetime.datetime.now().isoformat()
+        power_status["power_restored_time"] = sample.timestamp.isoformat()
         logger.info(
             "Energia restaurada. Aguardando %s minutos para ligar os computadores.",
             service_config["delay_after_power_restore"],
         )
 
         # Notifica sobre restauração de energia
-        email_service.send_notification(
+        notify(
             "power_restored",
             "A energia elétrica foi restaurada. Os computadores serão ligados automaticamente "
             "após {} minutos.".format(service_config["delay_after_power_restore"]),
@@ -339,7 +870,7 @@ def should_poweron(power_status, service_config):
     # Calcula quanto tempo passou desde a restauração da energia
     power_restored_time = datetime.datetime.fromisoformat(power_status["power_restored_time"])
     time_since_restore = (
-        datetime.datetime.now() - power_restored_time
+        sample.timestamp - power_restored_time
     ).total_seconds() / 60  # em minutos
 
     # Verifica se já passou o tempo de atraso
@@ -349,114 +880,1046 @@ def should_poweron(power_status, service_config):
     return False
 
 
-def main_loop():
+def next_check_interval(power_status, service_config, sample):
     """
-    Loop principal do serviço de monitoramento.
+    Calcula o intervalo até a próxima verificação de acordo com o estado da energia.
+
+    Na energia elétrica o intervalo é longo (as mudanças são detectadas por
+    eventos); na bateria ele encolhe e, perto do limite de bateria, diminui
+    linearmente até o mínimo configurado. O intervalo nunca ultrapassa o
+    prazo de desligamento por tempo nem o atraso para religar.
+
+    Args:
+        power_status (dict): Status de energia atual.
+        service_config (dict): Configuração do serviço.
+        sample (BatterySample): Leitura da bateria do ciclo atual.
+
+    Returns:
+        float: Intervalo em segundos.
     """
-    logger.info("Iniciando serviço de monitoramento de energia...")
-    logger.info(
-        "Log configurado com rotação: tamanho máximo %.1fMB, mantendo %s backups",
-        LOG_MAX_SIZE / 1024 / 1024,
-        LOG_BACKUP_COUNT,
-    )
+    minimum = service_config["check_interval_min"]
+    on_battery = service_config["check_interval_on_battery"]
+    maximum = service_config["check_interval_max"]
+
+    if sample.on_power:
+        interval = maximum
+        deadline_minutes = service_config["delay_after_power_restore"]
+        started_at = power_status.get("power_restored_time")
+    else:
+        interval = on_battery
+        if sample.percent is not None:
+            margin = sample.percent - service_config["battery_threshold"]
+            if margin < NEAR_THRESHOLD_MARGIN:
+                fraction = max(margin, 0) / NEAR_THRESHOLD_MARGIN
+                interval = minimum + (on_battery - minimum) * fraction
+        deadline_minutes = service_config["time_without_charger"]
+        started_at = power_status.get("on_battery_since")
+
+    # Não deixa passar o prazo de desligamento ou de religamento
+    if started_at is not None:
+        elapsed = (sample.timestamp - datetime.datetime.fromisoformat(started_at)).total_seconds()
+        interval = min(interval, deadline_minutes * 60 - elapsed)
+
+    return max(minimum, min(interval, maximum))
+
+
+def open_outbox(service_config):
+    """
+    Abre a fila persistente de notificações.
+
+    Se o arquivo não puder ser aberto, usa uma fila apenas em memória, para
+    que as notificações continuem fora do caminho das decisões.
+
+    Args:
+        service_config (dict): Configuração do serviço.
+
+    Returns:
+        NotificationOutbox: Fila de notificações ainda não iniciada.
+    """
+    settings = {
+        "max_attempts": service_config["notification_max_attempts"],
+        "initial_delay": service_config["notification_retry_delay"],
+        "max_delay": service_config["notification_retry_max_delay"],
+    }
+    try:
+        return NotificationOutbox(
+            email_service.send_notification, service_config["outbox_file"], **settings
+        )
+    except sqlite3.Error as e:
+        logger.error("Fila de notificações mantida apenas em memória: %s", e)
+        return NotificationOutbox(email_service.send_notification, ":memory:", **settings)
+
+
+def open_journal(service_config):
+    """
+    Abre o registro de eventos de energia.
+
+    Args:
+        service_config (dict): Configuração do serviço.
 
-    while True:
+    Returns:
+        EventJournal: Registro aberto, ou None se não for possível abri-lo.
+    """
+    try:
+        return EventJournal(service_config["journal_file"])
+    except sqlite3.Error as e:
+        logger.error("Registro de eventos desabilitado: %s", e)
+        return None
+
+
+def journal_event(journal, kind, power_status, sample=None, detail=None):
+    """
+    Registra um evento sem interromper o monitoramento em caso de erro.
+
+    Args:
+        journal (EventJournal): Registro de eventos (ou None se desabilitado).
+        kind (str): Tipo do evento.
+        power_status (dict): Status de energia atual (fornece o id da queda).
+        sample (BatterySample, optional): Leitura do ciclo atual.
+        detail (str, optional): Informação adicional.
+    """
+    if journal is None:
+        return
+    try:
+        if kind == "outage_start":
+            power_status["outage_id"] = journal.start_outage(
+                sample.percent, sample.timestamp.timestamp()
+            )
+        else:
+            journal.record_event(
+                kind,
+                power_status.get("outage_id"),
+                detail,
+                sample.percent if sample else None,
+            )
+    except sqlite3.Error as e:
+        logger.error("Erro ao registrar evento %s: %s", kind, e)
+
+
+def make_action_recorder(journal, action, power_status):
+    """
+    Cria o callback que registra o resultado de cada computador de uma ação em lote.
+
+    Args:
+        journal (EventJournal): Registro de eventos (ou None se desabilitado).
+        action (str): "shutdown" ou "wake".
+        power_status (dict): Status de energia atual (fornece o id da queda).
+
+    Returns:
+        callable: Callback para shutdown_all_auto/wake_on_lan_all_auto, ou None.
+    """
+    if journal is None:
+        return None
+
+    def record(computer, success, duration, error=None):
         try:
-            # Carrega as configurações e o status atual
-            service_config = load_service_config()
-            power_status = load_power_status()
-
-            # Atualiza o horário da última verificação
-            power_status["last_check"] = datetime.datetime.now().isoformat()
-
-            # Verifica o status da bateria
-            battery_percent, on_power = get_battery_status()
-            logger.info(
-                "Status da bateria: %s%%, Conectado à energia: %s",
-                battery_percent,
-                on_power,
+            journal.record_host_action(
+                computer["name"], action, success, duration, error, power_status.get("outage_id")
             )
+        except sqlite3.Error as e:
+            logger.error("Erro ao registrar %s de %s: %s", action, computer["name"], e)
 
-            # Verifica se deve desligar os computadores
-            if should_shutdown(power_status, service_config):
-                logger.warning("Executando desligamento de emergência dos computadores...")
+    return record
 
-                # Executa o desligamento
-                shutdown_count = shutdown_all_auto()
 
-                # Atualiza o status
-                power_status["shutdown_executed"] = True
-                power_status["shutdown_time"] = datetime.datetime.now().isoformat()
+def journal_transitions(journal, power_status, previous, sample):
+    """
+    Registra as transições de estado ocorridas no ciclo.
 
-                logger.info(
-                    "%s computadores foram desligados devido à falha de energia.",
-                    shutdown_count,
-                )
+    Args:
+        journal (EventJournal): Registro de eventos (ou None se desabilitado).
+        power_status (dict): Status de energia após as decisões do ciclo.
+        previous (dict): Valores de on_battery_since e power_restored_time antes das decisões.
+        sample (BatterySample): Leitura do ciclo atual.
+    """
+    if previous["on_battery_since"] is None and power_status["on_battery_since"] is not None:
+        journal_event(journal, "outage_start", power_status, sample)
 
-                # Notificação de desligamento
-                computers = load_computers()
-                auto_shutdown_computers = [
-                    comp for comp in computers if comp.get("auto_power_off", False)
-                ]
+    if previous["power_restored_time"] is None and power_status["power_restored_time"]:
+        journal_event(journal, "power_restored", power_status, sample)
 
-                on_battery_since = datetime.datetime.fromisoformat(
-                    power_status["on_battery_since"]
-                )
-                time_on_battery = (datetime.datetime.now() - on_battery_since).total_seconds() / 60
-
-                email_service.send_notification(
-                    "shutdown_initiated",
-                    "O sistema iniciou o desligamento de emergência dos computadores devido à falha "
-                    "de energia prolongada ou bateria baixa.",
-                    {
-                        "on_power": False,
-                        "battery_percent": battery_percent,
-                        "on_battery_time": "{:.1f}".format(time_on_battery),
-                        "computers": auto_shutdown_computers,
-                    },
-                )
+    if previous["on_battery_since"] is not None and power_status["on_battery_since"] is None:
+        journal_event(journal, "outage_end", power_status, sample)
+        power_status["outage_id"] = None
+        power_status["shutdown_trigger"] = None
 
-            # Verifica se deve ligar os computadores
-            elif should_poweron(power_status, service_config):
-                logger.info("Ligando computadores após restauração de energia...")
 
-                # Executa a ligação
-                poweron_count = wake_on_lan_all_auto()
+def combine_callbacks(*callbacks):
+    """
+    Combina vários callbacks de resultado em um só, ignorando os ausentes.
 
-                # Notificação de ligação
-                computers = load_computers()
-                auto_poweron_computers = [
-                    comp for comp in computers if comp.get("auto_power_on", False)
-                ]
+    Returns:
+        callable: Callback que repassa os argumentos a todos os informados.
+    """
+    callbacks = [callback for callback in callbacks if callback is not None]
+
+    def combined(*args):
+        for callback in callbacks:
+            callback(*args)
+
+    return combined
 
-                email_service.send_notification(
-                    "poweron_initiated",
-                    "O sistema iniciou a ligação remota dos computadores após a restauração da energia elétrica.",
-                    {"on_power": True, "computers": auto_poweron_computers},
-                )
 
-                # Reseta o status
-                power_status["shutdown_executed"] = False
-                power_status["power_restored_time"] = None
-                power_status["on_battery_since"] = None
+def describe_computers(computers):
+    """
+    Resume os computadores para as notificações, sem as credenciais do cadastro.
+
+    Args:
+        computers (list): Computadores do cadastro.
+
+    Returns:
+        list: Dicionários apenas com o nome e o endereço de cada computador.
+    """
+    return [{"name": comp["name"], "hostname": comp.get("hostname")} for comp in computers]
+
+
+def run_shutdown(  # pylint: disable=too-many-arguments
+    workflow, journal, power_status, sample, latest_sample, on_result=None, status_lock=None
+):
+    """
+    Executa (ou retoma) o desligamento de emergência dos computadores.
+
+    Os computadores a desligar são gravados no journal do fluxo antes do
+    início; ao retomar após uma queda do serviço, apenas os pendentes são
+    processados. A energia continua sendo verificada antes de cada
+    computador: se ela voltar, os restantes não são desligados e apenas os
+    que já foram desligados são entregues ao religamento.
+
+    Args:
+        workflow (OutageWorkflow): Máquina de estados da queda.
+        journal (EventJournal): Registro de eventos (ou None se desabilitado).
+        power_status (dict): Status de energia atual.
+        sample (BatterySample): Leitura da bateria do ciclo atual.
+        latest_sample (callable): Retorna a leitura mais recente da fonte de energia,
+        consultada durante o desligamento.
+        on_result (callable, optional): Callback adicional com o resultado de cada computador.
+        status_lock (threading.Lock, optional): Lock mantido ao alterar power_status.
+    """
+    status_lock = status_lock or contextlib.nullcontext()
+    computers = load_computers()
+    auto_shutdown_computers = [comp for comp in computers if comp.get("auto_power_off", False)]
+
+    if workflow.phase != SHUTTING_DOWN:
+        workflow.transition(SHUTTING_DOWN, [comp["name"] for comp in auto_shutdown_computers])
+
+    pending = set(workflow.pending())
+    pending_computers = [comp for comp in computers if comp["name"] in pending]
+
+    aborted = []
+
+    def power_returned():
+        if latest_sample().on_power:
+            aborted.append(True)
+        return bool(aborted)
+
+    # Executa o desligamento, medindo quanto tempo leva para a próxima estimativa
+    shutdown_started = time.monotonic()
+    shutdown_all_auto(
+        combine_callbacks(
+            lambda comp, success, *_: workflow.host_finished(comp, success),
+            make_action_recorder(journal, "shutdown", power_status),
+            on_result,
+        ),
+        computers=pending_computers,
+        on_start=workflow.host_started,
+        should_abort=power_returned,
+    )
+    shutdown_duration = time.monotonic() - shutdown_started
+    shut_down_names = list(workflow.completed["shutdown"])
+    shutdown_count = len(shut_down_names)
+    workflow.transition(SHUT_DOWN)
+
+    if aborted and not shut_down_names:
+        # Nenhum computador chegou a ser desligado: não há nada a religar
+        logger.warning("Energia restaurada antes do desligamento de qualquer computador.")
+        journal_event(journal, "shutdown_aborted", power_status)
+        workflow.transition(IDLE)
+        return
+
+    # Atualiza o status
+    with status_lock:
+        power_status["shutdown_executed"] = True
+        power_status["shutdown_time"] = datetime.datetime.now().isoformat()
+        if aborted:
+            # Só os computadores efetivamente desligados precisam ser religados
+            power_status["computers_to_wake"] = shut_down_names
+        else:
+            power_status["computers_to_wake"] = []
+            # Uma execução retomada não representa a duração de um desligamento completo
+            if len(pending_computers) == len(auto_shutdown_computers):
+                power_status["shutdown_duration"] = round(shutdown_duration, 1)
+
+    if aborted:
+        logger.warning(
+            "Energia restaurada durante o desligamento. Computadores já desligados: %s",
+            ", ".join(shut_down_names) or "nenhum",
+        )
+        journal_event(journal, "shutdown_aborted", power_status, detail=", ".join(shut_down_names))
+        notify(
+            "shutdown_aborted",
+            "A energia elétrica voltou durante o desligamento de emergência. Os computadores "
+            "restantes não foram desligados e os {} já desligados serão religados.".format(
+                shutdown_count
+            ),
+            {
+                "on_power": True,
+                "computers": describe_computers(
+                    comp for comp in auto_shutdown_computers if comp["name"] in shut_down_names
+                ),
+            },
+        )
+        return
+
+    logger.info(
+        "%s computadores foram desligados devido à falha de energia.",
+        shutdown_count,
+    )
+
+    # Notificação de desligamento
+    on_battery_since = datetime.datetime.fromisoformat(
+        power_status["on_battery_since"] or sample.timestamp.isoformat()
+    )
+    time_on_battery = (datetime.datetime.now() - on_battery_since).total_seconds() / 60
+
+    notify(
+        "shutdown_initiated",
+        "O sistema iniciou o desligamento de emergência dos computadores devido à falha "
+        "de energia prolongada ou bateria baixa.",
+        {
+            "on_power": False,
+            "battery_percent": sample.percent,
+            "on_battery_time": "{:.1f}".format(time_on_battery),
+            "computers": describe_computers(auto_shutdown_computers),
+        },
+    )
+
+
+def run_poweron(workflow, journal, power_status, on_result=None, status_lock=None):
+    """
+    Executa (ou retoma) a ligação dos computadores após a restauração da energia.
+
+    Liga os computadores marcados como auto_power_on ou, se o desligamento
+    foi interrompido, exatamente os que chegaram a ser desligados.
+
+    Args:
+        workflow (OutageWorkflow): Máquina de estados da queda.
+        journal (EventJournal): Registro de eventos (ou None se desabilitado).
+        power_status (dict): Status de energia atual.
+        on_result (callable, optional): Callback adicional com o resultado de cada computador.
+        status_lock (threading.Lock, optional): Lock mantido ao alterar power_status.
+    """
+    computers = load_computers()
+    computers_to_wake = power_status.get("computers_to_wake")
+    if computers_to_wake:
+        auto_poweron_computers = [comp for comp in computers if comp["name"] in computers_to_wake]
+    else:
+        auto_poweron_computers = [comp for comp in computers if comp.get("auto_power_on", False)]
+
+    if workflow.phase != WAKING:
+        workflow.transition(WAKING, [comp["name"] for comp in auto_poweron_computers])
+
+    pending = set(workflow.pending())
+    pending_computers = [comp for comp in computers if comp["name"] in pending]
+
+    # Executa a ligação
+    wake_on_lan_all_auto(
+        combine_callbacks(
+            lambda comp, success, *_: workflow.host_finished(comp, success),
+            make_action_recorder(journal, "wake", power_status),
+            on_result,
+        ),
+        computers=pending_computers,
+        on_start=workflow.host_started,
+    )
+    poweron_count = len(workflow.completed["wake"])
+
+    # Notificação de ligação
+    notify(
+        "poweron_initiated",
+        "O sistema iniciou a ligação remota dos computadores após a restauração da energia elétrica.",
+        {"on_power": True, "computers": describe_computers(auto_poweron_computers)},
+    )
+
+    # Reseta o status
+    with status_lock or contextlib.nullcontext():
+        power_status["shutdown_executed"] = False
+        power_status["power_restored_time"] = None
+        power_status["on_battery_since"] = None
+        power_status["computers_to_wake"] = []
+    workflow.transition(IDLE)
+
+    logger.info(
+        "%s computadores foram ligados após a restauração de energia.",
+        poweron_count,
+    )
+
+
+def sync_workflow(workflow, power_status):
+    """
+    Acompanha no fluxo da queda as transições que não envolvem computadores.
+
+    Args:
+        workflow (OutageWorkflow): Máquina de estados da queda.
+        power_status (dict): Status de energia após as decisões do ciclo.
+    """
+    on_battery = power_status["on_battery_since"] is not None
+    if on_battery and workflow.phase == IDLE:
+        workflow.transition(ON_BATTERY)
+    elif not on_battery and workflow.phase == ON_BATTERY:
+        workflow.transition(IDLE)
+
+
+def recover_workflow_status(workflow, power_status):
+    """
+    Alinha o status de energia com a fase retomada do fluxo da queda.
+
+    O journal do fluxo é gravado antes do status: se o serviço cair entre os
+    dois, o status em disco ainda não indica o desligamento. A fase retomada
+    prevalece, para que um desligamento já concluído não seja executado de novo.
+
+    Args:
+        workflow (OutageWorkflow): Máquina de estados reconstruída do journal.
+        power_status (dict): Status de energia carregado do disco.
+    """
+    if workflow.phase not in {SHUT_DOWN, WAKING} or power_status["shutdown_executed"]:
+        return
+
+    if workflow.phase == SHUT_DOWN and not workflow.completed["shutdown"]:
+        # Desligamento interrompido antes do primeiro computador: nada a religar
+        logger.warning("Fluxo de queda retomado sem computadores desligados. Voltando ao início.")
+        workflow.transition(IDLE)
+        return
+
+    logger.warning("Fluxo de queda retomado em %s: desligamento já executado.", workflow.phase)
+    power_status["shutdown_executed"] = True
+    if not power_status.get("shutdown_time"):
+        power_status["shutdown_time"] = datetime.datetime.now().isoformat()
+
+
+class MonitorService:  # pylint: disable=too-many-instance-attributes
+    """
+    Serviço de monitoramento organizado em tarefas asyncio independentes.
+
+    - leitura: aguarda uma mudança na alimentação ou o intervalo e lê a fonte de energia;
+    - decisão: avalia cada leitura e agenda desligamentos e religamentos;
+    - computadores: executa as ações em lote (SSH, Wake-on-LAN), uma de cada vez;
+    - notificações: filtradas pela política de envio e despachadas ao mesmo
+      tempo para todos os canais (email via fila persistente, webhook,
+      syslog, socket Unix), cada um com a sua thread.
+
+    As chamadas bloqueantes (sysfs/upsd, paramiko, smtplib) rodam fora do
+    loop, em executores ou threads próprios, de modo que um servidor SMTP lento
+    ou um computador que não responde não atrasam as leituras nem as decisões.
+    """
+
+    def __init__(self):
+        self.state = MonitorState()
+
+        # Compila o template de email antes da primeira notificação
+        email_service.warm_templates()
+        self.history = DrainHistory(self.state.config["runtime_window"])
+        self.journal = open_journal(self.state.config)
+        self.metrics = MonitorMetrics()
+        self.metrics_server = None
+        self.outbox = open_outbox(self.state.config)
+        self.outbox.on_delivery = self.metrics.observe_delivery
+        self.sink_settings = None
+        self.notifier = self.create_notifier()
+        self.policy = NotificationPolicy(
+            self.dispatch_notification, self.state.config["notification_policy"]
+        )
+        self.workflow = OutageWorkflow(self.state.config["workflow_file"])
+        recover_workflow_status(self.workflow, self.state.status)
+        self.state.persist_status()
+
+        # Histórico compacto em disco de todas as leituras
+        try:
+            self.history_file = PowerHistoryFile(
+                self.state.config["history_file"],
+                self.state.config["history_capacity"],
+                writable=True,
+            )
+        except (OSError, ValueError) as e:
+            logger.error("Histórico de leituras desabilitado: %s", e)
+            self.history_file = None
+
+        # Estado atual para o "service status" e painéis, lido sem falar com o serviço
+        self.status_segment = None
+        status_file = self.state.config["status_file"]
+        if status_file:
+            try:
+                self.status_segment = StatusSegment(status_file, writable=True)
+            except (OSError, ValueError) as e:
+                logger.error("Segmento de status desabilitado: %s", e)
+
+        self.sampler = create_power_source(self.state.config)
+        self.power_source_settings = get_power_source_settings(self.state.config)
+        self.detector = create_event_detector(self.sampler)
+        self.sample = None
+        self.fleet_busy = False
+        # Operação em lote pedida pelo socket de controle em andamento e a leitura
+        # cuja ação automática ficou para depois dela
+        self.control_bulk_active = False
+        self.deferred_sample = None
+        # Serializa as trocas da fonte de energia, do detector e dos canais de notificação
+        self.config_lock = threading.Lock()
+
+        # Um executor por tarefa: cada uma executa suas chamadas bloqueantes em ordem
+        self.sampling_executor = ThreadPoolExecutor(1, thread_name_prefix="sampling")
+        # A espera por eventos de energia (até check_interval_max) tem a sua própria
+        # thread, para não atrasar as leituras avulsas e os reloads pedidos pelo socket
+        self.event_executor = ThreadPoolExecutor(1, thread_name_prefix="events")
+        self.fleet_executor = ThreadPoolExecutor(1, thread_name_prefix="fleet")
+        # Comandos recebidos pelo socket de controle (wake, shutdown avulsos)
+        self.control_executor = ThreadPoolExecutor(4, thread_name_prefix="control")
+        self.control = None
+        self.computers = None
+        self.computers_signature = None
+
+        self.loop = None
+        self.samples = None
+        self.fleet_jobs = None
+
+    async def run(self):
+        """Inicia as tarefas do serviço e aguarda até ser cancelado."""
+        global _notifier  # pylint: disable=global-statement
+
+        self.loop = asyncio.get_running_loop()
+        self.samples = asyncio.Queue()
+        self.fleet_jobs = asyncio.Queue()
+
+        # Notificações emitidas em qualquer thread passam a ser gravadas na fila de envio
+        _notifier = self.enqueue_notification
+        self.outbox.start()
+        self.notifier.start()
+
+        # Acorda a leitura imediatamente quando a alimentação muda
+        self.detector.start()
+
+        # Resultados das ações nos computadores alimentam as métricas
+        add_result_listener(self.metrics.observe_host_result)
+
+        # Permite recarregar a configuração com "kill -HUP" (indisponível no Windows)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.state.request_reload)
+
+        tasks = [
+            asyncio.ensure_future(self.sampling_task()),
+            asyncio.ensure_future(self.decision_task()),
+            asyncio.ensure_future(self.fleet_task()),
+        ]
+        if self.status_segment is not None:
+            tasks.append(asyncio.ensure_future(self.heartbeat_task()))
+        await self.start_control()
+        await self.start_metrics()
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.control is not None:
+                await self.control.close()
+            if self.metrics_server is not None:
+                await self.metrics_server.close()
+            remove_result_listener(self.metrics.observe_host_result)
+            _notifier = None
+            self.detector.stop()
+            self.policy.flush()
+            self.notifier.stop()
+            self.outbox.stop()
+            for executor in (
+                self.sampling_executor,
+                self.event_executor,
+                self.fleet_executor,
+                self.control_executor,
+            ):
+                executor.shutdown(wait=False)
+            if self.status_segment is not None:
+                self.status_segment.close()
+
+    async def start_control(self):
+        """Abre o socket de controle, se configurado e suportado pelo sistema."""
+        path = self.state.config["control_socket"]
+        if not path or not control_supported():
+            return
+        self.control = ControlServer(
+            path,
+            {
+                "status": self.control_status,
+                "wake": self.control_wake,
+                "shutdown": self.control_shutdown,
+                "reload": self.control_reload,
+                "probe": self.control_probe,
+            },
+        )
+        try:
+            await self.control.start()
+        except OSError as e:
+            logger.error("Socket de controle desabilitado: %s", e)
+            self.control = None
+
+    async def start_metrics(self):
+        """Abre o endpoint /metrics, se configurado."""
+        port = self.state.config["metrics_port"]
+        if not port:
+            return
+        self.metrics_server = MetricsServer(
+            self.metrics.registry, self.state.config["metrics_host"], port
+        )
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            logger.error("Endpoint de métricas desabilitado: %s", e)
+            self.metrics_server = None
+
+    def load_registry(self):
+        """Retorna o cadastro de computadores, relido apenas quando o arquivo muda."""
+        signature = get_file_signature(COMPUTERS_FILE)
+        if self.computers is None or signature != self.computers_signature:
+            self.computers = load_computers()
+            self.computers_signature = signature
+        return self.computers
+
+    def find_computer(self, target):
+        """
+        Procura um computador pelo nome no cadastro.
+
+        Args:
+            target (str): Nome do computador.
+
+        Returns:
+            dict: Configuração do computador.
+
+        Raises:
+            ControlError: Se o computador não estiver cadastrado.
+        """
+        for computer in self.load_registry():
+            if computer["name"].lower() == target.lower():
+                return computer
+        raise ControlError("Computador '{}' não encontrado.".format(target))
+
+    def publish_status(self):
+        """Publica no segmento de status a última leitura e a fase atual."""
+        if self.status_segment is not None:
+            self.status_segment.publish(self.sample, self.workflow.phase, self.fleet_busy)
+
+    def host_recorder(self, action):
+        """
+        Cria o callback que conta no segmento de status o resultado de cada computador.
+
+        Args:
+            action (str): "shutdown" ou "wake".
+
+        Returns:
+            callable: Callback (computer, success, ...), ou None sem o segmento de status.
+        """
+        if self.status_segment is None:
+            return None
+        segment = self.status_segment
+        return lambda computer, success, *_: segment.record_host(computer["name"], action, success)
+
+    async def heartbeat_task(self):
+        """Atualiza o heartbeat (e a fase, que muda durante as ações em lote)."""
+        while True:
+            self.publish_status()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def control_status(self, args):  # pylint: disable=unused-argument
+        """Comando status: estado atual do serviço."""
+        sample = self.sample._asdict() if self.sample is not None else None
+        return {
+            "pid": os.getpid(),
+            "phase": self.workflow.phase,
+            "fleet_busy": self.fleet_busy,
+            "power_source": self.state.config["power_source"],
+            "sample": sample,
+            "power_status": self.state.status_snapshot(),
+            "pending_notifications": len(self.outbox),
+        }
+
+    async def control_wake(self, args):
+        """
+        Comando wake: envia o pacote Wake-on-LAN para um MAC ou computador cadastrado.
+
+        Sem "target", liga vários computadores (veja control_bulk).
+        """
+        if "target" not in args:
+            return self.control_bulk("wake", args)
+        target = args["target"]
+        if ":" in target or "-" in target:
+            # MAC fora do cadastro: não há computador para contar no status nem nas métricas
+            await self.loop.run_in_executor(self.control_executor, wake_on_lan, target)
+            return {"target": target, "mac_address": target}
+        computer = self.find_computer(target)
+        result = await self.control_single("wake", computer)
+        if result.status != OK:
+            raise ControlError(result.error)
+        return {"target": target, "mac_address": computer["mac"]}
+
+    async def control_shutdown(self, args):
+        """
+        Comando shutdown: desliga um computador cadastrado.
+
+        Sem "target", desliga vários computadores (veja control_bulk).
+        """
+        if "target" not in args:
+            return self.control_bulk("shutdown", args)
+        computer = self.find_computer(args["target"])
+        result = await self.control_single("shutdown", computer)
+        if result.status != OK:
+            raise ControlError("Falha ao desligar {}: {}".format(computer["name"], result.error))
+        return {"target": computer["name"]}
+
+    async def control_single(self, action, computer):
+        """
+        Executa uma ação avulsa em um computador cadastrado.
+
+        A ação passa por iter_results, como as em lote, e por isso aparece nas
+        métricas (wol_host_actions) e no segmento de status.
+
+        Args:
+            action (str): "wake" ou "shutdown".
+            computer (dict): Computador cadastrado.
+
+        Returns:
+            HostResult: Resultado da ação.
+        """
+        iterate = iter_wake if action == "wake" else iter_shutdown
+        results = await self.loop.run_in_executor(
+            self.control_executor, list, iterate([computer])
+        )
+        self.record_control_result(computer, action, results[0].status == OK)
+        return results[0]
+
+    def control_bulk(self, action, args):
+        """
+        Prepara uma operação em lote pedida pelo socket de controle.
+
+        Args:
+            action (str): "wake" ou "shutdown".
+            args (dict): "selection" ("all" ou "auto", os marcados com
+            auto_power_on/auto_power_off) e "parallel" (computadores ao mesmo tempo).
+
+        Returns:
+            async generator: Eventos enviados ao cliente: primeiro {"total": n} e
+            depois o resultado (result_to_dict) de cada computador ao terminar.
+
+        Raises:
+            ControlError: Se os argumentos forem inválidos ou se o serviço já
+            estiver desligando ou ligando os computadores.
+        """
+        selection = args.get("selection", "all")
+        if selection not in {"all", "auto"}:
+            raise ControlError("Seleção inválida: {}".format(selection))
+        parallel = int(args.get("parallel", 1))
+        if not 1 <= parallel <= MAX_CONTROL_PARALLEL:
+            raise ControlError("parallel deve estar entre 1 e {}".format(MAX_CONTROL_PARALLEL))
+        if self.fleet_busy or self.control_bulk_active:
+            raise ControlError("O serviço está executando uma ação nos computadores.")
+
+        computers = list(self.load_registry())
+        if selection == "auto":
+            flag = "auto_power_on" if action == "wake" else "auto_power_off"
+            computers = [comp for comp in computers if comp.get(flag, False)]
+        iterate = iter_wake if action == "wake" else iter_shutdown
+        recorder = self.host_recorder(action)
+
+        async def events():
+            # Até o fim do lote, decide() não inicia o desligamento ou o religamento automático
+            self.control_bulk_active = True
+            try:
+                yield {"total": len(computers)}
+                results = iterate(computers, max_workers=parallel)
+                async for result in aiter_results(results, self.control_executor):
+                    if recorder is not None and result.status != SKIPPED:
+                        recorder({"name": result.host}, result.status == OK)
+                    yield result_to_dict(result)
+            finally:
+                self.control_bulk_active = False
+                # Reavalia a leitura cuja ação automática foi adiada pelo lote
+                if self.deferred_sample is not None:
+                    sample, self.deferred_sample = self.deferred_sample, None
+                    self.samples.put_nowait(sample)
+
+        return events()
+
+    def record_control_result(self, computer, action, success):
+        """Conta no segmento de status uma ação avulsa em um computador cadastrado."""
+        recorder = self.host_recorder(action)
+        if recorder is not None and computer is not None:
+            recorder(computer, success)
+
+    async def control_reload(self, args):  # pylint: disable=unused-argument
+        """Comando reload: relê a configuração e o cadastro de computadores."""
+        self.state.request_reload()
+        await self.reload_config()
+        self.computers = None
+        return {"power_source": self.state.config["power_source"]}
+
+    async def control_probe(self, args):  # pylint: disable=unused-argument
+        """Comando probe: faz uma leitura avulsa da fonte de energia."""
+        sample = await self.loop.run_in_executor(self.sampling_executor, self.sampler.sample)
+        return sample._asdict()
+
+    def create_notifier(self):
+        """Cria o despachante com o canal de email e os canais configurados."""
+        self.sink_settings = copy.deepcopy(self.state.config["notification_sinks"])
+        email_sink = CallbackSink(self.outbox_enqueue, "email")
+        sinks = create_sinks(self.sink_settings)
+        # O email é medido na fila persistente, onde o envio realmente acontece
+        for sink in sinks:
+            sink.on_delivery = self.metrics.observe_delivery
+        return Notifier([email_sink] + sinks)
+
+    def enqueue_notification(self, event_type, message, additional_info=None):
+        """Submete uma notificação à política de envio. Pode ser chamado de qualquer thread."""
+        self.policy.submit(event_type, message, additional_info)
+
+    def dispatch_notification(self, event_type, message, additional_info=None):
+        """Despacha para todos os canais uma notificação aprovada pela política."""
+        self.notifier.notify(event_type, message, additional_info)
+
+    def outbox_enqueue(self, event_type, message, additional_info=None):
+        """Grava na fila de emails uma notificação, se o evento estiver habilitado."""
+        if not email_service.is_notification_enabled(event_type):
+            return
+        try:
+            self.outbox.enqueue(event_type, message, additional_info)
+        except sqlite3.Error as e:
+            logger.error("Erro ao gravar a notificação %s na fila: %s", event_type, e)
+
+    async def reload_config(self):
+        """
+        Executa refresh_config() fora do loop, na fila das leituras.
+
+        Trocar o detector e os canais espera o fim das threads antigas e criar
+        a fonte pode abrir uma conexão com o upsd: no loop, isso congelaria o
+        socket de controle, o heartbeat e as métricas.
+        """
+        await self.loop.run_in_executor(self.sampling_executor, self.refresh_config)
+
+    def refresh_config(self):
+        """Relê a configuração se necessário e troca a fonte de energia se ela mudou."""
+        with self.config_lock:
+            if not self.state.refresh_config():
+                return
+            self.history.window = self.state.config["runtime_window"]
+            self.policy.rules = self.state.config["notification_policy"]
+            if self.state.config["notification_sinks"] != self.sink_settings:
+                self.notifier.stop()
+                self.notifier = self.create_notifier()
+                self.notifier.start()
+            if get_power_source_settings(self.state.config) == self.power_source_settings:
+                return
+
+            self.detector.stop()
+            self.sampler.close()
+            self.sampler = create_power_source(self.state.config)
+            self.power_source_settings = get_power_source_settings(self.state.config)
+            self.detector = create_event_detector(self.sampler)
+            self.detector.start()
+
+    async def wait_for_power_event(self, interval):
+        """
+        Aguarda uma mudança na alimentação ou o fim do intervalo, na thread de eventos.
+
+        Returns:
+            bool: True se uma mudança foi detectada.
+        """
+        return await self.loop.run_in_executor(self.event_executor, self.detector.wait, interval)
+
+    async def sampling_task(self):
+        """Lê a fonte de energia a cada intervalo ou mudança na alimentação."""
+        interval = 0
+        while True:
+            try:
+                if interval:
+                    # Aguarda o próximo ciclo ou uma mudança na alimentação
+                    changed = await self.wait_for_power_event(interval)
+                    if changed:
+                        logger.info("Mudança na alimentação detectada. Antecipando a verificação.")
+
+                # Fontes adicionadas ou removidas exigem uma nova enumeração
+                if self.detector.consume_hotplug():
+                    self.sampler.rescan()
+
+                # Usa a configuração em memória, relendo apenas se necessário
+                await self.reload_config()
+
+                # Uma única leitura da bateria alimenta todas as decisões do ciclo
+                started = time.monotonic()
+                sample = await self.loop.run_in_executor(
+                    self.sampling_executor, self.sampler.sample
+                )
+                self.sample = sample
+                self.history.add(sample)
+                if self.history_file is not None:
+                    self.history_file.append(sample)
 
                 logger.info(
-                    "%s computadores foram ligados após a restauração de energia.",
-                    poweron_count,
+                    "Status da bateria: %s%%, Conectado à energia: %s",
+                    sample.percent,
+                    sample.on_power,
                 )
 
-            # Salva o status atual
-            save_power_status(power_status)
+                # O intervalo seguinte depende do status após as decisões desta leitura
+                self.samples.put_nowait(sample)
+                await self.samples.join()
+                self.metrics.observe_sample(sample, self.workflow.phase)
+                self.metrics.tick_duration.observe(time.monotonic() - started)
+                interval = next_check_interval(self.state.status, self.state.config, sample)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Erro no ciclo de monitoramento: %s", e)
+                interval = CHECK_INTERVAL
+
+    async def decision_task(self):
+        """Avalia cada leitura sem esperar pelas ações em andamento."""
+        while True:
+            sample = await self.samples.get()
+            try:
+                self.decide(sample)
+                self.publish_status()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Erro ao avaliar a leitura de energia: %s", e)
+            finally:
+                self.samples.task_done()
+
+    def decide(self, sample):
+        """
+        Aplica as regras de desligamento e religamento a uma leitura.
+
+        Args:
+            sample (BatterySample): Leitura do ciclo atual.
+        """
+        service_config = self.state.config
+        power_status = self.state.status
+        workflow = self.workflow
+
+        # Atualiza o horário da última verificação
+        power_status["last_check"] = sample.timestamp.isoformat()
+
+        # Enquanto uma ação em lote está em andamento, o status pertence a ela
+        if self.fleet_busy:
+            return
+
+        previous = {
+            "on_battery_since": power_status["on_battery_since"],
+            "power_restored_time": power_status["power_restored_time"],
+        }
+        action = None
+        triggered = False
+
+        # Retoma um desligamento ou religamento interrompido por uma queda do serviço
+        if workflow.phase == SHUTTING_DOWN:
+            logger.warning("Retomando o desligamento interrompido dos computadores...")
+            action = "shutdown"
+
+        elif workflow.phase == WAKING:
+            logger.info("Retomando a ligação interrompida dos computadores...")
+            action = "poweron"
+
+        # Verifica se deve desligar os computadores
+        elif should_shutdown(power_status, service_config, sample, self.history):
+            action = "shutdown"
+            triggered = True
+
+        # Verifica se deve ligar os computadores
+        elif should_poweron(power_status, service_config, sample):
+            logger.info("Ligando computadores após restauração de energia...")
+            action = "poweron"
+
+        if action is not None and self.control_bulk_active:
+            # Não desliga e liga os mesmos computadores ao mesmo tempo: a leitura é
+            # reavaliada assim que o lote pedido pelo socket de controle terminar
+            logger.warning("Ação automática adiada até o fim da operação em lote em andamento.")
+            self.deferred_sample = sample
+            action = None
+
+        if action is not None:
+            if triggered:
+                logger.warning("Executando desligamento de emergência dos computadores...")
+                journal_event(
+                    self.journal,
+                    "shutdown_trigger",
+                    power_status,
+                    sample,
+                    power_status["shutdown_trigger"],
+                )
+            self.fleet_busy = True
+            self.fleet_jobs.put_nowait((action, sample, previous))
+            return
+
+        self.finish_cycle(sample, previous)
+
+    def finish_cycle(self, sample, previous):
+        """Registra as transições do ciclo e salva o status se houve mudança."""
+        power_status = self.state.status
+        sync_workflow(self.workflow, power_status)
+
+        # Registra início/fim de queda e restauração da energia
+        journal_transitions(self.journal, power_status, previous, sample)
+
+        # Cada queda começa sem o histórico de notificações da anterior
+        if previous["on_battery_since"] is not None and power_status["on_battery_since"] is None:
+            self.policy.reset()
+
+        # Salva o status apenas se houve transição
+        self.state.persist_status()
+
+    async def fleet_task(self):
+        """Executa os desligamentos e religamentos agendados, um de cada vez."""
+        while True:
+            action, sample, previous = await self.fleet_jobs.get()
+            try:
+                if action == "shutdown":
+                    await self.loop.run_in_executor(
+                        self.fleet_executor,
+                        run_shutdown,
+                        self.workflow,
+                        self.journal,
+                        self.state.status,
+                        sample,
+                        lambda: self.sample,
+                        self.host_recorder("shutdown"),
+                        self.state.lock,
+                    )
+                else:
+                    await self.loop.run_in_executor(
+                        self.fleet_executor,
+                        run_poweron,
+                        self.workflow,
+                        self.journal,
+                        self.state.status,
+                        self.host_recorder("wake"),
+                        self.state.lock,
+                    )
+                self.finish_cycle(sample, previous)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Erro ao executar a ação nos computadores: %s", e)
+            finally:
+                self.fleet_busy = False
+                self.publish_status()
 
-            # Aguarda o próximo ciclo
-            time.sleep(CHECK_INTERVAL)
 
-        except Exception as e:  # pylint: disable=broad-except
-            logger.error("Erro no ciclo de monitoramento: %s", e)
-            time.sleep(CHECK_INTERVAL)
+def main_loop():
+    """
+    Loop principal do serviço de monitoramento.
+    """
+    logger.info("Iniciando serviço de monitoramento de energia...")
+    logger.info(
+        "Log configurado com rotação: tamanho máximo %.1fMB, mantendo %s backups",
+        LOG_MAX_SIZE / 1024 / 1024,
+        LOG_BACKUP_COUNT,
+    )
+
+    asyncio.run(MonitorService().run())
 
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         main_loop()
     except KeyboardInterrupt:
@@ -0,0 +1,224 @@
+"""
+Fila persistente de notificações com envio em segundo plano.
+
+As notificações são gravadas em um banco SQLite e retornam imediatamente;
+uma thread as entrega na ordem de chegada. Em caso de falha (servidor
+SMTP fora do ar, rede indisponível), o envio é repetido com espera
+exponencial. Como a fila fica em disco, as notificações pendentes
+sobrevivem a reinícios do serviço.
+"""
+
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+# Constantes
+OUTBOX_FILE = "notification_outbox.db"
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_RETRY_DELAY = 30  # segundos até a primeira nova tentativa
+DEFAULT_MAX_RETRY_DELAY = 1800  # segundos
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    event_type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    context TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt);
+"""
+
+logger = logging.getLogger("PowerMonitor.outbox")
+
+
+def retry_delay(attempts, initial_delay, max_delay):
+    """
+    Calcula a espera antes da próxima tentativa (exponencial e limitada).
+
+    Args:
+        attempts (int): Tentativas já feitas.
+        initial_delay (float): Espera após a primeira falha (em segundos).
+        max_delay (float): Espera máxima (em segundos).
+
+    Returns:
+        float: Segundos até a próxima tentativa.
+    """
+    return min(initial_delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+class NotificationOutbox:  # pylint: disable=too-many-instance-attributes
+    """
+    Fila de notificações gravada em disco e entregue por uma thread própria.
+
+    enqueue() pode ser chamado de qualquer thread: apenas grava a
+    notificação e acorda a thread de entrega.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        sender,
+        path=OUTBOX_FILE,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        initial_delay=DEFAULT_RETRY_DELAY,
+        max_delay=DEFAULT_MAX_RETRY_DELAY,
+    ):
+        """
+        Args:
+            sender (callable): Função (event_type, message, context) que envia a
+            notificação e retorna True em caso de sucesso.
+            path (str): Caminho do banco SQLite (criado se não existir).
+            max_attempts (int): Tentativas antes de descartar uma notificação.
+            initial_delay (float): Espera após a primeira falha (em segundos).
+            max_delay (float): Espera máxima entre tentativas (em segundos).
+        """
+        self.sender = sender
+        # Função (canal, duração em segundos, entregue) chamada após cada envio
+        self.on_delivery = None
+        self.path = path
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def start(self):
+        """Inicia a thread de entrega (as notificações pendentes são enviadas primeiro)."""
+        pending = len(self)
+        if pending:
+            logger.info("%s notificações pendentes na fila de envio.", pending)
+        self._thread = threading.Thread(target=self._run, name="NotificationOutbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Encerra a thread de entrega. As notificações não enviadas continuam na fila.
+
+        Args:
+            timeout (float): Tempo máximo de espera pelo envio em andamento (em segundos).
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self):
+        """Encerra a thread de entrega e fecha o banco."""
+        self.stop()
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def enqueue(self, event_type, message, extra_context=None):
+        """
+        Grava uma notificação na fila e acorda a thread de entrega.
+
+        O horário do evento é guardado no contexto, para que uma notificação
+        entregue com atraso mostre quando o evento ocorreu.
+
+        Args:
+            event_type (str): Tipo do evento.
+            message (str): Mensagem da notificação.
+            extra_context (dict, optional): Contexto adicional para o template.
+
+        Returns:
+            int: Id da notificação na fila.
+        """
+        context = dict(extra_context or {})
+        context.setdefault("timestamp", datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+        now = time.time()
+
+        with self._lock, self._connection:
+            notification_id = self._connection.execute(
+                "INSERT INTO outbox (created, event_type, message, context, next_attempt)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (now, event_type, message, json.dumps(context, default=str), now),
+            ).lastrowid
+
+        self._wakeup.set()
+        return notification_id
+
+    def _next_due(self):
+        """Retorna a notificação mais antiga já liberada para envio, ou None."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT id, event_type, message, context, attempts FROM outbox"
+                " WHERE next_attempt <= ? ORDER BY id LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+
+    def _seconds_until_next(self):
+        """Retorna o tempo até a próxima tentativa agendada, ou None se a fila estiver vazia."""
+        with self._lock:
+            next_attempt = self._connection.execute(
+                "SELECT MIN(next_attempt) FROM outbox"
+            ).fetchone()[0]
+        if next_attempt is None:
+            return None
+        return max(next_attempt - time.time(), 0)
+
+    def _deliver(self, row):
+        """Envia uma notificação e a remove da fila ou agenda uma nova tentativa."""
+        notification_id, event_type, message, context, attempts = row
+        started = time.monotonic()
+        try:
+            delivered = self.sender(event_type, message, json.loads(context or "{}"))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Erro ao enviar a notificação %s: %s", event_type, e)
+            delivered = False
+        if self.on_delivery is not None:
+            self.on_delivery("email", time.monotonic() - started, bool(delivered))
+
+        attempts += 1
+        with self._lock, self._connection:
+            if delivered or attempts >= self.max_attempts:
+                self._connection.execute("DELETE FROM outbox WHERE id = ?", (notification_id,))
+            else:
+                delay = retry_delay(attempts, self.initial_delay, self.max_delay)
+                self._connection.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt = ? WHERE id = ?",
+                    (attempts, time.time() + delay, notification_id),
+                )
+
+        if delivered:
+            return
+        if attempts >= self.max_attempts:
+            logger.error(
+                "Notificação %s descartada após %s tentativas.", event_type, attempts
+            )
+        else:
+            logger.warning(
+                "Falha ao enviar a notificação %s (tentativa %s). Nova tentativa em %.0f s.",
+                event_type,
+                attempts,
+                retry_delay(attempts, self.initial_delay, self.max_delay),
+            )
+
+    def _run(self):
+        """Entrega as notificações liberadas e aguarda novas ou a próxima tentativa."""
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                row = self._next_due()
+                while row is not None and not self._stop.is_set():
+                    self._deliver(row)
+                    row = self._next_due()
+                timeout = self._seconds_until_next()
+            except sqlite3.Error as e:
+                logger.error("Erro na fila de notificações: %s", e)
+                timeout = self.initial_delay
+            self._wakeup.wait(timeout)
@@ -0,0 +1,168 @@
+"""
+Política de envio das notificações: limite de frequência por evento,
+envio apenas quando o estado muda e agrupamento em resumos.
+
+Cada tipo de evento pode ter uma regra com as chaves:
+
+- min_interval: intervalo mínimo (em segundos) entre duas notificações;
+- change_key: chave do contexto que precisa mudar para uma nova notificação
+  (por exemplo, "battery_percent");
+- change_step: variação mínima de change_key, para valores numéricos;
+- digest_window: janela (em segundos) em que os eventos são acumulados e
+  enviados em uma única notificação de resumo.
+
+Eventos sem regra são entregues sempre.
+"""
+
+import copy
+import datetime
+import logging
+import threading
+import time
+
+# Constantes
+DEFAULT_RULES = {
+    "low_battery": {"min_interval": 120, "change_key": "battery_percent", "change_step": 5},
+}
+
+logger = logging.getLogger("PowerMonitor.policy")
+
+
+class NotificationPolicy:
+    """
+    Filtra e agrupa as notificações antes de entregá-las.
+
+    submit() pode ser chamado de qualquer thread. Os resumos são entregues
+    por um timer ao fim de cada janela.
+    """
+
+    def __init__(self, deliver, rules=None):
+        """
+        Args:
+            deliver (callable): Função (event_type, message, context) chamada para
+            cada notificação aprovada.
+            rules (dict, optional): Tipo de evento -> regra (padrão: DEFAULT_RULES).
+        """
+        self.deliver = deliver
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._last_sent = {}  # evento -> (instante, contexto)
+        self._suppressed = {}  # evento -> notificações descartadas desde o último envio
+        self._digests = {}  # evento -> notificações acumuladas na janela atual
+        self._timers = {}
+
+    @property
+    def rules(self):
+        """Regras por tipo de evento (uma cópia própria da política)."""
+        return self._rules
+
+    @rules.setter
+    def rules(self, rules):
+        # Alterar as regras de uma política não altera DEFAULT_RULES nem a configuração
+        self._rules = copy.deepcopy(DEFAULT_RULES if rules is None else rules)
+
+    def submit(self, event_type, message, context=None):
+        """
+        Aplica a regra do evento e entrega, acumula ou descarta a notificação.
+
+        Args:
+            event_type (str): Tipo do evento.
+            message (str): Mensagem da notificação.
+            context (dict, optional): Contexto adicional para o template.
+
+        Returns:
+            bool: True se a notificação foi entregue ou acumulada para o resumo.
+        """
+        context = dict(context or {})
+        rule = self.rules.get(event_type) or {}
+        now = time.time()
+
+        with self._lock:
+            if not self._allowed(event_type, rule, context, now):
+                self._suppressed[event_type] = self._suppressed.get(event_type, 0) + 1
+                logger.debug("Notificação %s suprimida pela política de envio.", event_type)
+                return False
+
+            self._last_sent[event_type] = (now, context)
+            suppressed = self._suppressed.pop(event_type, 0)
+
+            window = rule.get("digest_window")
+            if window:
+                self._add_to_digest(event_type, message, context, window)
+                return True
+
+        if suppressed:
+            message = "{} ({} notificações semelhantes suprimidas.)".format(message, suppressed)
+        self.deliver(event_type, message, context)
+        return True
+
+    def _allowed(self, event_type, rule, context, now):
+        """Verifica o limite de frequência e a mudança de estado exigidos pela regra."""
+        last = self._last_sent.get(event_type)
+        if last is None:
+            return True
+        last_time, last_context = last
+
+        min_interval = rule.get("min_interval")
+        if min_interval and now - last_time < min_interval:
+            return False
+
+        change_key = rule.get("change_key")
+        if change_key:
+            previous, current = last_context.get(change_key), context.get(change_key)
+            step = rule.get("change_step")
+            if step and isinstance(previous, (int, float)) and isinstance(current, (int, float)):
+                return abs(current - previous) >= step
+            return current != previous
+
+        return True
+
+    def _add_to_digest(self, event_type, message, context, window):
+        """Acumula a notificação e agenda o envio do resumo ao fim da janela."""
+        entry = (datetime.datetime.now(), message, context)
+        self._digests.setdefault(event_type, []).append(entry)
+        if event_type not in self._timers:
+            timer = threading.Timer(window, self.flush, args=(event_type,))
+            timer.daemon = True
+            self._timers[event_type] = timer
+            timer.start()
+
+    def flush(self, event_type=None):
+        """
+        Entrega imediatamente os resumos pendentes.
+
+        Args:
+            event_type (str, optional): Evento a entregar (padrão: todos).
+        """
+        with self._lock:
+            event_types = [event_type] if event_type else list(self._digests)
+            batches = []
+            for name in event_types:
+                timer = self._timers.pop(name, None)
+                if timer is not None:
+                    timer.cancel()
+                entries = self._digests.pop(name, None)
+                if entries:
+                    batches.append((name, entries))
+
+        for name, entries in batches:
+            if len(entries) == 1:
+                _, message, context = entries[0]
+                self.deliver(name, message, context)
+                continue
+
+            summary = "; ".join(
+                "{}: {}".format(moment.strftime("%H:%M:%S"), message)
+                for moment, message, _ in entries
+            )
+            context = dict(entries[-1][2])
+            context["digest_count"] = len(entries)
+            self.deliver(
+                name, "{} ocorrências deste evento. {}".format(len(entries), summary), context
+            )
+
+    def reset(self):
+        """Esquece os envios anteriores (por exemplo, ao fim de uma queda de energia)."""
+        with self._lock:
+            self._last_sent.clear()
+            self._suppressed.clear()
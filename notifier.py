@@ -0,0 +1,443 @@
+"""
+Despacho das notificações para vários canais (sinks) ao mesmo tempo.
+
+Além do email, cada notificação pode ser entregue a um webhook HTTP
+(com a conexão reaproveitada entre os envios), ao syslog e a um socket
+Unix local. Cada canal tem a sua própria fila e thread, com agrupamento
+(batch) e tempo limite próprios: um canal lento nunca atrasa os demais.
+
+Os canais são configurados em service_config.json, na lista
+"notification_sinks", por exemplo:
+
+    {"type": "webhook", "url": "http://alertas.local/hook", "timeout": 3}
+    {"type": "syslog", "address": "/dev/log"}
+    {"type": "unix", "path": "/run/wol/alerts.sock", "batch_size": 10}
+"""
+
+import abc
+import datetime
+import http.client
+import json
+import logging
+import logging.handlers
+import queue
+import socket
+import threading
+import time
+import urllib.parse
+
+# Constantes
+DEFAULT_SINK_TIMEOUT = 5  # segundos
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_BATCH_WINDOW = 0.0  # segundos aguardando mais notificações para o mesmo envio
+MAX_QUEUE_SIZE = 1000
+ALERT_EVENTS = {"power_disconnected", "low_battery", "shutdown_initiated"}
+# Campos do cadastro de computadores que nunca saem do serviço
+CREDENTIAL_KEYS = {"username", "password", "ssh_key", "token"}
+
+logger = logging.getLogger("PowerMonitor.notifier")
+
+
+def strip_credentials(value):
+    """
+    Remove as credenciais (CREDENTIAL_KEYS) de um contexto, em qualquer nível.
+
+    Args:
+        value: Contexto da notificação (dicionários e listas aninhados).
+
+    Returns:
+        Cópia do contexto sem as credenciais.
+    """
+    if isinstance(value, dict):
+        return {
+            key: strip_credentials(item)
+            for key, item in value.items()
+            if key not in CREDENTIAL_KEYS
+        }
+    if isinstance(value, (list, tuple)):
+        return [strip_credentials(item) for item in value]
+    return value
+
+
+def build_notification(event_type, message, context=None):
+    """
+    Monta a notificação entregue aos canais.
+
+    Args:
+        event_type (str): Tipo do evento.
+        message (str): Mensagem da notificação.
+        context (dict, optional): Informações adicionais.
+
+    Returns:
+        dict: Notificação com event, message, timestamp e context (sem credenciais).
+    """
+    return {
+        "event": event_type,
+        "message": message,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "context": strip_credentials(context or {}),
+    }
+
+
+class QueuedSink(abc.ABC):
+    """
+    Canal de notificações com fila e thread próprias.
+
+    As subclasses implementam deliver(batch), que recebe de 1 a batch_size
+    notificações de uma vez.
+    """
+
+    kind = None
+
+    def __init__(
+        self,
+        timeout=DEFAULT_SINK_TIMEOUT,
+        batch_size=DEFAULT_BATCH_SIZE,
+        batch_window=DEFAULT_BATCH_WINDOW,
+    ):
+        """
+        Args:
+            timeout (float): Tempo limite de cada envio (em segundos).
+            batch_size (int): Máximo de notificações por envio.
+            batch_window (float): Tempo (em segundos) aguardando mais notificações
+            antes de enviar um lote incompleto.
+        """
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self._queue = queue.Queue(MAX_QUEUE_SIZE)
+        self._thread = None
+        # Função (canal, duração em segundos, entregue) chamada após cada lote
+        self.on_delivery = None
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, self.describe())
+
+    def describe(self):
+        """Descrição curta do destino, usada nos logs."""
+        return ""
+
+    def start(self):
+        """Inicia a thread de entrega."""
+        self._thread = threading.Thread(
+            target=self._run, name="Sink-{}".format(self.kind), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Entrega o que já estiver na fila (dentro do tempo limite) e encerra a thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        self.close()
+
+    def close(self):
+        """Libera as conexões do canal."""
+
+    def submit(self, notification):
+        """
+        Enfileira uma notificação sem bloquear.
+
+        Args:
+            notification (dict): Notificação montada por build_notification().
+        """
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            logger.error("Fila do canal %s cheia. Notificação descartada.", self)
+
+    def _collect(self, first):
+        """Junta ao primeiro item as notificações que chegarem dentro da janela do lote."""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            started = time.monotonic()
+            delivered = False
+            try:
+                self.deliver(batch)
+                delivered = True
+                logger.debug(
+                    "%s notificações entregues a %s em %.3f s.",
+                    len(batch),
+                    self,
+                    time.monotonic() - started,
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Erro ao entregar notificações a %s: %s", self, e)
+            if self.on_delivery is not None:
+                self.on_delivery(self.kind, time.monotonic() - started, delivered)
+            if stopping:
+                return
+
+    @abc.abstractmethod
+    def deliver(self, batch):
+        """Entrega um lote de notificações."""
+
+
+class WebhookSink(QueuedSink):
+    """
+    Envia as notificações por POST JSON, reaproveitando a conexão HTTP (keep-alive).
+
+    O corpo é {"notifications": [...]}.
+    """
+
+    kind = "webhook"
+
+    def __init__(self, url, headers=None, **kwargs):
+        """
+        Args:
+            url (str): Endereço do webhook (http ou https).
+            headers (dict, optional): Cabeçalhos adicionais (por exemplo, Authorization).
+        """
+        super().__init__(**kwargs)
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in {"http", "https"} or not parsed.hostname:
+            raise ValueError("URL de webhook inválida: {}".format(url))
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+        self.headers = dict(headers or {})
+        self._connection = None
+
+    def describe(self):
+        return self.url
+
+    def _connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        )
+        self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def deliver(self, batch):
+        body = json.dumps({"notifications": batch}, default=str).encode('utf-8')
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        headers.update(self.headers)
+
+        # Uma conexão reaproveitada pode ter sido fechada pelo servidor: tenta de novo uma vez
+        for attempt in range(2):
+            if self._connection is None:
+                self._connect()
+            try:
+                self._connection.request("POST", self.path, body, headers)
+                response = self._connection.getresponse()
+                response.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            if response.status >= http.client.MULTIPLE_CHOICES:
+                raise OSError("Webhook retornou HTTP {}".format(response.status))
+            return
+
+
+class SyslogSink(QueuedSink):
+    """Registra as notificações no syslog (socket local ou servidor remoto via UDP)."""
+
+    kind = "syslog"
+
+    def __init__(self, address="/dev/log", facility="daemon", **kwargs):
+        """
+        Args:
+            address (str ou list): Caminho do socket local ou [host, porta].
+            facility (str): Facility do syslog (daemon, local0...).
+        """
+        super().__init__(**kwargs)
+        self.address = tuple(address) if isinstance(address, list) else address
+        self.handler = logging.handlers.SysLogHandler(
+            address=self.address,
+            facility=logging.handlers.SysLogHandler.facility_names[facility],
+        )
+        self.handler.ident = "wol_automation: "
+        if self.handler.socket is not None:
+            self.handler.socket.settimeout(self.timeout)
+
+    def describe(self):
+        return str(self.address)
+
+    def close(self):
+        self.handler.close()
+
+    def deliver(self, batch):
+        for notification in batch:
+            level = logging.WARNING if notification["event"] in ALERT_EVENTS else logging.INFO
+            record = logging.LogRecord(
+                "PowerMonitor",
+                level,
+                __file__,
+                0,
+                "[%s] %s",
+                (notification["event"], notification["message"]),
+                None,
+            )
+            self.handler.emit(record)
+
+
+class UnixSocketSink(QueuedSink):
+    """
+    Escreve as notificações como linhas JSON em um socket Unix local (SOCK_STREAM),
+    mantendo a conexão aberta entre os envios.
+    """
+
+    kind = "unix"
+
+    def __init__(self, path, **kwargs):
+        """
+        Args:
+            path (str): Caminho do socket do processo que recebe as notificações.
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self._socket = None
+
+    def describe(self):
+        return self.path
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def deliver(self, batch):
+        payload = "".join(json.dumps(item, default=str) + "\n" for item in batch)
+        for attempt in range(2):
+            try:
+                if self._socket is None:
+                    # pylint: disable-next=no-member
+                    self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self._socket.settimeout(self.timeout)
+                    self._socket.connect(self.path)
+                self._socket.sendall(payload.encode('utf-8'))
+                return
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+
+
+class CallbackSink(QueuedSink):
+    """Entrega cada notificação a uma função (por exemplo, a fila de emails)."""
+
+    kind = "callback"
+
+    def __init__(self, callback, name="callback", **kwargs):
+        """
+        Args:
+            callback (callable): Função (event_type, message, context).
+            name (str): Nome do canal, usado nos logs.
+        """
+        super().__init__(**kwargs)
+        self.callback = callback
+        self.name = name
+
+    def describe(self):
+        return self.name
+
+    def deliver(self, batch):
+        for notification in batch:
+            self.callback(notification["event"], notification["message"], notification["context"])
+
+
+SINK_TYPES = {
+    WebhookSink.kind: WebhookSink,
+    SyslogSink.kind: SyslogSink,
+    UnixSocketSink.kind: UnixSocketSink,
+}
+
+
+def create_sinks(settings):
+    """
+    Cria os canais configurados, ignorando (com um erro no log) os inválidos.
+
+    Args:
+        settings (list): Dicionários com "type" e os parâmetros do canal.
+
+    Returns:
+        list: Canais ainda não iniciados.
+    """
+    sinks = []
+    for entry in settings or []:
+        options = dict(entry)
+        sink_class = SINK_TYPES.get(options.pop("type", None))
+        if sink_class is None:
+            logger.error("Tipo de canal de notificação desconhecido: %s", entry)
+            continue
+        try:
+            sinks.append(sink_class(**options))
+        except (TypeError, ValueError, KeyError, OSError) as e:
+            logger.error("Canal de notificação inválido %s: %s", entry, e)
+    return sinks
+
+
+class Notifier:
+    """
+    Entrega cada notificação a todos os canais ao mesmo tempo.
+
+    notify() apenas enfileira a notificação em cada canal e retorna; cada
+    canal a entrega na sua própria thread.
+    """
+
+    def __init__(self, sinks):
+        """
+        Args:
+            sinks (list): Canais (QueuedSink) a usar.
+        """
+        self.sinks = list(sinks)
+
+    def start(self):
+        """Inicia as threads de entrega dos canais."""
+        for sink in self.sinks:
+            sink.start()
+        if self.sinks:
+            logger.info("Canais de notificação: %s", ", ".join(map(repr, self.sinks)))
+
+    def stop(self):
+        """Encerra os canais."""
+        for sink in self.sinks:
+            sink.stop()
+
+    def notify(self, event_type, message, context=None):
+        """
+        Despacha uma notificação para todos os canais.
+
+        Args:
+            event_type (str): Tipo do evento.
+            message (str): Mensagem da notificação.
+            context (dict, optional): Informações adicionais.
+        """
+        notification = build_notification(event_type, message, context)
+        for sink in self.sinks:
+            sink.submit(notification)
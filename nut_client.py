@@ -0,0 +1,214 @@
+"""
+Cliente do protocolo do upsd (Network UPS Tools) para ler o estado de um nobreak.
+
+Mantém uma única conexão TCP persistente com o upsd e lê as variáveis em
+lote (as requisições são enviadas juntas e as respostas lidas em seguida),
+reconectando automaticamente se a conexão cair.
+"""
+
+import logging
+import socket
+import threading
+
+# Constantes
+NUT_DEFAULT_PORT = 3493
+NUT_DEFAULT_TIMEOUT = 5  # segundos
+STATUS_VARIABLES = ("ups.status", "battery.charge", "battery.runtime")
+OPTIONAL_ERRORS = {"VAR-NOT-SUPPORTED"}
+
+logger = logging.getLogger("PowerMonitor.nut")
+
+
+class NutError(Exception):
+    """Erro retornado pelo upsd ou falha de comunicação com ele."""
+
+
+def parse_status_flags(status):
+    """
+    Interpreta o valor de ups.status.
+
+    Args:
+        status (str): Valor de ups.status, por exemplo "OB DISCHRG LB".
+
+    Returns:
+        set: Conjunto de flags.
+    """
+    return set(status.split()) if status else set()
+
+
+def unquote(value):
+    """Remove as aspas e os escapes de um valor retornado pelo upsd."""
+    if len(value) > 1 and value.startswith('"') and value.endswith('"'):
+        value = value[1:-1]
+    return value.replace('\\"', '"').replace('\\\\', '\\')
+
+
+class NutClient:
+    """
+    Conexão persistente com um servidor upsd.
+
+    Os métodos são seguros para uso por várias threads (um lock serializa
+    cada troca de requisições e respostas).
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        port=NUT_DEFAULT_PORT,
+        ups="ups",
+        username="",
+        password="",
+        timeout=NUT_DEFAULT_TIMEOUT,
+    ):
+        """
+        Args:
+            host (str): Endereço do upsd.
+            port (int): Porta do upsd.
+            ups (str): Nome do nobreak configurado no upsd.
+            username (str): Usuário do upsd (opcional para leitura).
+            password (str): Senha do upsd.
+            timeout (float): Tempo limite de conexão e leitura (em segundos).
+        """
+        self.host = host
+        self.port = port
+        self.ups = ups
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Abre a conexão com o upsd e autentica, se houver credenciais."""
+        self.close()
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._reader = self._socket.makefile('rb')
+
+        if self.username:
+            try:
+                self._login("USERNAME {}".format(self.username))
+                self._login("PASSWORD {}".format(self.password))
+            except (OSError, NutError):
+                # Não mantém uma conexão sem autenticação
+                self.close()
+                raise
+
+        logger.info("Conectado ao upsd em %s:%s (nobreak %s).", self.host, self.port, self.ups)
+
+    def close(self):
+        """Encerra a conexão com o upsd."""
+        if self._socket is None:
+            return
+        try:
+            self._socket.sendall(b"LOGOUT\n")
+        except OSError:
+            pass
+        for resource in (self._reader, self._socket):
+            try:
+                resource.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._reader = None
+
+    def _login(self, command):
+        """Envia USERNAME ou PASSWORD, falhando se o upsd não responder OK."""
+        response = self._exchange([command])[0]
+        if not response.startswith("OK"):
+            raise NutError("upsd recusou {}: {}".format(command.split(" ", 1)[0], response))
+
+    def _exchange(self, commands):
+        """
+        Envia vários comandos de uma vez e lê uma linha de resposta para cada um.
+
+        Args:
+            commands (list): Comandos sem a quebra de linha final.
+
+        Returns:
+            list: Linhas de resposta, na mesma ordem dos comandos.
+        """
+        payload = "".join("{}\n".format(command) for command in commands)
+        self._socket.sendall(payload.encode('utf-8'))
+
+        responses = []
+        for _ in commands:
+            line = self._reader.readline()
+            if not line:
+                raise NutError("Conexão encerrada pelo upsd")
+            responses.append(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        return responses
+
+    def get_vars(self, names):
+        """
+        Lê várias variáveis do nobreak em uma única ida e volta.
+
+        Reconecta uma vez se a conexão persistente tiver caído.
+
+        Args:
+            names (iterable): Nomes das variáveis.
+
+        Returns:
+            dict: Nome -> valor (str), ou None para variáveis não suportadas.
+
+        Raises:
+            NutError: Se o upsd retornar um erro ou estiver inacessível.
+        """
+        names = list(names)
+        commands = ["GET VAR {} {}".format(self.ups, name) for name in names]
+
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None:
+                        self.connect()
+                    responses = self._exchange(commands)
+                    break
+                except (OSError, NutError) as e:
+                    self.close()
+                    if attempt:
+                        raise NutError("Falha na comunicação com o upsd: {}".format(e)) from e
+
+        values = {}
+        for name, response in zip(names, responses):
+            if response.startswith("ERR "):
+                error = response[4:].strip()
+                if error not in OPTIONAL_ERRORS:
+                    raise NutError("upsd retornou {} para {}".format(error, name))
+                values[name] = None
+                continue
+
+            prefix = "VAR {} {} ".format(self.ups, name)
+            if not response.startswith(prefix):
+                raise NutError("Resposta inesperada do upsd: {}".format(response))
+            values[name] = unquote(response[len(prefix) :])
+        return values
+
+    def read_status(self):
+        """
+        Lê o estado do nobreak.
+
+        Returns:
+            tuple: (porcentagem_bateria, conectado_energia, autonomia_segundos), com
+            None nos valores que o nobreak não informa.
+        """
+        values = self.get_vars(STATUS_VARIABLES)
+        flags = parse_status_flags(values["ups.status"])
+        charge = values["battery.charge"]
+        runtime = values["battery.runtime"]
+
+        return (
+            int(float(charge)) if charge is not None else None,
+            "OB" not in flags,
+            int(float(runtime)) if runtime is not None else None,
+        )
+
+    def read_on_power(self):
+        """
+        Lê apenas ups.status.
+
+        Returns:
+            bool: True se o nobreak está na energia elétrica.
+        """
+        return "OB" not in parse_status_flags(self.get_vars(["ups.status"])["ups.status"])
@@ -0,0 +1,173 @@
+"""
+Máquina de estados do tratamento de uma queda de energia, com journal de
+escrita antecipada (write-ahead) do progresso por computador.
+
+Cada mudança de fase e cada computador iniciado ou concluído é gravado
+(com fsync) antes de ter efeito. Se o serviço cair ou for reiniciado no
+meio de um desligamento ou religamento, o estado é reconstruído a partir
+do journal e apenas os computadores ainda pendentes são processados.
+"""
+
+import json
+import logging
+import os
+
+# Constantes
+WORKFLOW_FILE = "outage_workflow.log"
+
+IDLE = "idle"
+ON_BATTERY = "on_battery"
+SHUTTING_DOWN = "shutting_down"
+SHUT_DOWN = "shut_down"
+WAKING = "waking"
+
+# Fase -> fases seguintes permitidas
+TRANSITIONS = {
+    IDLE: {ON_BATTERY, SHUTTING_DOWN},
+    ON_BATTERY: {IDLE, SHUTTING_DOWN},
+    SHUTTING_DOWN: {SHUT_DOWN},
+    SHUT_DOWN: {WAKING, IDLE},
+    WAKING: {IDLE},
+}
+
+# Ação executada em cada fase com computadores
+PHASE_ACTIONS = {SHUTTING_DOWN: "shutdown", WAKING: "wake"}
+
+HOST_STARTED = "started"
+HOST_DONE = "done"
+HOST_FAILED = "failed"
+
+logger = logging.getLogger("PowerMonitor.workflow")
+
+
+class OutageWorkflow:
+    """
+    Estado atual do tratamento da queda, reconstruído a partir do journal.
+
+    Attributes:
+        phase (str): Fase atual (IDLE, ON_BATTERY, SHUTTING_DOWN, SHUT_DOWN ou WAKING).
+        hosts (dict): Computadores planejados para a fase atual -> estado
+        (None, HOST_STARTED, HOST_DONE ou HOST_FAILED).
+        completed (dict): Ação -> nomes dos computadores concluídos com sucesso na queda atual.
+    """
+
+    def __init__(self, path=WORKFLOW_FILE):
+        """
+        Args:
+            path (str): Caminho do journal.
+        """
+        self.path = path
+        self.phase = IDLE
+        self.hosts = {}
+        self.completed = {"shutdown": [], "wake": []}
+        self._replay()
+        # pylint: disable-next=consider-using-with
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Reconstrói o estado a partir dos registros gravados."""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha incompleta de uma gravação interrompida
+                    continue
+                self._apply(record)
+
+        if self.phase != IDLE:
+            logger.warning(
+                "Fluxo de queda retomado na fase %s (%s computadores pendentes).",
+                self.phase,
+                len(self.pending()),
+            )
+
+    def _apply(self, record):
+        """Aplica um registro ao estado em memória."""
+        if record["type"] == "phase":
+            self.phase = record["phase"]
+            self.hosts = {name: None for name in record.get("hosts", [])}
+            if self.phase == IDLE:
+                self.completed = {"shutdown": [], "wake": []}
+        elif record["type"] == "host":
+            self.hosts[record["host"]] = record["state"]
+            if record["state"] == HOST_DONE:
+                self.completed[record["action"]].append(record["host"])
+
+    def _write(self, record):
+        """Grava um registro no journal (com fsync) e o aplica ao estado."""
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(record)
+
+    def close(self):
+        """Fecha o journal."""
+        self._file.close()
+
+    @property
+    def action(self):
+        """Ação da fase atual ("shutdown", "wake" ou None)."""
+        return PHASE_ACTIONS.get(self.phase)
+
+    def transition(self, phase, hosts=None):
+        """
+        Muda de fase.
+
+        Ao voltar para IDLE, o journal é compactado (esvaziado), pois não há
+        mais nada a retomar.
+
+        Args:
+            phase (str): Nova fase.
+            hosts (list, optional): Nomes dos computadores a processar na nova fase.
+        """
+        if phase == self.phase:
+            return
+        if phase not in TRANSITIONS[self.phase]:
+            logger.warning("Transição inesperada do fluxo de queda: %s -> %s", self.phase, phase)
+
+        self._write({"type": "phase", "phase": phase, "hosts": list(hosts or [])})
+        logger.info("Fluxo de queda: fase %s.", phase)
+
+        if phase == IDLE:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def host_started(self, computer):
+        """Registra que a ação da fase atual vai começar em um computador."""
+        self._write(
+            {
+                "type": "host",
+                "action": self.action,
+                "host": computer["name"],
+                "state": HOST_STARTED,
+            }
+        )
+
+    def host_finished(self, computer, success):
+        """Registra o resultado da ação da fase atual em um computador."""
+        self._write(
+            {
+                "type": "host",
+                "action": self.action,
+                "host": computer["name"],
+                "state": HOST_DONE if success else HOST_FAILED,
+            }
+        )
+
+    def pending(self):
+        """
+        Lista os computadores da fase atual que ainda não foram concluídos.
+
+        Um computador iniciado mas sem resultado gravado (o serviço caiu no
+        meio da ação) é considerado pendente e será processado novamente.
+
+        Returns:
+            list: Nomes dos computadores pendentes.
+        """
+        finished = {HOST_DONE, HOST_FAILED}
+        return [name for name, state in self.hosts.items() if state not in finished]
@@ -0,0 +1,250 @@
+"""
+Detecção de mudanças na alimentação elétrica orientada a eventos.
+
+No Linux, escuta os uevents do kernel do subsistema power_supply via
+netlink; quando isso não é possível (outro sistema operacional, falta de
+permissão ou uma árvore sysfs alternativa), verifica periodicamente os
+atributos das fontes de energia em intervalos curtos.
+"""
+
+import logging
+import os
+import platform
+import socket
+import threading
+
+# Constantes
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+UEVENT_BUFFER_SIZE = 16384
+POLL_INTERVAL = 1.0  # segundos
+WATCHED_ATTRIBUTES = ("online", "status")
+WATCHED_UEVENT_KEYS = ("POWER_SUPPLY_ONLINE", "POWER_SUPPLY_STATUS")
+
+logger = logging.getLogger("PowerMonitor.events")
+
+
+def parse_uevent(data):
+    """
+    Interpreta uma mensagem de uevent do kernel.
+
+    Args:
+        data (bytes): Mensagem no formato "ação@caminho\\0CHAVE=valor\\0...".
+
+    Returns:
+        dict: Pares chave/valor da mensagem, ou None se não for um uevent do kernel.
+    """
+    fields = data.split(b'\0')
+    if not fields or b'@' not in fields[0]:
+        return None
+
+    event = {}
+    for field in fields[1:]:
+        key, sep, value = field.partition(b'=')
+        if sep:
+            event[key.decode('utf-8', errors='ignore')] = value.decode('utf-8', errors='ignore')
+    return event
+
+
+def read_supply_states(sysfs_root=POWER_SUPPLY_DIR):
+    """
+    Lê os atributos relevantes de todas as fontes de energia de uma árvore sysfs.
+
+    Args:
+        sysfs_root (str): Diretório com as fontes de energia.
+
+    Returns:
+        dict: Nome da fonte -> tupla com os valores de WATCHED_ATTRIBUTES.
+    """
+    states = {}
+    try:
+        names = os.listdir(sysfs_root)
+    except OSError:
+        return states
+
+    for name in names:
+        values = []
+        for attribute in WATCHED_ATTRIBUTES:
+            try:
+                with open(os.path.join(sysfs_root, name, attribute), 'r', encoding='utf-8') as f:
+                    values.append(f.read().strip())
+            except OSError:
+                values.append(None)
+        states[name] = tuple(values)
+    return states
+
+
+class PowerEventDetector:
+    """
+    Acorda o monitor assim que a alimentação muda.
+
+    Uma thread em segundo plano observa as fontes de energia e sinaliza um
+    evento quando o estado de conexão ou de carga muda, ou quando uma fonte
+    é adicionada ou removida. O loop principal usa wait() no lugar de
+    time.sleep() e é acordado em milissegundos.
+    """
+
+    def __init__(
+        self,
+        sysfs_root=POWER_SUPPLY_DIR,
+        poll_interval=POLL_INTERVAL,
+        use_netlink=None,
+        probe=None,
+    ):
+        """
+        Args:
+            sysfs_root (str): Diretório das fontes de energia (pode ser uma árvore falsa).
+            poll_interval (float): Intervalo (em segundos) do modo de verificação periódica.
+            use_netlink (bool, optional): Força ou desabilita o uso de netlink. Por
+            padrão, usa netlink apenas no Linux com a árvore sysfs real.
+            probe (callable, optional): Função sem argumentos que retorna o estado
+            de alimentação, usada no lugar do sysfs (por exemplo, no Windows).
+        """
+        if use_netlink is None:
+            use_netlink = (
+                probe is None
+                and platform.system() == "Linux"
+                and os.path.abspath(sysfs_root) == POWER_SUPPLY_DIR
+            )
+
+        self.sysfs_root = sysfs_root
+        self.poll_interval = poll_interval
+        self.use_netlink = use_netlink
+        self.probe = probe
+        self.mode = None
+        self.hotplug = False
+        self._event = threading.Event()
+        self._stop = threading.Event()
+        self._socket = None
+        self._thread = None
+        self._last_states = {}
+        self._failing = False
+
+    def start(self):
+        """Inicia a thread de detecção, preferindo netlink e recorrendo à verificação periódica."""
+        if self.use_netlink:
+            try:
+                self._socket = socket.socket(
+                    socket.AF_NETLINK,  # pylint: disable=no-member
+                    socket.SOCK_DGRAM,
+                    NETLINK_KOBJECT_UEVENT,
+                )
+                self._socket.bind((0, UEVENT_KERNEL_GROUP))
+                self.mode = "netlink"
+            except (AttributeError, OSError) as e:
+                logger.warning("Uevents indisponíveis (%s). Usando verificação periódica.", e)
+                self._socket = None
+
+        if self._socket is None:
+            self.mode = "polling"
+
+        try:
+            self._last_states = self._read_states()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Erro ao verificar as fontes de energia: %s", e)
+
+        target = self._run_netlink if self.mode == "netlink" else self._run_polling
+        self._thread = threading.Thread(target=target, name="PowerEventDetector", daemon=True)
+        self._thread.start()
+        logger.info("Detecção de eventos de energia iniciada (modo: %s).", self.mode)
+
+    def stop(self):
+        """Encerra a thread de detecção."""
+        self._stop.set()
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        self._event.set()
+
+    def wait(self, timeout):
+        """
+        Aguarda uma mudança na alimentação ou o fim do tempo limite.
+
+        Args:
+            timeout (float): Tempo máximo de espera (em segundos).
+
+        Returns:
+            bool: True se uma mudança foi detectada, False se o tempo esgotou.
+        """
+        triggered = self._event.wait(timeout)
+        self._event.clear()
+        return triggered and not self._stop.is_set()
+
+    def consume_hotplug(self):
+        """
+        Informa se alguma fonte de energia foi adicionada ou removida desde a última chamada.
+
+        Returns:
+            bool: True se houve hotplug.
+        """
+        hotplug, self.hotplug = self.hotplug, False
+        return hotplug
+
+    def _notify(self, hotplug=False):
+        """Sinaliza o loop principal."""
+        if hotplug:
+            self.hotplug = True
+        self._event.set()
+
+    def _read_states(self):
+        """Lê o estado atual das fontes (ou do probe, se configurado)."""
+        if self.probe is not None:
+            return {"probe": (self.probe(),)}
+        return read_supply_states(self.sysfs_root)
+
+    def _run_polling(self):
+        """Compara periodicamente o estado das fontes de energia."""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                states = self._read_states()
+            except Exception as e:  # pylint: disable=broad-except
+                # Uma fonte inacessível (por exemplo, o upsd parado) é registrada uma vez
+                if self._failing:
+                    logger.debug("Erro ao verificar as fontes de energia: %s", e)
+                else:
+                    logger.error("Erro ao verificar as fontes de energia: %s", e)
+                    self._failing = True
+                continue
+
+            if self._failing:
+                logger.info("Fontes de energia acessíveis novamente.")
+                self._failing = False
+
+            if states != self._last_states:
+                hotplug = set(states) != set(self._last_states)
+                self._last_states = states
+                self._notify(hotplug)
+
+    def _run_netlink(self):
+        """Processa os uevents do kernel do subsistema power_supply."""
+        while not self._stop.is_set():
+            try:
+                data = self._socket.recv(UEVENT_BUFFER_SIZE)
+            except OSError:
+                if self._stop.is_set():
+                    return
+                logger.error("Erro ao receber uevent. Usando verificação periódica.")
+                self.mode = "polling"
+                self._last_states = self._read_states()
+                self._run_polling()
+                return
+
+            event = parse_uevent(data)
+            if not event or event.get("SUBSYSTEM") != "power_supply":
+                continue
+
+            name = event.get("POWER_SUPPLY_NAME", event.get("DEVPATH", ""))
+            action = event.get("ACTION")
+
+            if action in {"add", "remove"}:
+                self._last_states.pop(name, None)
+                self._notify(hotplug=True)
+                continue
+
+            state = tuple(event.get(key) for key in WATCHED_UEVENT_KEYS)
+            if self._last_states.get(name) != state:
+                self._last_states[name] = state
+                self._notify()
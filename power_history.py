@@ -0,0 +1,246 @@
+"""
+Histórico compacto das leituras de energia em um arquivo circular binário.
+
+Cada leitura ocupa um registro de tamanho fixo (timestamp, porcentagem,
+conexão à energia e autonomia) em um arquivo mapeado em memória. Quando o
+arquivo enche, os registros mais antigos são sobrescritos, de modo que o
+tamanho em disco nunca cresce.
+"""
+
+import argparse
+import bisect
+import collections
+import datetime
+import mmap
+import os
+import struct
+
+# Constantes
+HISTORY_FILE = "power_history.bin"
+DEFAULT_CAPACITY = 262144  # registros (4 MB, meses de histórico a cada 30 s)
+MAGIC = b"WOLH"
+VERSION = 1
+# magic, versão, tamanho do registro, capacidade, total de registros gravados
+HEADER = struct.Struct("<4sHHIQ")
+# timestamp (s), porcentagem (-1 = desconhecida), na energia, autonomia em s (-1 = desconhecida)
+RECORD = struct.Struct("<dbB2xi")
+UNKNOWN = -1
+
+HistoryRecord = collections.namedtuple(
+    "HistoryRecord", ["timestamp", "percent", "on_power", "runtime"]
+)
+
+
+class PowerHistoryFile:
+    """
+    Arquivo circular de leituras de energia mapeado em memória.
+
+    O gravador (o serviço de monitoramento) abre o arquivo para escrita;
+    leitores podem abri-lo ao mesmo tempo em modo somente leitura.
+    """
+
+    def __init__(self, path=HISTORY_FILE, capacity=DEFAULT_CAPACITY, writable=False):
+        """
+        Args:
+            path (str): Caminho do arquivo.
+            capacity (int): Número de registros, usado apenas ao criar o arquivo.
+            writable (bool): Abre para gravação, criando o arquivo se necessário.
+
+        Raises:
+            ValueError: Se o arquivo existir com um formato incompatível.
+            FileNotFoundError: Se o arquivo não existir e writable for False.
+        """
+        self.path = path
+        self.writable = writable
+
+        if writable and not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0))
+                f.truncate(HEADER.size + capacity * RECORD.size)
+
+        # pylint: disable-next=consider-using-with
+        self._file = open(path, 'r+b' if writable else 'rb')
+        try:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+
+        magic, version, record_size, self.capacity, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError("Formato de histórico inválido: {}".format(path))
+
+    def close(self):
+        """Grava as páginas pendentes e fecha o arquivo."""
+        if self._map is None:
+            return
+        if self.writable:
+            self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def total(self):
+        """Total de registros já gravados (inclusive os sobrescritos)."""
+        return HEADER.unpack_from(self._map, 0)[4]
+
+    def append(self, sample):
+        """
+        Grava uma leitura.
+
+        O registro é escrito antes de o contador ser atualizado, para que um
+        leitor concorrente nunca veja um registro incompleto.
+
+        Args:
+            sample (BatterySample): Leitura a gravar.
+        """
+        total = self.total
+        offset = HEADER.size + (total % self.capacity) * RECORD.size
+        RECORD.pack_into(
+            self._map,
+            offset,
+            sample.timestamp.timestamp(),
+            sample.percent if sample.percent is not None else UNKNOWN,
+            1 if sample.on_power else 0,
+            sample.runtime if getattr(sample, "runtime", None) is not None else UNKNOWN,
+        )
+        struct.pack_into("<Q", self._map, HEADER.size - 8, total + 1)
+
+    def _read_at(self, position):
+        """Lê o registro na posição lógica informada (0 = mais antigo disponível)."""
+        total = self.total
+        first = max(0, total - self.capacity)
+        offset = HEADER.size + ((first + position) % self.capacity) * RECORD.size
+        return RECORD.unpack_from(self._map, offset)
+
+    def __len__(self):
+        total = self.total
+        # Com o arquivo cheio, o registro mais antigo pode estar sendo sobrescrito
+        return total if total < self.capacity else self.capacity - 1
+
+    def _skip(self):
+        """Posições ignoradas no início (o registro mais antigo de um arquivo cheio)."""
+        return 1 if self.total >= self.capacity else 0
+
+    def read(self, start=None, end=None):
+        """
+        Lê as leituras gravadas em um intervalo de tempo, da mais antiga para a mais recente.
+
+        A busca pelo início do intervalo é binária, pois os registros são
+        gravados em ordem cronológica.
+
+        Args:
+            start (datetime.datetime, optional): Início do intervalo (inclusive).
+            end (datetime.datetime, optional): Fim do intervalo (inclusive).
+
+        Yields:
+            HistoryRecord: Leituras no intervalo.
+        """
+        count = len(self)
+        skip = self._skip()
+        timestamps = _TimestampView(self, skip, count)
+
+        first = bisect.bisect_left(timestamps, start.timestamp()) if start else 0
+        end_ts = end.timestamp() if end else None
+
+        for position in range(first, count):
+            timestamp, percent, on_power, runtime = self._read_at(position + skip)
+            if end_ts is not None and timestamp > end_ts:
+                break
+            yield HistoryRecord(
+                datetime.datetime.fromtimestamp(timestamp),
+                percent if percent != UNKNOWN else None,
+                bool(on_power),
+                runtime if runtime != UNKNOWN else None,
+            )
+
+
+class _TimestampView:  # pylint: disable=too-few-public-methods
+    """Sequência de timestamps usada pela busca binária sem copiar os registros."""
+
+    def __init__(self, history, skip, count):
+        self.history = history
+        self.skip = skip
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        # pylint: disable-next=protected-access
+        return self.history._read_at(position + self.skip)[0]
+
+
+def parse_datetime(value):
+    """Converte um argumento ISO 8601 da linha de comando."""
+    return datetime.datetime.fromisoformat(value)
+
+
+def print_history(path=HISTORY_FILE, start=None, end=None, csv=False):
+    """
+    Exibe as leituras gravadas em um intervalo de tempo.
+
+    Args:
+        path (str): Caminho do arquivo de histórico.
+        start (datetime.datetime, optional): Início do intervalo.
+        end (datetime.datetime, optional): Fim do intervalo.
+        csv (bool): Exibe em formato CSV.
+    """
+    try:
+        history = PowerHistoryFile(path)
+    except FileNotFoundError:
+        print("Arquivo de histórico {} não encontrado.".format(path))
+        return
+    except ValueError as e:
+        print("Erro: {}".format(e))
+        return
+
+    with history:
+        if csv:
+            print("timestamp,percent,on_power,runtime")
+        for record in history.read(start, end):
+            if csv:
+                print(
+                    "{},{},{},{}".format(
+                        record.timestamp.isoformat(),
+                        "" if record.percent is None else record.percent,
+                        int(record.on_power),
+                        "" if record.runtime is None else record.runtime,
+                    )
+                )
+            else:
+                print(
+                    "{}  Bateria: {}  Energia: {}  Autonomia: {}".format(
+                        record.timestamp.strftime("%d/%m/%Y %H:%M:%S"),
+                        "-" if record.percent is None else "{}%".format(record.percent),
+                        "Conectado" if record.on_power else "Desconectado",
+                        "-" if record.runtime is None else "{} s".format(record.runtime),
+                    )
+                )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Consultar o histórico de leituras de energia.')
+    parser.add_argument('--file', default=HISTORY_FILE, help='Arquivo de histórico')
+    parser.add_argument('--since', type=parse_datetime, help='Início (ISO 8601)')
+    parser.add_argument('--until', type=parse_datetime, help='Fim (ISO 8601)')
+    parser.add_argument('--hours', type=float, help='Últimas N horas (ignora --since)')
+    parser.add_argument('--csv', action='store_true', help='Saída em formato CSV')
+
+    args = parser.parse_args()
+
+    since = args.since
+    if args.hours is not None:
+        since = datetime.datetime.now() - datetime.timedelta(hours=args.hours)
+
+    print_history(args.file, since, args.until, args.csv)
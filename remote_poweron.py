@@ -3,13 +3,32 @@ Módulo para ligar computadores remotamente utilizando Wake-on-LAN (WoL).
 """
 
 import argparse
+import ipaddress
 import json
 import os
+import platform
+import re
 import socket
+import subprocess
+import time
+
+from fleet_results import iter_results, print_results
 
 # Constantes
 MAC_LENGTH = 12
 CONFIG_FILE = "computers.json"
+WAKE_SUMMARY = "{} de {} computadores foram ligados com sucesso."
+ARP_TABLE_FILE = "/proc/net/arp"
+ARP_FLAG_INCOMPLETE = 0x0
+ARP_MIN_FIELDS = 4  # IP, tipo de hardware, flags e MAC
+EMPTY_MAC = "00:00:00:00:00:00"
+DISCOVERY_WORKERS = 32
+SWEEP_MAX_HOSTS = 4096
+SWEEP_PORT = 9
+SWEEP_SETTLE_TIME = 2  # segundos para o kernel concluir as resoluções ARP
+WINDOWS_ARP_PATTERN = re.compile(
+    r'^\s*(\d{1,3}(?:\.\d{1,3}){3})\s+([0-9a-fA-F]{2}(?:-[0-9a-fA-F]{2}){5})\s'
+)
 
 
 def load_computers():
@@ -108,30 +127,259 @@ def wake_on_lan_by_name(computer_name):
         return False
 
 
-def wake_on_lan_all_auto():
+def wake_computer(computer, report=None):
+    """
+    Envia Wake-on-LAN para um computador cadastrado.
+
+    Args:
+        computer (dict): Dicionário com as configurações do computador.
+        report (HostReport, optional): Recebe a duração do envio.
+
+    Returns:
+        bool: True se o pacote foi enviado.
+    """
+    print("Enviando Wake-on-LAN para {} ({})...".format(computer['name'], computer['hostname']))
+    wake_on_lan(computer["mac"])
+    if report is not None:
+        report.lap("send")
+    return True
+
+
+def iter_wake(computers=None, max_workers=1, on_start=None):
+    """
+    Liga vários computadores, produzindo o resultado de cada um assim que termina.
+
+    Args:
+        computers (list, optional): Computadores a ligar. Por padrão, todos
+        os cadastrados com auto_power_on.
+        max_workers (int): Envios feitos ao mesmo tempo.
+        on_start (callable, optional): Chamada com o computador antes do envio.
+
+    Returns:
+        iterator: HostResult de cada computador, na ordem de conclusão.
+    """
+    if computers is None:
+        computers = [comp for comp in load_computers() if comp.get("auto_power_on", False)]
+    return iter_results(
+        "wake", computers, wake_computer, max_workers=max_workers, on_start=on_start
+    )
+
+
+def wake_on_lan_all_auto(on_result=None, computers=None, on_start=None):
     """
     Envia Wake-on-LAN para todos os computadores marcados como auto_power_on.
 
+    Args:
+        on_result (callable, optional): Chamada após cada computador com
+        (computador, sucesso, duração em segundos, erro ou None).
+        computers (list, optional): Computadores a ligar. Por padrão, todos
+        os cadastrados com auto_power_on.
+        on_start (callable, optional): Chamada com o computador antes do envio.
+
     Returns:
         int: Número de computadores ligados com sucesso.
     """
-    computers = load_computers()
+    if computers is None:
+        computers = [comp for comp in load_computers() if comp.get("auto_power_on", False)]
+    by_name = {comp["name"]: comp for comp in computers}
     success_count = 0
 
-    for comp in computers:
-        if comp.get("auto_power_on", False):
-            try:
-                print(
-                    "Enviando Wake-on-LAN para {} ({})...".format(comp['name'], comp['hostname'])
-                )
-                wake_on_lan(comp["mac"])
-                success_count += 1
-            except Exception as e:  # pylint-disable=broad-except
-                print("Erro ao enviar Wake-on-LAN para {}: {}".format(comp['name'], e))
+    for result in iter_wake(computers, on_start=on_start):
+        if result.error is None:
+            success_count += 1
+        else:
+            print("Erro ao enviar Wake-on-LAN para {}: {}".format(result.host, result.error))
+
+        if on_result is not None:
+            on_result(by_name[result.host], result.error is None, result.duration, result.error)
 
     return success_count
 
 
+def normalize_mac(mac_address):
+    """
+    Normaliza um endereço MAC para o formato "XX:XX:XX:XX:XX:XX".
+
+    Args:
+        mac_address (str): Endereço MAC com separadores ":" ou "-", ou sem separadores.
+
+    Returns:
+        str: Endereço MAC normalizado.
+
+    Raises:
+        ValueError: Se o endereço MAC não tiver um formato válido.
+    """
+    digits = mac_address.replace(':', '').replace('-', '').strip().upper()
+    if len(digits) != MAC_LENGTH or not all(c in "0123456789ABCDEF" for c in digits):
+        raise ValueError('Formato de endereço MAC inválido: {}'.format(mac_address))
+    return ":".join(digits[i : i + 2] for i in range(0, MAC_LENGTH, 2))
+
+
+def read_arp_table(arp_file=ARP_TABLE_FILE):
+    """
+    Lê a tabela de vizinhos (ARP) do sistema.
+
+    No Linux a tabela é lida diretamente de /proc/net/arp; no Windows é
+    usada a saída de "arp -a".
+
+    Args:
+        arp_file (str): Caminho do arquivo da tabela ARP no Linux.
+
+    Returns:
+        dict: Mapeamento IP -> MAC normalizado, apenas com entradas completas.
+    """
+    table = {}
+
+    if os.path.exists(arp_file):
+        with open(arp_file, 'r', encoding='utf-8') as f:
+            next(f, None)  # Ignora o cabeçalho
+            for line in f:
+                fields = line.split()
+                if len(fields) < ARP_MIN_FIELDS:
+                    continue
+                ip, flags, mac = fields[0], int(fields[2], 16), fields[3]
+                if flags == ARP_FLAG_INCOMPLETE or mac == EMPTY_MAC:
+                    continue
+                table[ip] = normalize_mac(mac)
+
+    elif platform.system() == "Windows":
+        try:
+            output = subprocess.run(
+                ["arp", "-a"], capture_output=True, text=True, check=False
+            ).stdout
+        except OSError as e:
+            print("Erro ao ler a tabela ARP: {}".format(e))
+            return table
+        for line in output.splitlines():
+            match = WINDOWS_ARP_PATTERN.match(line)
+            if match:
+                table[match.group(1)] = normalize_mac(match.group(2))
+
+    else:
+        print("Tabela ARP não disponível em {}.".format(arp_file))
+
+    return table
+
+
+def sweep_subnet(subnet, settle_time=SWEEP_SETTLE_TIME):
+    """
+    Popula a tabela ARP enviando um datagrama UDP para cada host da sub-rede.
+
+    O envio não bloqueia: o kernel dispara as requisições ARP de todos os
+    hosts em paralelo e, após o tempo de acomodação, a tabela de vizinhos
+    contém os dispositivos que responderam.
+
+    Args:
+        subnet (str): Sub-rede em notação CIDR, por exemplo "192.168.0.0/24".
+        settle_time (float): Tempo de espera (em segundos) após o envio.
+
+    Returns:
+        int: Número de hosts sondados.
+
+    Raises:
+        ValueError: Se a sub-rede for inválida ou grande demais.
+    """
+    network = ipaddress.ip_network(subnet, strict=False)
+    if not isinstance(network, ipaddress.IPv4Network):
+        raise ValueError('Apenas sub-redes IPv4 são suportadas: {}'.format(subnet))
+    if network.num_addresses > SWEEP_MAX_HOSTS:
+        raise ValueError(
+            'Sub-rede {} grande demais para varredura (máximo {} endereços)'.format(
+                subnet, SWEEP_MAX_HOSTS
+            )
+        )
+
+    probed = 0
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for host in network.hosts():
+            try:
+                sock.sendto(b'', (str(host), SWEEP_PORT))
+                probed += 1
+            except OSError:
+                # Hosts inalcançáveis ou fila cheia não interrompem a varredura
+                continue
+
+    time.sleep(settle_time)
+    return probed
+
+
+def resolve_hostname(hostname):
+    """
+    Resolve um hostname para um endereço IPv4.
+
+    Args:
+        hostname (str): Hostname ou IP.
+
+    Returns:
+        str: Endereço IP, ou None se não for possível resolver.
+    """
+    try:
+        return socket.gethostbyname(hostname)
+    except (socket.gaierror, UnicodeError):
+        return None
+
+
+def discover_macs(computers, subnet=None, fix=False):
+    """
+    Preenche ou verifica o campo "mac" de todos os computadores cadastrados
+    a partir da tabela de vizinhos.
+
+    Os hostnames são resolvidos em paralelo e, se uma sub-rede for
+    informada, ela é varrida antes da leitura da tabela ARP.
+
+    Args:
+        computers (list): Lista de computadores cadastrados (alterada no local).
+        subnet (str, optional): Sub-rede a varrer antes da leitura da tabela.
+        fix (bool): Se True, substitui endereços MAC divergentes.
+
+    Returns:
+        list: Um dicionário por computador com as chaves "name", "ip",
+        "mac" (encontrado) e "status" ("filled", "ok", "mismatch",
+        "fixed", "not_found" ou "unresolved").
+    """
+    # Importado apenas aqui: o envio de um único pacote não precisa do pool
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    with ThreadPoolExecutor(max_workers=DISCOVERY_WORKERS) as executor:
+        addresses = list(executor.map(resolve_hostname, [c["hostname"] for c in computers]))
+
+    if subnet:
+        sweep_subnet(subnet)
+
+    arp_table = read_arp_table()
+    results = []
+
+    for comp, ip in zip(computers, addresses):
+        found_mac = arp_table.get(ip) if ip else None
+        result = {"name": comp["name"], "ip": ip, "mac": found_mac}
+
+        if ip is None:
+            result["status"] = "unresolved"
+        elif found_mac is None:
+            result["status"] = "not_found"
+        elif not comp.get("mac"):
+            comp["mac"] = found_mac
+            result["status"] = "filled"
+        else:
+            try:
+                current_mac = normalize_mac(comp["mac"])
+            except ValueError:
+                current_mac = None
+
+            if current_mac == found_mac:
+                result["status"] = "ok"
+            elif fix:
+                comp["mac"] = found_mac
+                result["status"] = "fixed"
+            else:
+                result["status"] = "mismatch"
+
+        results.append(result)
+
+    return results
+
+
 def wake_on_lan_menu():
     """
     Exibe um menu para ligar computadores remotamente.
@@ -172,19 +420,7 @@ def wake_on_lan_menu():
                 print("Entrada inválida. Digite um número.")
 
         elif choice == "2":
-            success_count = 0
-            for comp in computers:
-                try:
-                    wake_on_lan(comp["mac"])
-                    success_count += 1
-                except Exception as e:  # pylint-disable=broad-except
-                    print("Erro ao enviar Wake-on-LAN para {}: {}".format(comp['name'], e))
-
-            print(
-                "\n{} de {} computadores foram ligados com sucesso.".format(
-                    success_count, len(computers)
-                )
-            )
+            print_results(iter_wake(computers), len(computers), WAKE_SUMMARY)
 
         elif choice == "3":
             auto_computers = [comp for comp in computers if comp.get("auto_power_on", False)]
@@ -193,12 +429,7 @@ def wake_on_lan_menu():
                 print("Nenhum computador está configurado com auto_power_on.")
                 continue
 
-            success_count = wake_on_lan_all_auto()
-            print(
-                "\n{} de {} computadores foram ligados com sucesso.".format(
-                    success_count, len(auto_computers)
-                )
-            )
+            print_results(iter_wake(auto_computers), len(auto_computers), WAKE_SUMMARY)
 
         elif choice == "0":
             break
@@ -227,35 +458,23 @@ if __name__ == "__main__":
         action='store_true',
         help='Ligar apenas os computadores marcados como auto_power_on',
     )
+    parser.add_argument('--parallel', type=int, default=1, help='Envios feitos ao mesmo tempo')
+    parser.add_argument(
+        '--json', action='store_true', help='Um resultado JSON por linha, à medida que terminam'
+    )
 
     args = parser.parse_args()
 
-    if args.all:
-        # Ligar todos os computadores
+    if args.all or args.auto:
+        # Ligar todos os computadores ou apenas os auto_power_on
         computers = load_computers()
-        SUCCESS_COUNT = 0
-        for comp in computers:
-            try:
-                wake_on_lan(comp["mac"])
-                SUCCESS_COUNT += 1
-            except Exception as e:  # pylint-disable=broad-except
-                print("Erro ao enviar Wake-on-LAN para {}: {}".format(comp['name'], e))
-
-        print(
-            "\n{} de {} computadores foram ligados com sucesso.".format(
-                SUCCESS_COUNT, len(computers)
-            )
-        )
-
-    elif args.auto:
-        # Ligar apenas os computadores auto_power_on
-        SUCCESS_COUNT = wake_on_lan_all_auto()
-        computers = load_computers()
-        auto_computers = [comp for comp in computers if comp.get("auto_power_on", False)]
-        print(
-            "\n{} de {} computadores foram ligados com sucesso.".format(
-                SUCCESS_COUNT, len(auto_computers)
-            )
+        if args.auto:
+            computers = [comp for comp in computers if comp.get("auto_power_on", False)]
+        print_results(
+            iter_wake(computers, max_workers=args.parallel),
+            len(computers),
+            WAKE_SUMMARY,
+            json_lines=args.json,
         )
 
     elif args.target:
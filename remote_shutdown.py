@@ -8,23 +8,30 @@ import json
 import logging
 import os
 import subprocess
-import zipfile
 
-import paramiko
-import requests
+from fleet_results import SKIPPED, HostReport, iter_results, print_results
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()],
-)
 logger = logging.getLogger(__name__)
 
 # Constantes
 PSTOOLS_URL = "https://download.sysinternals.com/files/PSTools.zip"
 PSTOOLS_DIR = "PSTools"
 CONFIG_FILE = "computers.json"
+SHUTDOWN_SUMMARY = "{} de {} computadores foram desligados com sucesso."
+
+
+def configure_logging():
+    """
+    Configura a exibição dos logs no console.
+
+    Chamado pelos pontos de entrada de linha de comando; o serviço de
+    monitoramento configura os seus próprios manipuladores.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()],
+    )
 
 
 def ensure_pstools_exists():
@@ -49,6 +56,8 @@ def ensure_pstools_exists():
     # Baixa o arquivo PSTools.zip
     try:
         logger.info("Baixando PSTools de %s...", PSTOOLS_URL)
+        import requests  # pylint: disable=import-outside-toplevel
+
         response = requests.get(PSTOOLS_URL, stream=True, timeout=10)
         response.raise_for_status()
 
@@ -59,6 +68,8 @@ def ensure_pstools_exists():
                 f.write(chunk)
 
         # Extrai o arquivo zip
+        import zipfile  # pylint: disable=import-outside-toplevel
+
         logger.info("Extraindo PSTools.zip...")
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             zip_ref.extractall(PSTOOLS_DIR)
@@ -107,12 +118,13 @@ def save_computers(computers):
         json.dump(computers, f, indent=4)
 
 
-def shutdown_windows(computer):
+def shutdown_windows(computer, report=None):
     """
     Desliga um computador Windows remoto usando PSShutdown.
 
     Args:
         computer (dict): Dicionário com as configurações do computador.
+        report (HostReport, optional): Recebe a duração das etapas e o erro.
 
     Returns:
         bool: True se o comando foi executado com sucesso e
@@ -126,6 +138,9 @@ def shutdown_windows(computer):
     if not computer["save_password"]:
         password = getpass.getpass("Senha para {}@{}: ".format(username, hostname))
 
+    if report is None:
+        report = HostReport()
+
     psshutdown_path = os.path.join(PSTOOLS_DIR, "psshutdown.exe")
 
     # Constrói o comando
@@ -145,6 +160,7 @@ def shutdown_windows(computer):
     try:
         logger.info("Desligando %s...", hostname)
         result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        report.lap("command")
         print('Resposta do comando: {}'.format(result.stdout))
 
         if result.returncode == 0:
@@ -152,19 +168,25 @@ def shutdown_windows(computer):
             return True
         else:
             logger.error("Erro ao desligar %s: %s", hostname, result.stderr)
+            report.fail(
+                result.stderr.strip() or "psshutdown retornou {}".format(result.returncode)
+            )
             return False
 
     except Exception as e:  # pylint: disable=broad-except
         logger.error("Erro ao executar psshutdown: %s", e)
+        report.fail(e)
         return False
 
 
-def shutdown_linux(computer):
+def shutdown_linux(computer, report=None):
     """
     Desliga um computador Linux remoto usando SSH com shell interativo.
 
     Args:
         computer (dict): Dicionário com as configurações do computador.
+        report (HostReport, optional): Recebe a duração das etapas
+        (connect, command, settle) e o erro.
 
     Returns:
         bool: True se o comando foi executado com sucesso,
@@ -179,6 +201,12 @@ def shutdown_linux(computer):
     if not computer["save_password"] and not ssh_key:
         password = getpass.getpass("Senha para {}@{}: ".format(username, hostname))
 
+    if report is None:
+        report = HostReport()
+
+    # Importado apenas quando necessário: a pilha SSH é lenta para carregar
+    import paramiko  # pylint: disable=import-outside-toplevel
+
     try:
         logger.info("Conectando via SSH a %s...", hostname)
         ssh = paramiko.SSHClient()
@@ -189,6 +217,7 @@ def shutdown_linux(computer):
             ssh.connect(hostname, username=username, key_filename=ssh_key)
         else:
             ssh.connect(hostname, username=username, password=password)
+        report.lap("connect")
 
         # Inicia um shell interativo
         logger.info("Iniciando shell interativo...")
@@ -227,6 +256,8 @@ def shutdown_linux(computer):
 
             time.sleep(0.5)  # Pequena pausa para não sobrecarregar o CPU
 
+        report.lap("command")
+
         # Verificação adicional se o comando foi bem-sucedido
         success = True
 
@@ -245,36 +276,45 @@ def shutdown_linux(computer):
         except Exception:  # pylint: disable=broad-except
             # Se a conexão falhou ao fechar, pode ser um sinal de que o desligamento começou
             logger.info("Conexão fechada abruptamente, possível sinal de desligamento iniciado")
+        report.lap("settle")
 
         logger.info("Comando de desligamento enviado com sucesso para %s", hostname)
         return success
 
     except Exception as e:  # pylint: disable=broad-except
         logger.error("Erro ao desligar via SSH: %s", e)
+        report.fail(e)
         return False
 
 
-def shutdown_computer(computer):
+def shutdown_computer(computer, report=None):
     """
     Desliga um computador remoto, independente do sistema operacional.
 
     Args:
         computer (dict): Dicionário com as configurações do computador.
+        report (HostReport, optional): Recebe a duração das etapas e o erro.
 
     Returns:
         bool: True se o comando foi executado com sucesso,
         False caso contrário.
     """
+    if report is None:
+        report = HostReport()
+
     if computer["os_type"].lower() == "windows":
         if ensure_pstools_exists():
-            return shutdown_windows(computer)
+            report.lap("prepare")
+            return shutdown_windows(computer, report)
         else:
             logger.error("PSTools não está disponível para desligar computadores Windows.")
+            report.fail("PSTools não está disponível")
             return False
     elif computer["os_type"].lower() == "linux":
-        return shutdown_linux(computer)
+        return shutdown_linux(computer, report)
     else:
         logger.error("Sistema operacional não suportado: %s", computer['os_type'])
+        report.fail("Sistema operacional não suportado: {}".format(computer['os_type']))
         return False
 
 
@@ -305,19 +345,67 @@ def shutdown_by_name(computer_name):
     return shutdown_computer(target_computer)
 
 
-def shutdown_all_auto():
+def iter_shutdown(computers=None, max_workers=1, on_start=None, should_abort=None):
+    """
+    Desliga vários computadores, produzindo o resultado de cada um assim que termina.
+
+    Args:
+        computers (list, optional): Computadores a desligar. Por padrão, todos
+        os cadastrados com auto_power_off.
+        max_workers (int): Computadores desligados ao mesmo tempo.
+        on_start (callable, optional): Chamada com o computador antes de desligá-lo.
+        should_abort (callable, optional): Consultada antes de cada computador;
+        se retornar True, os restantes não são desligados (status SKIPPED).
+
+    Returns:
+        iterator: HostResult de cada computador, na ordem de conclusão.
+    """
+    if computers is None:
+        computers = [comp for comp in load_computers() if comp.get("auto_power_off", False)]
+    return iter_results(
+        "shutdown",
+        computers,
+        shutdown_computer,
+        max_workers=max_workers,
+        on_start=on_start,
+        should_abort=should_abort,
+    )
+
+
+def shutdown_all_auto(on_result=None, computers=None, on_start=None, should_abort=None):
     """
     Desliga todos os computadores marcados como auto_power_off.
 
+    Args:
+        on_result (callable, optional): Chamada após cada computador com
+        (computador, sucesso, duração em segundos).
+        computers (list, optional): Computadores a desligar. Por padrão, todos
+        os cadastrados com auto_power_off.
+        on_start (callable, optional): Chamada com o computador antes de desligá-lo.
+        should_abort (callable, optional): Consultada antes de cada computador;
+        se retornar True, os computadores restantes não são desligados.
+
     Returns:
         int: Número de computadores desligados com sucesso.
     """
-    computers = load_computers()
+    if computers is None:
+        computers = [comp for comp in load_computers() if comp.get("auto_power_off", False)]
+    by_name = {comp["name"]: comp for comp in computers}
     success_count = 0
+    interrupted = False
 
-    for comp in computers:
-        if comp.get("auto_power_off", False) and shutdown_computer(comp):
+    for result in iter_shutdown(computers, on_start=on_start, should_abort=should_abort):
+        if result.status == SKIPPED:
+            if not interrupted:
+                logger.warning("Desligamento interrompido antes de %s.", result.host)
+                interrupted = True
+            continue
+
+        success = result.error is None
+        if success:
             success_count += 1
+        if on_result is not None:
+            on_result(by_name[result.host], success, result.duration)
 
     return success_count
 
@@ -368,16 +456,7 @@ def shutdown_menu():
                 print("Entrada inválida. Digite um número.")
 
         elif choice == "2":
-            success_count = 0
-            for comp in computers:
-                if shutdown_computer(comp):
-                    success_count += 1
-
-            print(
-                "\n{} de {} computadores foram desligados com sucesso.".format(
-                    success_count, len(computers)
-                )
-            )
+            print_results(iter_shutdown(computers), len(computers), SHUTDOWN_SUMMARY)
 
         elif choice == "3":
             auto_computers = [comp for comp in computers if comp.get("auto_power_off", False)]
@@ -386,12 +465,7 @@ def shutdown_menu():
                 print("Nenhum computador está configurado com auto_power_off.")
                 continue
 
-            success_count = shutdown_all_auto()
-            print(
-                "\n{} de {} computadores foram desligados com sucesso.".format(
-                    success_count, len(auto_computers)
-                )
-            )
+            print_results(iter_shutdown(auto_computers), len(auto_computers), SHUTDOWN_SUMMARY)
 
         elif choice == "0":
             break
@@ -402,6 +476,8 @@ def shutdown_menu():
 
 if __name__ == "__main__":
 
+    configure_logging()
+
     parser = argparse.ArgumentParser(description='Desligar computadores remotamente.')
     parser.add_argument('target', nargs='?', help='Nome do computador cadastrado')
     parser.add_argument(
@@ -414,32 +490,25 @@ if __name__ == "__main__":
         action='store_true',
         help='Desligar apenas os computadores marcados como auto_power_off',
     )
+    parser.add_argument(
+        '--parallel', type=int, default=1, help='Computadores desligados ao mesmo tempo'
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='Um resultado JSON por linha, à medida que terminam'
+    )
 
     args = parser.parse_args()
 
-    if args.all:
-        # Desligar todos os computadores
+    if args.all or args.auto:
+        # Desligar todos os computadores ou apenas os auto_power_off
         computers = load_computers()
-        SUCCESS_COUNT = 0
-        for comp in computers:
-            if shutdown_computer(comp):
-                SUCCESS_COUNT += 1
-
-        print(
-            "\n{} de {} computadores foram desligados com sucesso.".format(
-                SUCCESS_COUNT, len(computers)
-            )
-        )
-
-    elif args.auto:
-        # Desligar apenas os computadores auto_power_off
-        SUCCESS_COUNT = shutdown_all_auto()
-        computers = load_computers()
-        auto_computers = [comp for comp in computers if comp.get("auto_power_off", False)]
-        print(
-            "\n{} de {} computadores foram desligados com sucesso.".format(
-                SUCCESS_COUNT, len(auto_computers)
-            )
+        if args.auto:
+            computers = [comp for comp in computers if comp.get("auto_power_off", False)]
+        print_results(
+            iter_shutdown(computers, max_workers=args.parallel),
+            len(computers),
+            SHUTDOWN_SUMMARY,
+            json_lines=args.json,
         )
 
     elif args.target:
@@ -0,0 +1,123 @@
+"""
+Estimativa da autonomia restante a partir do histórico de descarga da bateria.
+
+Mantém uma janela deslizante das leituras feitas na bateria, ajusta a taxa
+de descarga por mínimos quadrados e estima o tempo até a bateria se esgotar.
+"""
+
+import collections
+
+# Constantes
+DEFAULT_WINDOW = 900  # segundos de histórico considerados no ajuste
+MIN_SAMPLES = 3
+MIN_SPAN = 60  # segundos entre a primeira e a última leitura da janela
+MIN_FIT_POINTS = 2  # pontos necessários para ajustar uma reta
+
+
+def fit_slope(points):
+    """
+    Ajusta uma reta y = a + b*x por mínimos quadrados.
+
+    As somas são acumuladas em uma única passada (forma fechada), sem
+    matrizes intermediárias.
+
+    Args:
+        points (iterable): Pares (x, y).
+
+    Returns:
+        float: Inclinação b, ou None se houver menos de dois valores distintos de x.
+    """
+    n = 0
+    sum_x = sum_y = sum_xx = sum_xy = 0.0
+    for x, y in points:
+        n += 1
+        sum_x += x
+        sum_y += y
+        sum_xx += x * x
+        sum_xy += x * y
+
+    denominator = n * sum_xx - sum_x * sum_x
+    if n < MIN_FIT_POINTS or denominator == 0:
+        return None
+    return (n * sum_xy - sum_x * sum_y) / denominator
+
+
+class DrainHistory:
+    """
+    Janela deslizante das leituras da bateria feitas sem energia elétrica.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        """
+        Args:
+            window (float): Duração da janela de histórico (em segundos).
+        """
+        self.window = window
+        self.samples = collections.deque()
+
+    def add(self, sample):
+        """
+        Registra uma leitura. Leituras na energia elétrica limpam o histórico,
+        pois a descarga de uma queda anterior não vale para a próxima.
+
+        Args:
+            sample (BatterySample): Leitura do ciclo atual.
+        """
+        if sample.on_power:
+            self.samples.clear()
+            return
+        if sample.percent is None:
+            return
+
+        timestamp = sample.timestamp.timestamp()
+        self.samples.append((timestamp, sample.percent))
+        while self.samples and timestamp - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def clear(self):
+        """Descarta o histórico."""
+        self.samples.clear()
+
+    def drain_rate(self):
+        """
+        Calcula a taxa de descarga da janela atual.
+
+        Returns:
+            float: Pontos percentuais consumidos por segundo (positivo), ou None
+            se ainda não houver leituras suficientes ou a bateria não estiver descarregando.
+        """
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        if self.samples[-1][0] - self.samples[0][0] < MIN_SPAN:
+            return None
+
+        origin = self.samples[0][0]
+        slope = fit_slope((timestamp - origin, percent) for timestamp, percent in self.samples)
+        if slope is None or slope >= 0:
+            return None
+        return -slope
+
+    def time_to_empty(self, sample, reserve_percent=0):
+        """
+        Estima o tempo até a bateria atingir a reserva.
+
+        Quando a fonte informa a autonomia (por exemplo, um nobreak via NUT),
+        usa a menor entre a informada e a estimada.
+
+        Args:
+            sample (BatterySample): Leitura do ciclo atual.
+            reserve_percent (float): Porcentagem considerada como bateria esgotada.
+
+        Returns:
+            float: Segundos restantes, ou None se não for possível estimar.
+        """
+        estimates = []
+
+        rate = self.drain_rate()
+        if rate is not None and sample.percent is not None:
+            estimates.append(max(sample.percent - reserve_percent, 0) / rate)
+
+        if getattr(sample, "runtime", None) is not None:
+            estimates.append(sample.runtime)
+
+        return min(estimates) if estimates else None
@@ -0,0 +1,105 @@
+"""
+Configuração padrão do serviço de monitoramento e leitura do service_config.json.
+
+Este módulo é a única fonte dos valores padrão da configuração, usada pelo
+serviço e pelo menu de configuração. Ele é barato de importar: os módulos
+que definem os nomes de arquivos e limites (alguns carregam o sqlite3) só
+são importados ao montar a configuração padrão.
+"""
+
+import copy
+import json
+
+# Constantes
+CONFIG_FILE = "service_config.json"
+
+
+def default_service_config():
+    """
+    Monta a configuração padrão do serviço.
+
+    Returns:
+        dict: Configuração padrão (uma cópia nova a cada chamada).
+    """
+    # pylint: disable=import-outside-toplevel
+    from control_socket import CONTROL_SOCKET
+    from event_journal import JOURNAL_FILE
+    from metrics import METRICS_HOST, METRICS_PORT
+    from notification_outbox import (
+        DEFAULT_MAX_ATTEMPTS,
+        DEFAULT_MAX_RETRY_DELAY,
+        DEFAULT_RETRY_DELAY,
+        OUTBOX_FILE,
+    )
+    from notification_policy import DEFAULT_RULES
+    from nut_client import NUT_DEFAULT_PORT, NUT_DEFAULT_TIMEOUT
+    from outage_workflow import WORKFLOW_FILE
+    from power_history import DEFAULT_CAPACITY, HISTORY_FILE
+    from status_segment import STATUS_SEGMENT_FILE
+
+    # pylint: enable=import-outside-toplevel
+
+    return {
+        "battery_threshold": 25,
+        "time_without_charger": 10,  # minutos
+        "delay_after_power_restore": 2,  # minutos
+        "last_execution": None,
+        "power_failure_detected": False,
+        "check_interval_min": 5,  # segundos
+        "check_interval_on_battery": 30,  # segundos
+        "check_interval_max": 300,  # segundos
+        "power_source": "local",  # "local" (bateria do sistema) ou "nut" (nobreak via upsd)
+        "nut": {
+            "host": "localhost",
+            "port": NUT_DEFAULT_PORT,
+            "ups": "ups",
+            "username": "",
+            "password": "",
+            "timeout": NUT_DEFAULT_TIMEOUT,
+        },
+        "runtime_prediction": True,
+        "runtime_window": 900,  # segundos de histórico usados na estimativa
+        "runtime_reserve_percent": 5,  # porcentagem considerada como bateria esgotada
+        "runtime_margin": 120,  # segundos de folga além da duração do desligamento
+        "default_shutdown_duration": 180,  # segundos, até a primeira medição real
+        "history_file": HISTORY_FILE,
+        "history_capacity": DEFAULT_CAPACITY,  # registros de 16 bytes
+        "journal_file": JOURNAL_FILE,
+        "workflow_file": WORKFLOW_FILE,
+        "outbox_file": OUTBOX_FILE,
+        "notification_max_attempts": DEFAULT_MAX_ATTEMPTS,
+        "notification_retry_delay": DEFAULT_RETRY_DELAY,  # segundos, dobra a cada falha
+        "notification_retry_max_delay": DEFAULT_MAX_RETRY_DELAY,  # segundos
+        # Evento -> min_interval, change_key, change_step e/ou digest_window
+        "notification_policy": copy.deepcopy(DEFAULT_RULES),
+        # Canais além do email: {"type": "webhook" | "syslog" | "unix", ...}
+        "notification_sinks": [],
+        # Socket Unix usado pela linha de comando ("" desabilita)
+        "control_socket": CONTROL_SOCKET,
+        # Estado atual mapeado em memória para consultas frequentes ("" desabilita)
+        "status_file": STATUS_SEGMENT_FILE,
+        # Endpoint /metrics no formato OpenMetrics (porta 0 desabilita)
+        "metrics_host": METRICS_HOST,
+        "metrics_port": METRICS_PORT,
+    }
+
+
+def read_service_config(path=CONFIG_FILE):
+    """
+    Lê a configuração gravada, sem completar os valores padrão e sem criar o arquivo.
+
+    Usada pelos comandos que só precisam de uma ou duas chaves (com .get() e o
+    valor padrão do módulo correspondente), como o caminho do socket de controle.
+
+    Args:
+        path (str): Caminho do arquivo.
+
+    Returns:
+        dict: Configuração gravada, ou vazia se o arquivo não existir ou for inválido.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return config if isinstance(config, dict) else {}
@@ -0,0 +1,204 @@
+"""
+Sessão SMTP reutilizável, com verificação por NOOP, reconexão e servidores
+alternativos.
+
+Em vez de conectar, negociar TLS e autenticar a cada email, a sessão
+autenticada é mantida aberta entre os envios e mantida viva com NOOP
+enquanto estiver ociosa. Se a conexão cair, uma nova é aberta; se o
+servidor principal estiver inacessível, os alternativos são tentados em
+ordem.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+
+# Constantes
+DEFAULT_TIMEOUT = 10  # segundos para conectar e para cada comando
+DEFAULT_KEEPALIVE_INTERVAL = 60  # segundos entre NOOPs com a sessão ociosa
+DEFAULT_IDLE_TIMEOUT = 300  # segundos ociosos antes de encerrar a sessão
+SMTP_OK = 250  # código de resposta esperado do NOOP
+
+# Falhas que indicam uma sessão morta (vale reconectar e tentar de novo)
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+logger = logging.getLogger("PowerMonitor.smtp")
+
+
+class SMTPConnectionManager:
+    """
+    Mantém uma sessão SMTP autenticada para vários envios.
+
+    Os métodos são seguros para uso por várias threads (um lock serializa o
+    uso da sessão).
+    """
+
+    def __init__(
+        self,
+        relays,
+        timeout=DEFAULT_TIMEOUT,
+        keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+    ):
+        """
+        Args:
+            relays (list): Servidores em ordem de preferência, cada um um dicionário
+            com host, port, username, password e starttls.
+            timeout (float): Tempo limite de conexão e de cada comando (em segundos).
+            keepalive_interval (float): Intervalo dos NOOPs com a sessão ociosa (em segundos).
+            idle_timeout (float): Tempo ocioso até encerrar a sessão (em segundos).
+        """
+        self.relays = relays
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.relay = None
+        self._session = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _connect(self):
+        """
+        Abre uma sessão autenticada, tentando os servidores em ordem.
+
+        Raises:
+            smtplib.SMTPException ou OSError: Se nenhum servidor aceitar a conexão.
+        """
+        last_error = None
+        for relay in self.relays:
+            try:
+                session = smtplib.SMTP(relay["host"], relay["port"], timeout=self.timeout)
+            except CONNECTION_ERRORS as e:
+                logger.warning(
+                    "Servidor SMTP %s:%s inacessível: %s", relay["host"], relay["port"], e
+                )
+                last_error = e
+                continue
+
+            try:
+                session.ehlo()
+                if relay.get("starttls", True):
+                    session.starttls()
+                    session.ehlo()
+                if relay.get("username"):
+                    session.login(relay["username"], relay.get("password", ""))
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning("Falha ao iniciar a sessão em %s: %s", relay["host"], e)
+                _close_quietly(session)
+                last_error = e
+                continue
+
+            self._session = session
+            self.relay = relay
+            logger.info("Sessão SMTP aberta em %s:%s.", relay["host"], relay["port"])
+            return
+
+        raise last_error or smtplib.SMTPException("Nenhum servidor SMTP configurado")
+
+    def _is_alive(self):
+        """Verifica com NOOP se a sessão ainda responde."""
+        try:
+            return self._session.noop()[0] == SMTP_OK
+        except CONNECTION_ERRORS + (smtplib.SMTPException,):
+            return False
+
+    def _ensure_session(self):
+        """Reutiliza a sessão aberta, se ainda responder, ou abre uma nova."""
+        if self._session is not None:
+            idle = time.monotonic() - self._last_used
+            expired = idle > self.idle_timeout
+            if expired or (idle > self.keepalive_interval and not self._is_alive()):
+                self._close_session()
+        if self._session is None:
+            self._connect()
+
+    def _close_session(self):
+        """Encerra a sessão atual."""
+        if self._session is not None:
+            _close_quietly(self._session)
+        self._session = None
+        self.relay = None
+
+    def send_messages(self, messages):
+        """
+        Envia várias mensagens pela mesma sessão.
+
+        Se a sessão cair durante o envio, uma nova é aberta (possivelmente em
+        outro servidor) e o envio continua da mensagem que falhou.
+
+        Args:
+            messages (list): Tuplas (remetente, destinatários, mensagem em texto).
+
+        Raises:
+            smtplib.SMTPException ou OSError: Se o envio falhar mesmo após reconectar.
+        """
+        with self._lock:
+            self._cancel_keepalive()
+            try:
+                for from_address, recipients, message in messages:
+                    for attempt in range(2):
+                        try:
+                            self._ensure_session()
+                            self._session.sendmail(from_address, recipients, message)
+                            break
+                        except CONNECTION_ERRORS:
+                            self._close_session()
+                            if attempt:
+                                raise
+                    self._last_used = time.monotonic()
+            finally:
+                self._schedule_keepalive()
+
+    def send(self, from_address, recipients, message):
+        """
+        Envia uma mensagem reutilizando a sessão aberta.
+
+        Args:
+            from_address (str): Remetente.
+            recipients (list): Destinatários.
+            message (str): Mensagem completa em texto.
+        """
+        self.send_messages([(from_address, recipients, message)])
+
+    def _schedule_keepalive(self):
+        """Agenda o próximo NOOP enquanto a sessão estiver aberta."""
+        if self._session is None:
+            return
+        self._timer = threading.Timer(self.keepalive_interval, self.keepalive)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_keepalive(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def keepalive(self):
+        """Envia um NOOP para manter a sessão ociosa aberta, encerrando-a após idle_timeout."""
+        with self._lock:
+            self._timer = None
+            if self._session is None:
+                return
+            if time.monotonic() - self._last_used > self.idle_timeout or not self._is_alive():
+                self._close_session()
+                return
+            self._schedule_keepalive()
+
+    def close(self):
+        """Encerra a sessão e o keepalive."""
+        with self._lock:
+            self._cancel_keepalive()
+            self._close_session()
+
+
+def _close_quietly(session):
+    """Encerra uma sessão SMTP ignorando erros de uma conexão já perdida."""
+    try:
+        session.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            session.close()
+        except OSError:
+            pass
@@ -0,0 +1,384 @@
+"""
+Estado atual do serviço publicado em um arquivo mapeado em memória.
+
+O serviço grava um registro de tamanho fixo (última leitura, fase da queda,
+contadores por computador e um heartbeat) que qualquer processo pode ler
+sem interpretar JSON e sem conversar com o serviço. A consistência segue o
+padrão seqlock: o gravador torna o contador de sequência ímpar antes de
+alterar o registro e par ao terminar; o leitor copia o registro e repete a
+cópia se a sequência mudou ou estava ímpar, de modo que nunca vê uma
+gravação pela metade.
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from outage_workflow import IDLE, ON_BATTERY, SHUT_DOWN, SHUTTING_DOWN, WAKING
+
+# Constantes
+STATUS_SEGMENT_FILE = "power_monitor.status"
+MAGIC = b"WOLS"
+VERSION = 1
+MAX_HOSTS = 64
+HOST_NAME_SIZE = 32  # bytes UTF-8; nomes maiores são truncados
+HEARTBEAT_INTERVAL = 1  # segundos entre as atualizações do heartbeat
+STALE_AFTER = 10  # segundos sem heartbeat até considerar o serviço parado
+MAX_READ_ATTEMPTS = 1000
+# magic, versão, tamanho do estado, tamanho de cada computador, máximo de computadores
+HEADER = struct.Struct("<4sHHHH4x")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = HEADER.size
+BODY_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+# heartbeat (s), leitura (s, 0 = nenhuma), pid, porcentagem (-1 = desconhecida),
+# na energia (255 = desconhecido), fase, ação em andamento, autonomia em s (-1), computadores
+STATE = struct.Struct("<ddIbBBBiH2x")
+# nome, desligamentos, falhas de desligamento, religamentos, falhas de religamento, última ação (s)
+HOST = struct.Struct("<{}sIIIId".format(HOST_NAME_SIZE))
+BODY_SIZE = STATE.size + MAX_HOSTS * HOST.size
+UNKNOWN = -1
+UNKNOWN_POWER = 255
+# Fases do fluxo da queda (outage_workflow), na ordem dos códigos gravados
+PHASES = (IDLE, ON_BATTERY, SHUTTING_DOWN, SHUT_DOWN, WAKING)
+ACTIONS = ("shutdown", "wake")
+
+StatusSnapshot = collections.namedtuple(
+    "StatusSnapshot",
+    [
+        "heartbeat",
+        "timestamp",
+        "pid",
+        "percent",
+        "on_power",
+        "phase",
+        "fleet_busy",
+        "runtime",
+        "hosts",
+    ],
+)
+StatusSnapshot.__doc__ = """
+Cópia consistente do estado publicado pelo serviço.
+
+Attributes:
+    heartbeat (datetime.datetime): Última atualização feita pelo serviço.
+    timestamp (datetime.datetime): Momento da última leitura, ou None.
+    pid (int): PID do serviço.
+    percent (int): Porcentagem da bateria, ou None.
+    on_power (bool): True se conectado à energia elétrica, ou None.
+    phase (str): Fase do fluxo da queda.
+    fleet_busy (bool): True durante um desligamento ou religamento em lote.
+    runtime (int): Autonomia informada pela fonte (em segundos), ou None.
+    hosts (list): HostCounters de cada computador com alguma ação.
+"""
+
+HostCounters = collections.namedtuple(
+    "HostCounters",
+    ["name", "shutdowns", "shutdown_failures", "wakes", "wake_failures", "last_action"],
+)
+
+
+class StatusSegment:
+    """
+    Registro de estado do serviço mapeado em memória.
+
+    Apenas o serviço abre o arquivo para escrita (as gravações das várias
+    threads do serviço são serializadas por um lock); leitores o abrem em
+    modo somente leitura e não bloqueiam o gravador.
+    """
+
+    def __init__(self, path=STATUS_SEGMENT_FILE, writable=False):
+        """
+        Args:
+            path (str): Caminho do arquivo.
+            writable (bool): Abre para gravação, recriando o arquivo com o registro zerado.
+
+        Raises:
+            ValueError: Se o arquivo existir com um formato incompatível.
+            FileNotFoundError: Se o arquivo não existir e writable for False.
+        """
+        self.path = path
+        self.writable = writable
+        self._lock = threading.Lock()
+        self._state = {
+            "timestamp": 0.0,
+            "pid": os.getpid(),
+            "percent": UNKNOWN,
+            "on_power": UNKNOWN_POWER,
+            "phase": 0,
+            "fleet_busy": 0,
+            "runtime": UNKNOWN,
+        }
+        self._hosts = collections.OrderedDict()  # nome -> [4 contadores, última ação]
+
+        if writable:
+            # Cada execução do serviço começa com um registro novo (e uma sequência par),
+            # montado ao lado e trocado de uma vez: leitores que já mapearam o arquivo
+            # anterior continuam com uma cópia íntegra em vez de um arquivo truncado
+            temporary = "{}.{}.tmp".format(path, os.getpid())
+            try:
+                with open(temporary, 'wb') as f:
+                    f.write(HEADER.pack(MAGIC, VERSION, STATE.size, HOST.size, MAX_HOSTS))
+                    f.truncate(BODY_OFFSET + BODY_SIZE)
+                os.replace(temporary, path)
+            except OSError:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+
+        # pylint: disable-next=consider-using-with
+        self._file = open(path, 'r+b' if writable else 'rb')
+        try:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+
+        if len(self._map) < BODY_OFFSET + BODY_SIZE or HEADER.unpack_from(self._map, 0) != (
+            MAGIC,
+            VERSION,
+            STATE.size,
+            HOST.size,
+            MAX_HOSTS,
+        ):
+            self.close()
+            raise ValueError("Formato de segmento de status inválido: {}".format(path))
+
+    def close(self):
+        """Fecha o arquivo; no modo de gravação, marca antes o serviço como parado."""
+        if self._map is None:
+            return
+        if self.writable:
+            with self._lock:
+                self._state["pid"] = 0
+                self._write(heartbeat=0.0)
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def publish(self, sample=None, phase=None, fleet_busy=None):
+        """
+        Atualiza o estado publicado e o heartbeat.
+
+        Args:
+            sample (BatterySample, optional): Última leitura da fonte de energia.
+            phase (str, optional): Fase do fluxo da queda.
+            fleet_busy (bool, optional): Ação em lote em andamento.
+        """
+        with self._lock:
+            if sample is not None:
+                self._state["timestamp"] = sample.timestamp.timestamp()
+                self._state["percent"] = UNKNOWN if sample.percent is None else sample.percent
+                self._state["on_power"] = 1 if sample.on_power else 0
+                runtime = getattr(sample, "runtime", None)
+                self._state["runtime"] = UNKNOWN if runtime is None else runtime
+            if phase is not None:
+                self._state["phase"] = PHASES.index(phase) if phase in PHASES else 0
+            if fleet_busy is not None:
+                self._state["fleet_busy"] = 1 if fleet_busy else 0
+            self._write()
+
+    def record_host(self, name, action, success):
+        """
+        Conta o resultado de uma ação em um computador.
+
+        Args:
+            name (str): Nome do computador.
+            action (str): "shutdown" ou "wake".
+            success (bool): Resultado da ação.
+        """
+        with self._lock:
+            counters = self._hosts.get(name)
+            if counters is None:
+                if len(self._hosts) >= MAX_HOSTS:
+                    return
+                counters = self._hosts[name] = [0, 0, 0, 0, 0.0]
+            counters[ACTIONS.index(action) * 2 + (0 if success else 1)] += 1
+            counters[4] = time.time()
+            self._write()
+
+    def _write(self, heartbeat=None):
+        """
+        Grava o registro completo entre as duas atualizações da sequência.
+
+        Args:
+            heartbeat (float, optional): Heartbeat gravado (padrão: agora).
+        """
+        sequence = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] + 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence)
+
+        state = self._state
+        STATE.pack_into(
+            self._map,
+            BODY_OFFSET,
+            time.time() if heartbeat is None else heartbeat,
+            state["timestamp"],
+            state["pid"],
+            state["percent"],
+            state["on_power"],
+            state["phase"],
+            state["fleet_busy"],
+            state["runtime"],
+            len(self._hosts),
+        )
+        offset = BODY_OFFSET + STATE.size
+        for name, counters in self._hosts.items():
+            encoded = name.encode('utf-8')[:HOST_NAME_SIZE]
+            HOST.pack_into(self._map, offset, encoded, *counters)
+            offset += HOST.size
+
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence + 1)
+
+    def read(self):
+        """
+        Lê uma cópia consistente do estado.
+
+        Returns:
+            StatusSnapshot: Estado publicado pelo serviço.
+
+        Raises:
+            TimeoutError: Se o registro estiver sempre em gravação (gravador
+            interrompido no meio de uma atualização).
+        """
+        for _ in range(MAX_READ_ATTEMPTS):
+            before = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+            if before % 2:
+                continue
+            body = self._map[BODY_OFFSET : BODY_OFFSET + BODY_SIZE]
+            if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] == before:
+                return _decode(body)
+        raise TimeoutError("Segmento de status em gravação: {}".format(self.path))
+
+
+def _decode(body):
+    """Converte a cópia do registro em um StatusSnapshot."""
+    (
+        heartbeat,
+        timestamp,
+        pid,
+        percent,
+        on_power,
+        phase,
+        fleet_busy,
+        runtime,
+        host_count,
+    ) = STATE.unpack_from(body, 0)
+
+    hosts = []
+    for index in range(min(host_count, MAX_HOSTS)):
+        name, *counters, last_action = HOST.unpack_from(body, STATE.size + index * HOST.size)
+        hosts.append(
+            HostCounters(
+                name.rstrip(b"\0").decode('utf-8', 'replace'),
+                *counters,
+                datetime.datetime.fromtimestamp(last_action) if last_action else None
+            )
+        )
+
+    return StatusSnapshot(
+        datetime.datetime.fromtimestamp(heartbeat),
+        datetime.datetime.fromtimestamp(timestamp) if timestamp else None,
+        pid,
+        None if percent == UNKNOWN else percent,
+        None if on_power == UNKNOWN_POWER else bool(on_power),
+        PHASES[phase] if phase < len(PHASES) else PHASES[0],
+        bool(fleet_busy),
+        None if runtime == UNKNOWN else runtime,
+        hosts,
+    )
+
+
+def read_status(path=STATUS_SEGMENT_FILE):
+    """
+    Lê o estado publicado pelo serviço, se ele estiver em execução.
+
+    Args:
+        path (str): Caminho do arquivo.
+
+    Returns:
+        StatusSnapshot: Estado atual, ou None se o arquivo não existir, o
+        serviço o tiver marcado como parado ao encerrar ou o heartbeat tiver
+        mais de STALE_AFTER segundos.
+    """
+    try:
+        with StatusSegment(path) as segment:
+            snapshot = segment.read()
+    except (OSError, ValueError):
+        return None
+    if not snapshot.pid:
+        return None
+    if (datetime.datetime.now() - snapshot.heartbeat).total_seconds() > STALE_AFTER:
+        return None
+    return snapshot
+
+
+def print_status(snapshot):
+    """
+    Exibe o estado publicado pelo serviço.
+
+    Args:
+        snapshot (StatusSnapshot): Estado lido por read_status().
+    """
+    if snapshot.on_power is None:
+        supply = "-"
+    else:
+        supply = "rede elétrica" if snapshot.on_power else "bateria"
+
+    print("Serviço está em execução (PID: {})".format(snapshot.pid))
+    print("  Alimentação: {}".format(supply))
+    percent, runtime = snapshot.percent, snapshot.runtime
+    print("  Bateria: {}".format("-" if percent is None else "{}%".format(percent)))
+    print("  Autonomia: {}".format("-" if runtime is None else "{} s".format(runtime)))
+    print("  Fase: {}{}".format(snapshot.phase, " (em execução)" if snapshot.fleet_busy else ""))
+    print(
+        "  Última verificação: {}".format(
+            snapshot.timestamp.strftime("%d/%m/%Y %H:%M:%S") if snapshot.timestamp else "-"
+        )
+    )
+    for host in snapshot.hosts:
+        print(
+            "  {}: desligamentos {} (falhas {}), religamentos {} (falhas {})".format(
+                host.name, host.shutdowns, host.shutdown_failures, host.wakes, host.wake_failures
+            )
+        )
+
+
+def snapshot_to_dict(snapshot):
+    """Converte um StatusSnapshot em um dicionário serializável em JSON."""
+    data = snapshot._asdict()
+    data["hosts"] = [host._asdict() for host in snapshot.hosts]
+    return data
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Consultar o estado publicado pelo serviço.')
+    parser.add_argument('--file', default=STATUS_SEGMENT_FILE, help='Arquivo de status')
+    parser.add_argument('--json', action='store_true', help='Saída em JSON (uma linha)')
+    parser.add_argument('--watch', type=float, help='Repetir a cada N segundos')
+
+    args = parser.parse_args()
+
+    while True:
+        current = read_status(args.file)
+        if current is None:
+            print("Serviço não está em execução.")
+        elif args.json:
+            print(json.dumps(snapshot_to_dict(current), default=str), flush=True)
+        else:
+            print_status(current)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,33 @@
+import pytest
+
+from event_journal import EventJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = EventJournal(str(tmp_path / 'journal.db'))
+    yield journal
+    journal.close()
+
+
+def test_latency_ignores_failed_actions(journal):
+    for duration in (1.0, 2.0, 3.0):
+        journal.record_host_action('pc1', 'shutdown', True, duration)
+    journal.record_host_action('pc1', 'shutdown', False, 120.0, 'timeout')
+
+    (row,) = journal.host_latency_report('shutdown', rank=95)
+
+    assert (row['count'], row['failures']) == (4, 1)
+    assert row['p50'] == pytest.approx(2.0)
+    assert row['max'] == pytest.approx(3.0)
+
+
+def test_latency_of_host_that_only_failed(journal):
+    journal.record_host_action('pc1', 'wake', True, 0.5)
+    journal.record_host_action('pc2', 'wake', False, 30.0, 'timeout')
+
+    report = journal.host_latency_report('wake')
+
+    assert [row['host'] for row in report] == ['pc1', 'pc2']
+    assert report[1]['failures'] == 1
+    assert report[1]['p50'] is None
@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from http_api import FleetAPI
+
+TOKEN = 'secret'
+COMPUTERS = [
+    {'name': 'pc1', 'hostname': '192.0.2.1', 'password': 'hunter2', 'auto_power_off': True},
+    {'name': 'pc2', 'hostname': '192.0.2.2', 'password': 'hunter2'},
+]
+
+
+@contextlib.contextmanager
+def running(server):
+    """Executa a FleetAPI em uma thread própria; os jobs criados não são executados."""
+    server.load_registry = lambda: COMPUTERS
+    server.jobs_started = []
+
+    async def run_job(job):
+        server.jobs_started.append(job)
+
+    server._run_job = run_job  # pylint: disable=protected-access
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    # pylint: disable-next=protected-access
+    server.address = server._server.sockets[0].getsockname()[:2]
+    try:
+        yield server
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+@pytest.fixture
+def api():
+    with running(FleetAPI(port=0, token=TOKEN, control_socket='')) as server:
+        yield server
+
+
+@pytest.fixture
+def silent_service(tmp_path):
+    """Socket de controle que aceita conexões e nunca responde."""
+    path = str(tmp_path / 'control.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    yield path
+    listener.close()
+
+
+def request(api, method, path, body=None, token=TOKEN, content_type='application/json'):
+    connection = http.client.HTTPConnection(*api.address, timeout=5)
+    headers = {}
+    if token is not None:
+        headers['Authorization'] = 'Bearer {}'.format(token)
+    if content_type is not None:
+        headers['Content-Type'] = content_type
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_requires_token(api):
+    assert request(api, 'GET', '/computers', token=None)[0] == 401
+    assert request(api, 'GET', '/computers', token='wrong')[0] == 401
+
+
+def test_refuses_to_start_without_token():
+    with pytest.raises(ValueError, match='token'):
+        asyncio.run(FleetAPI(port=0).start())
+
+
+def test_computers_hide_passwords(api):
+    status, computers = request(api, 'GET', '/computers')
+
+    assert status == 200
+    assert [comp['name'] for comp in computers] == ['pc1', 'pc2']
+    assert 'password' not in json.dumps(computers)
+
+
+def test_post_requires_json_content_type(api):
+    status, _ = request(api, 'POST', '/wake', '{"targets": ["pc1"]}', content_type='text/plain')
+
+    assert status == 415
+    assert not api.jobs_started
+
+
+def test_empty_body_does_not_select_every_computer(api):
+    assert request(api, 'POST', '/shutdown')[0] == 400
+    assert request(api, 'POST', '/shutdown', '{}')[0] == 400
+    assert not api.jobs_started
+
+
+def test_explicit_selection(api):
+    status, job = request(api, 'POST', '/shutdown', '{"selection": "auto"}')
+
+    assert status == 202
+    assert job['hosts'] == ['pc1']
+    status, job = request(api, 'POST', '/wake', '{"selection": "all", "parallel": 2}')
+    assert status == 202
+    assert job['hosts'] == ['pc1', 'pc2']
+
+
+def test_targets(api):
+    status, job = request(api, 'POST', '/wake', '{"targets": ["PC2"]}')
+
+    assert status == 202
+    assert job['hosts'] == ['pc2']
+    assert request(api, 'POST', '/wake', '{"targets": ["pc9"]}')[0] == 404
+
+
+def test_non_string_targets_are_rejected(api):
+    status, payload = request(api, 'POST', '/wake', '{"targets": [1]}')
+
+    assert status == 400
+    assert 'targets' in payload['error']
+
+
+def test_truncated_body_is_rejected(api):
+    with socket.create_connection(api.address, timeout=5) as sock:
+        sock.sendall(
+            b'POST /wake HTTP/1.1\r\nAuthorization: Bearer secret\r\n'
+            b'Content-Type: application/json\r\nContent-Length: 100\r\n\r\n{"targets"'
+        )
+        sock.shutdown(socket.SHUT_WR)
+        response = sock.makefile('rb').read()
+
+    assert response.startswith(b'HTTP/1.1 400 ')
+    assert not api.jobs_started
+
+
+def test_probe_timeout_is_reported(silent_service):
+    server = FleetAPI(port=0, token=TOKEN, control_socket=silent_service, probe_timeout=0.2)
+    with running(server):
+        status, payload = request(server, 'POST', '/probe')
+
+    assert status == 504
+    assert 'a tempo' in payload['error']
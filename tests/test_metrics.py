@@ -0,0 +1,73 @@
+import threading
+
+from metrics import MAX_PENDING, MetricsRegistry
+
+
+def test_counter_render():
+    registry = MetricsRegistry()
+    counter = registry.counter('wol_actions', 'Ações', ('host',))
+
+    counter.inc(host='pc1')
+    counter.inc(2, host='pc1')
+    counter.inc(host='pc2')
+
+    assert registry.render().splitlines()[2:] == [
+        'wol_actions_total{host="pc1"} 3',
+        'wol_actions_total{host="pc2"} 1',
+        '# EOF',
+    ]
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('wol_duration_seconds', 'Duração', buckets=(1, 5))
+
+    histogram.observe(0.5)
+    histogram.observe(3)
+    histogram.observe(10)
+
+    assert registry.render().splitlines()[2:] == [
+        'wol_duration_seconds_bucket{le="1"} 1',
+        'wol_duration_seconds_bucket{le="5"} 2',
+        'wol_duration_seconds_bucket{le="+Inf"} 3',
+        'wol_duration_seconds_count 3',
+        'wol_duration_seconds_sum 13.5',
+        '# EOF',
+    ]
+
+
+def test_pending_observations_are_bounded_without_scrapes():
+    registry = MetricsRegistry()
+    counter = registry.counter('wol_ticks', 'Ciclos')
+    histogram = registry.histogram('wol_tick_seconds', 'Duração')
+
+    # Em uma única thread, cada MAX_PENDING-ésima observação agrega as pendentes
+    for _ in range(MAX_PENDING * 5 + 3):
+        counter.inc()
+        histogram.observe(0.01)
+
+    # pylint: disable=protected-access
+    assert len(counter._pending) == 3
+    assert len(histogram._pending) == 3
+
+
+def test_concurrent_observations_are_all_counted():
+    registry = MetricsRegistry()
+    counter = registry.counter('wol_ticks', 'Ciclos')
+    histogram = registry.histogram('wol_tick_seconds', 'Duração')
+
+    def record():
+        for _ in range(MAX_PENDING * 5):
+            counter.inc()
+            histogram.observe(0.01)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # render() agrega as pendentes com o lock da agregação
+    lines = registry.render().splitlines()
+    assert 'wol_ticks_total {}'.format(MAX_PENDING * 20) in lines
+    assert 'wol_tick_seconds_count {}'.format(MAX_PENDING * 20) in lines
@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import datetime
+import threading
+
+import pytest
+
+from control_socket import ControlError
+from monitor_service import MonitorService
+from outage_workflow import WAKING
+
+WAIT = 2  # segundos
+
+Sample = collections.namedtuple('Sample', ['percent', 'on_power', 'timestamp', 'runtime'])
+
+
+class FakeSampler:
+    """Fonte de energia sempre conectada, que conta as leituras."""
+
+    def __init__(self):
+        self.samples = 0
+
+    def sample(self):
+        self.samples += 1
+        return Sample(100, True, datetime.datetime.now(), None)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monitor = MonitorService()
+    monitor.sampler = FakeSampler()
+    yield monitor
+    monitor.detector.stop()
+    for executor in (
+        monitor.sampling_executor,
+        monitor.event_executor,
+        monitor.fleet_executor,
+        monitor.control_executor,
+    ):
+        executor.shutdown(wait=False)
+    monitor.status_segment.close()
+
+
+def run(service, scenario):
+    async def main():
+        service.loop = asyncio.get_running_loop()
+        service.samples = asyncio.Queue()
+        service.fleet_jobs = asyncio.Queue()
+        return await scenario()
+
+    return asyncio.run(main())
+
+
+def test_probe_and_reload_while_sampler_waits(service):
+    async def scenario():
+        # O ciclo de leitura aguarda um evento de energia por até 300 s (na rede elétrica)
+        waiting = asyncio.ensure_future(service.wait_for_power_event(300))
+        await asyncio.sleep(0.05)
+
+        probe = await asyncio.wait_for(service.control_probe({}), WAIT)
+        reload = await asyncio.wait_for(service.control_reload({}), WAIT)
+
+        assert not waiting.done()
+        service.detector.stop()
+        await asyncio.wait_for(waiting, WAIT)
+        return probe, reload
+
+    probe, reload = run(service, scenario)
+
+    assert probe['on_power'] is True
+    assert reload == {'power_source': 'local'}
+    assert service.sampler.samples == 1
+
+
+def test_automatic_action_waits_for_control_bulk(service):
+    service.workflow.transition(WAKING, ['pc1'])
+    sample = FakeSampler().sample()
+
+    async def scenario():
+        # Um lote pelo socket de controle começa antes da leitura
+        events = service.control_bulk('wake', {'selection': 'all'})
+        assert await events.__anext__() == {'total': 0}
+
+        service.decide(sample)
+        assert service.fleet_jobs.empty()
+
+        # O fim do lote reenvia a leitura adiada para a decisão
+        async for _ in events:
+            pass
+        queued = service.samples.get_nowait()
+        service.decide(queued)
+        return queued, service.fleet_jobs.get_nowait()
+
+    queued, job = run(service, scenario)
+
+    assert queued is sample
+    assert job[0] == 'poweron'
+    assert service.fleet_busy
+
+
+def test_control_bulk_refused_while_another_runs(service):
+    service.control_bulk_active = True
+
+    with pytest.raises(ControlError, match='executando'):
+        service.control_bulk('wake', {'selection': 'all'})
+
+
+def test_control_status_returns_a_snapshot(service):
+    async def scenario():
+        return await service.control_status({})
+
+    status = run(service, scenario)
+    status['power_status']['shutdown_executed'] = True
+
+    assert service.state.status['shutdown_executed'] is False
+
+
+def test_status_snapshot_waits_for_the_state_lock(service):
+    snapshots = []
+    with service.state.lock:
+        reader = threading.Thread(target=lambda: snapshots.append(service.state.status_snapshot()))
+        reader.start()
+        reader.join(0.1)
+        assert not snapshots
+        service.state.status['shutdown_time'] = 'agora'
+    reader.join(WAIT)
+
+    assert snapshots[0]['shutdown_time'] == 'agora'
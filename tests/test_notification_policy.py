@@ -0,0 +1,32 @@
+from notification_policy import DEFAULT_RULES, NotificationPolicy
+
+
+def test_default_rules_are_copied_per_policy():
+    first = NotificationPolicy(lambda *args: None)
+    first.rules['low_battery']['min_interval'] = 0
+    first.rules['power_restored'] = {'min_interval': 60}
+
+    second = NotificationPolicy(lambda *args: None)
+
+    assert DEFAULT_RULES['low_battery']['min_interval'] == 120
+    assert 'power_restored' not in DEFAULT_RULES
+    assert second.rules == DEFAULT_RULES
+
+
+def test_configured_rules_are_copied():
+    rules = {'low_battery': {'min_interval': 30}}
+    policy = NotificationPolicy(lambda *args: None, rules)
+
+    policy.rules['low_battery']['min_interval'] = 0
+
+    assert rules == {'low_battery': {'min_interval': 30}}
+
+
+def test_rule_limits_repeated_events():
+    delivered = []
+    policy = NotificationPolicy(lambda *args: delivered.append(args[0]))
+
+    policy.submit('low_battery', 'Bateria baixa', {'battery_percent': 40})
+    policy.submit('low_battery', 'Bateria baixa', {'battery_percent': 39})
+
+    assert delivered == ['low_battery']
@@ -0,0 +1,243 @@
+import http.server
+import json
+import socket
+import threading
+
+import pytest
+
+from notifier import (
+    CallbackSink,
+    Notifier,
+    QueuedSink,
+    UnixSocketSink,
+    WebhookSink,
+    build_notification,
+    create_sinks,
+    strip_credentials,
+)
+
+WAIT = 5  # segundos
+
+COMPUTER = {
+    'name': 'pc1',
+    'hostname': '192.168.0.10',
+    'mac': '00:11:22:33:44:55',
+    'username': 'admin',
+    'password': 'hunter2',
+    'ssh_key': '/root/.ssh/id_rsa',
+    'auto_power_off': True,
+}
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.client_address, self.headers, body))
+        status = self.server.status
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class DeliveryLog:
+    """Registra as entregas informadas pelo on_delivery de um canal."""
+
+    def __init__(self, expected=1):
+        self.expected = expected
+        self.results = []
+        self._done = threading.Event()
+
+    def __call__(self, channel, duration, delivered):
+        self.results.append((channel, delivered))
+        if len(self.results) >= self.expected:
+            self._done.set()
+
+    def wait(self):
+        assert self._done.wait(WAIT), 'entrega não concluída'
+        return self.results
+
+
+@pytest.fixture
+def webhook():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.status = 204
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = 'http://127.0.0.1:{}/hook?source=wol'.format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def listener(tmp_path):
+    """Socket Unix que recebe as notificações; retorna (caminho, linhas recebidas)."""
+    path = str(tmp_path / 'alerts.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    lines = []
+    connections = []
+
+    def accept():
+        connection, _ = server.accept()
+        connections.append(connection)
+        with connection.makefile('rb') as reader:
+            lines.extend(json.loads(line) for line in reader)
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield path, lines, thread
+    server.close()
+    for connection in connections:
+        connection.close()
+
+
+def started(sink, log):
+    sink.on_delivery = log
+    notifier = Notifier([sink])
+    notifier.start()
+    return notifier
+
+
+def test_queued_sink_is_abstract():
+    with pytest.raises(TypeError):
+        QueuedSink()  # pylint: disable=abstract-class-instantiated
+
+
+def test_strip_credentials():
+    context = {'computers': [COMPUTER], 'token': 'abc', 'on_power': False}
+
+    assert strip_credentials(context) == {
+        'computers': [
+            {
+                'name': 'pc1',
+                'hostname': '192.168.0.10',
+                'mac': '00:11:22:33:44:55',
+                'auto_power_off': True,
+            }
+        ],
+        'on_power': False,
+    }
+    assert COMPUTER['password'] == 'hunter2'
+
+
+def test_build_notification_strips_credentials():
+    notification = build_notification('shutdown_initiated', 'msg', {'computers': [COMPUTER]})
+
+    assert notification['event'] == 'shutdown_initiated'
+    assert notification['context']['computers'][0]['name'] == 'pc1'
+    assert 'password' not in json.dumps(notification)
+
+
+def test_webhook_delivers_json(webhook):
+    log = DeliveryLog()
+    notifier = started(WebhookSink(webhook.url, headers={'Authorization': 'Bearer t'}), log)
+
+    notifier.notify('shutdown_initiated', 'Desligando', {'computers': [COMPUTER]})
+
+    assert log.wait() == [('webhook', True)]
+    notifier.stop()
+    _, headers, body = webhook.requests[0]
+    assert headers['Authorization'] == 'Bearer t'
+    assert headers['Content-Type'] == 'application/json'
+    notification = json.loads(body)['notifications'][0]
+    assert notification['event'] == 'shutdown_initiated'
+    assert notification['context']['computers'][0]['hostname'] == '192.168.0.10'
+    for secret in (b'hunter2', b'admin', b'id_rsa'):
+        assert secret not in body
+
+
+def test_webhook_reuses_connection(webhook):
+    log = DeliveryLog(expected=2)
+    notifier = started(WebhookSink(webhook.url), log)
+
+    notifier.notify('power_disconnected', 'Sem energia')
+    notifier.notify('power_restored', 'Energia restaurada')
+
+    assert log.wait() == [('webhook', True), ('webhook', True)]
+    notifier.stop()
+    assert len({address for address, _, _ in webhook.requests}) == 1
+
+
+def test_webhook_batches_notifications(webhook):
+    log = DeliveryLog()
+    sink = WebhookSink(webhook.url, batch_size=3, batch_window=1)
+    sink.submit(build_notification('a', '1'))
+    sink.submit(build_notification('b', '2'))
+    sink.submit(build_notification('c', '3'))
+    notifier = started(sink, log)
+
+    assert log.wait() == [('webhook', True)]
+    notifier.stop()
+    events = [item['event'] for item in json.loads(webhook.requests[0][2])['notifications']]
+    assert events == ['a', 'b', 'c']
+
+
+def test_webhook_error_status_is_a_failed_delivery(webhook):
+    webhook.status = 500
+    log = DeliveryLog()
+    notifier = started(WebhookSink(webhook.url), log)
+
+    notifier.notify('low_battery', 'Bateria baixa')
+
+    assert log.wait() == [('webhook', False)]
+    notifier.stop()
+
+
+def test_unix_socket_delivers_json_lines(listener):
+    path, lines, reader = listener
+    log = DeliveryLog(expected=2)
+    notifier = started(UnixSocketSink(path), log)
+
+    notifier.notify('shutdown_initiated', 'Desligando', {'computers': [COMPUTER]})
+    notifier.notify('poweron_initiated', 'Ligando', {'computers': [COMPUTER]})
+
+    assert log.wait() == [('unix', True), ('unix', True)]
+    notifier.stop()
+    reader.join(WAIT)
+    assert [line['event'] for line in lines] == ['shutdown_initiated', 'poweron_initiated']
+    assert lines[0]['context']['computers'][0]['name'] == 'pc1'
+    assert 'password' not in json.dumps(lines)
+
+
+def test_unix_socket_without_listener_fails(tmp_path):
+    log = DeliveryLog()
+    notifier = started(UnixSocketSink(str(tmp_path / 'missing.sock')), log)
+
+    notifier.notify('low_battery', 'Bateria baixa')
+
+    assert log.wait() == [('unix', False)]
+    notifier.stop()
+
+
+def test_callback_sink_receives_stripped_context():
+    received = []
+    log = DeliveryLog()
+    notifier = started(CallbackSink(lambda *args: received.append(args), 'email'), log)
+
+    notifier.notify('shutdown_initiated', 'Desligando', {'computers': [COMPUTER]})
+
+    log.wait()
+    notifier.stop()
+    event_type, message, context = received[0]
+    assert (event_type, message) == ('shutdown_initiated', 'Desligando')
+    assert 'password' not in context['computers'][0]
+
+
+def test_create_sinks_skips_invalid_entries(tmp_path):
+    sinks = create_sinks([
+        {'type': 'webhook', 'url': 'http://127.0.0.1:1/hook'},
+        {'type': 'webhook', 'url': 'ftp://invalid'},
+        {'type': 'pager'},
+        {'type': 'unix', 'path': str(tmp_path / 'a.sock'), 'batch_size': 5},
+    ])
+
+    assert [sink.kind for sink in sinks] == ['webhook', 'unix']
+    assert sinks[1].batch_size == 5
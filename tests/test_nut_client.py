@@ -0,0 +1,177 @@
+import logging
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from nut_client import NutClient, NutError, parse_status_flags, unquote
+from power_events import PowerEventDetector
+
+
+class FakeUpsd(socketserver.ThreadingTCPServer):
+    """upsd falso: responde GET VAR, USERNAME e PASSWORD de um nobreak chamado "ups"."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeUpsdHandler)
+        self.variables = {
+            'ups.status': 'OL',
+            'battery.charge': '100',
+            'battery.runtime': '1800',
+        }
+        self.password = 'secret'
+        self.connections = 0
+        self.handlers = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def drop_connections(self):
+        """Derruba as conexões abertas, como um upsd reiniciado."""
+        for handler in self.handlers:
+            handler.connection.shutdown(socket.SHUT_RDWR)
+
+
+class FakeUpsdHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        self.server.handlers.append(self)
+        for raw in self.rfile:
+            command = raw.decode('utf-8').strip()
+            if command == 'LOGOUT':
+                return
+            self.wfile.write((self.respond(command) + '\n').encode('utf-8'))
+
+    def respond(self, command):
+        if command.startswith('USERNAME '):
+            return 'OK'
+        if command.startswith('PASSWORD '):
+            return 'OK' if command[9:] == self.server.password else 'ERR ACCESS-DENIED'
+
+        parts = command.split()
+        if parts[:2] != ['GET', 'VAR'] or len(parts) != 4:
+            return 'ERR UNKNOWN-COMMAND'
+        if parts[2] != 'ups':
+            return 'ERR UNKNOWN-UPS'
+        if parts[3] not in self.server.variables:
+            return 'ERR VAR-NOT-SUPPORTED'
+        return 'VAR ups {} "{}"'.format(parts[3], self.server.variables[parts[3]])
+
+
+@pytest.fixture
+def upsd():
+    server = FakeUpsd()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(upsd):
+    nut = NutClient('127.0.0.1', upsd.port, timeout=2)
+    yield nut
+    nut.close()
+
+
+def test_parse_status_flags():
+    assert parse_status_flags('OB DISCHRG LB') == {'OB', 'DISCHRG', 'LB'}
+    assert parse_status_flags('') == set()
+
+
+def test_unquote():
+    assert unquote('"Smart-UPS \\"1500\\""') == 'Smart-UPS "1500"'
+    assert unquote('100') == '100'
+
+
+def test_read_status(client):
+    assert client.read_status() == (100, True, 1800)
+
+
+def test_read_status_on_battery(upsd, client):
+    upsd.variables.update({'ups.status': 'OB DISCHRG', 'battery.charge': '42.5'})
+
+    assert client.read_status() == (42, False, 1800)
+    assert not client.read_on_power()
+
+
+def test_unsupported_variable_is_none(upsd, client):
+    del upsd.variables['battery.runtime']
+
+    assert client.read_status() == (100, True, None)
+
+
+def test_unknown_ups_raises(upsd):
+    client = NutClient('127.0.0.1', upsd.port, ups='other', timeout=2)
+
+    with pytest.raises(NutError, match='UNKNOWN-UPS'):
+        client.read_status()
+    client.close()
+
+
+def test_reuses_connection(upsd, client):
+    client.read_status()
+    client.read_status()
+
+    assert upsd.connections == 1
+
+
+def test_reconnects_after_connection_drop(upsd, client):
+    client.read_status()
+    upsd.drop_connections()
+
+    assert client.read_status() == (100, True, 1800)
+    assert upsd.connections == 2
+
+
+def test_login(upsd):
+    client = NutClient('127.0.0.1', upsd.port, username='monitor', password='secret', timeout=2)
+
+    assert client.read_on_power()
+    client.close()
+
+
+def test_bad_password_raises(upsd):
+    client = NutClient('127.0.0.1', upsd.port, username='monitor', password='wrong', timeout=2)
+
+    with pytest.raises(NutError, match='ACCESS-DENIED'):
+        client.connect()
+    with pytest.raises(NutError, match='ACCESS-DENIED'):
+        client.read_status()
+    client.close()
+
+
+def test_unreachable_upsd_raises(upsd):
+    port = upsd.port
+    upsd.shutdown()
+    upsd.server_close()
+    client = NutClient('127.0.0.1', port, timeout=1)
+
+    with pytest.raises(NutError):
+        client.read_status()
+
+
+def test_detector_logs_unreachable_upsd_once(client, caplog):
+    caplog.set_level(logging.INFO, logger='PowerMonitor.events')
+    detector = PowerEventDetector(probe=client.read_on_power, poll_interval=0.01)
+    detector.start()
+
+    # Várias verificações falham enquanto o upsd está parado
+    detector.probe = unreachable
+    threading.Event().wait(0.2)
+    detector.probe = client.read_on_power
+    threading.Event().wait(0.1)
+    detector.stop()
+
+    messages = [(record.levelno, record.getMessage()) for record in caplog.records]
+    assert len([level for level, _ in messages if level == logging.ERROR]) == 1
+    assert (logging.INFO, 'Fontes de energia acessíveis novamente.') in messages
+
+
+def unreachable():
+    raise NutError('Falha na comunicação com o upsd: Connection refused')
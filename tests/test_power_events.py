@@ -0,0 +1,192 @@
+import socket
+
+import pytest
+
+import power_events
+from power_events import PowerEventDetector, parse_uevent, read_supply_states
+
+WAIT = 2  # segundos
+
+
+def write_supply(root, name, online=None, status=None):
+    """Cria ou altera uma fonte de energia na árvore sysfs falsa."""
+    supply = root / name
+    supply.mkdir(exist_ok=True)
+    if online is not None:
+        (supply / 'online').write_text(online + '\n', encoding='utf-8')
+    if status is not None:
+        (supply / 'status').write_text(status + '\n', encoding='utf-8')
+
+
+def uevent(action, **fields):
+    """Monta uma mensagem de uevent do kernel."""
+    parts = ['{}@/devices/power_supply/{}'.format(action, fields.get('POWER_SUPPLY_NAME', ''))]
+    parts.append('ACTION={}'.format(action))
+    parts.extend('{}={}'.format(key, value) for key, value in fields.items())
+    return '\0'.join(parts).encode('utf-8')
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    write_supply(tmp_path, 'AC', online='1')
+    write_supply(tmp_path, 'BAT0', status='Charging')
+    return tmp_path
+
+
+@pytest.fixture
+def detector_factory():
+    detectors = []
+
+    def factory(**kwargs):
+        detector = PowerEventDetector(**kwargs)
+        detectors.append(detector)
+        return detector
+
+    yield factory
+    for detector in detectors:
+        detector.stop()
+
+
+def test_parse_uevent():
+    event = parse_uevent(uevent('change', SUBSYSTEM='power_supply', POWER_SUPPLY_ONLINE='0'))
+
+    assert event['ACTION'] == 'change'
+    assert event['SUBSYSTEM'] == 'power_supply'
+    assert event['POWER_SUPPLY_ONLINE'] == '0'
+
+
+def test_parse_uevent_ignores_udev_messages():
+    assert parse_uevent(b'libudev\0\xfe\xed\xca\xfe') is None
+
+
+def test_read_supply_states(sysfs):
+    assert read_supply_states(str(sysfs)) == {
+        'AC': ('1', None),
+        'BAT0': (None, 'Charging'),
+    }
+
+
+def test_read_supply_states_missing_tree(tmp_path):
+    assert read_supply_states(str(tmp_path / 'missing')) == {}
+
+
+def test_fake_tree_uses_polling(sysfs, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), poll_interval=0.01)
+    detector.start()
+
+    assert detector.mode == 'polling'
+    assert not detector.wait(0.1)
+
+
+def test_polling_detects_change(sysfs, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), poll_interval=0.01)
+    detector.start()
+
+    write_supply(sysfs, 'AC', online='0')
+
+    assert detector.wait(WAIT)
+    assert not detector.consume_hotplug()
+
+
+def test_polling_detects_hotplug(sysfs, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), poll_interval=0.01)
+    detector.start()
+
+    write_supply(sysfs, 'BAT1', status='Discharging')
+
+    assert detector.wait(WAIT)
+    assert detector.consume_hotplug()
+    assert not detector.consume_hotplug()
+
+
+def test_polling_with_probe(detector_factory):
+    states = [True]
+    detector = detector_factory(probe=lambda: states[0], poll_interval=0.01)
+    detector.start()
+
+    states[0] = False
+
+    assert detector.wait(WAIT)
+
+
+def test_stop_releases_waiters(sysfs, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), poll_interval=0.01)
+    detector.start()
+    detector.stop()
+
+    assert not detector.wait(WAIT)
+
+
+@pytest.fixture
+def kernel(monkeypatch):
+    """Substitui o socket netlink por um par de sockets; retorna a ponta do "kernel"."""
+    kernel_end, detector_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    class FakeNetlinkSocket:
+        def __init__(self, *args):
+            self.end = detector_end
+
+        def bind(self, address):
+            pass
+
+        def recv(self, size):
+            return self.end.recv(size)
+
+        def close(self):
+            self.end.shutdown(socket.SHUT_RDWR)
+            self.end.close()
+
+    monkeypatch.setattr(power_events.socket, 'AF_NETLINK', 16, raising=False)
+    monkeypatch.setattr(power_events.socket, 'socket', FakeNetlinkSocket)
+    yield kernel_end
+    kernel_end.close()
+
+
+def test_netlink_detects_change(sysfs, kernel, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), use_netlink=True)
+    detector.start()
+    assert detector.mode == 'netlink'
+
+    kernel.send(
+        uevent(
+            'change',
+            SUBSYSTEM='power_supply',
+            POWER_SUPPLY_NAME='AC',
+            POWER_SUPPLY_ONLINE='0',
+        )
+    )
+
+    assert detector.wait(WAIT)
+    assert not detector.consume_hotplug()
+
+
+def test_netlink_ignores_other_subsystems(sysfs, kernel, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), use_netlink=True)
+    detector.start()
+
+    kernel.send(uevent('change', SUBSYSTEM='usb', POWER_SUPPLY_NAME='AC'))
+
+    assert not detector.wait(0.2)
+
+
+def test_netlink_detects_hotplug(sysfs, kernel, detector_factory):
+    detector = detector_factory(sysfs_root=str(sysfs), use_netlink=True)
+    detector.start()
+
+    kernel.send(uevent('add', SUBSYSTEM='power_supply', POWER_SUPPLY_NAME='BAT1'))
+
+    assert detector.wait(WAIT)
+    assert detector.consume_hotplug()
+
+
+def test_netlink_unavailable_falls_back_to_polling(sysfs, monkeypatch, detector_factory):
+    def unavailable(*args):
+        raise PermissionError('netlink bloqueado')
+
+    monkeypatch.setattr(power_events.socket, 'socket', unavailable)
+    detector = detector_factory(sysfs_root=str(sysfs), poll_interval=0.01, use_netlink=True)
+    detector.start()
+
+    assert detector.mode == 'polling'
+    write_supply(sysfs, 'AC', online='0')
+    assert detector.wait(WAIT)
@@ -0,0 +1,36 @@
+import json
+import os
+
+from service_settings import default_service_config, read_service_config
+
+
+def test_read_missing_config_does_not_create_it(tmp_path):
+    path = str(tmp_path / 'service_config.json')
+
+    assert read_service_config(path) == {}
+    assert not os.path.exists(path)
+
+
+def test_read_invalid_config(tmp_path):
+    path = tmp_path / 'service_config.json'
+    path.write_text('{invalid', encoding='utf-8')
+
+    assert read_service_config(str(path)) == {}
+
+
+def test_read_config(tmp_path):
+    path = tmp_path / 'service_config.json'
+    path.write_text(json.dumps({'control_socket': '/run/wol.sock'}), encoding='utf-8')
+
+    assert read_service_config(str(path)) == {'control_socket': '/run/wol.sock'}
+
+
+def test_default_config_is_a_fresh_copy():
+    first = default_service_config()
+    first['nut']['port'] = 1
+    first['notification_policy']['low_battery']['min_interval'] = 0
+
+    second = default_service_config()
+
+    assert second['nut']['port'] != 1
+    assert second['notification_policy']['low_battery']['min_interval'] != 0
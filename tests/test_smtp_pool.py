@@ -0,0 +1,231 @@
+import base64
+import smtplib
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+from smtp_pool import SMTPConnectionManager
+
+MESSAGE = 'Subject: teste\r\n\r\ncorpo\r\n'
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Servidor SMTP falso: aceita AUTH PLAIN e guarda as mensagens recebidas."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password='secret'):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.password = password
+        self.messages = []
+        self.connections = 0
+        self.noops = 0
+        self.handlers = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def drop_connections(self):
+        """Derruba as sessões abertas, como um servidor que encerra conexões ociosas."""
+        for handler in self.handlers:
+            try:
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        self.server.connections += 1
+        self.server.handlers.append(self)
+        self.reply('220 fake ESMTP')
+        for raw in self.rfile:
+            verb, _, argument = raw.decode('ascii').strip().partition(' ')
+            verb = verb.upper()
+            if verb == 'EHLO':
+                self.reply('250-fake')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                password = base64.b64decode(argument.split()[1]).split(b'\0')[2]
+                if password.decode('ascii') == self.server.password:
+                    self.reply('235 ok')
+                else:
+                    self.reply('535 authentication failed')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                lines = []
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                    lines.append(line)
+                self.server.messages.append(b''.join(lines))
+                self.reply('250 queued')
+            elif verb == 'NOOP':
+                self.server.noops += 1
+                self.reply('250 ok')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+def start_server(password='secret'):
+    server = FakeSMTPServer(password)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def relay_for(server, password='secret'):
+    return {
+        'host': '127.0.0.1',
+        'port': server.port,
+        'username': 'monitor',
+        'password': password,
+        'starttls': False,
+    }
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def factory(password='secret'):
+        server = start_server(password)
+        started.append(server)
+        return server
+
+    yield factory
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def managers():
+    created = []
+
+    def factory(relays, **kwargs):
+        manager = SMTPConnectionManager(relays, timeout=2, **kwargs)
+        created.append(manager)
+        return manager
+
+    yield factory
+    for manager in created:
+        manager.close()
+
+
+def closed_port():
+    """Porta local sem servidor escutando."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_reuses_authenticated_session(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)])
+
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert len(server.messages) == 2
+    assert server.connections == 1
+
+
+def test_send_messages_uses_one_session(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)])
+
+    manager.send_messages([('a@example.com', ['b@example.com'], MESSAGE)] * 3)
+
+    assert len(server.messages) == 3
+    assert server.connections == 1
+
+
+def test_reconnects_after_server_drops_session(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)])
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    server.drop_connections()
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert len(server.messages) == 2
+    assert server.connections == 2
+
+
+def test_checks_idle_session_with_noop(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)], keepalive_interval=0)
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    server.drop_connections()
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert len(server.messages) == 2
+    assert server.connections == 2
+
+
+def test_expired_session_is_replaced(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)], idle_timeout=0)
+
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+    time.sleep(0.01)
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert server.connections == 2
+
+
+def test_keepalive_closes_idle_session(servers, managers):
+    server = servers()
+    manager = managers([relay_for(server)], keepalive_interval=0.05, idle_timeout=0.2)
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    deadline = time.monotonic() + 2
+    while manager.relay is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert manager.relay is None
+    assert server.noops >= 1
+
+
+def test_fails_over_to_reachable_relay(servers, managers):
+    server = servers()
+    unreachable = dict(relay_for(server), port=closed_port())
+    manager = managers([unreachable, relay_for(server)])
+
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert manager.relay['port'] == server.port
+    assert len(server.messages) == 1
+
+
+def test_fails_over_when_login_is_rejected(servers, managers):
+    primary = servers(password='other')
+    fallback = servers()
+    manager = managers([relay_for(primary), relay_for(fallback)])
+
+    manager.send('a@example.com', ['b@example.com'], MESSAGE)
+
+    assert manager.relay['port'] == fallback.port
+    assert not primary.messages
+    assert len(fallback.messages) == 1
+
+
+def test_raises_when_every_relay_fails(servers, managers):
+    server = servers(password='other')
+    manager = managers([relay_for(server)])
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        manager.send('a@example.com', ['b@example.com'], MESSAGE)
+    assert manager.relay is None
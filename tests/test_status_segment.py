@@ -0,0 +1,51 @@
+import collections
+import datetime
+import os
+
+from status_segment import StatusSegment, read_status
+
+Sample = collections.namedtuple('Sample', ['timestamp', 'percent', 'on_power', 'runtime'])
+
+
+def test_publish_and_read(tmp_path):
+    path = str(tmp_path / 'status')
+    with StatusSegment(path, writable=True) as segment:
+        segment.publish(Sample(datetime.datetime.now(), 80, False, 600), phase='on_battery')
+        segment.record_host('pc1', 'shutdown', True)
+
+        snapshot = read_status(path)
+
+    assert snapshot.pid == os.getpid()
+    assert (snapshot.percent, snapshot.on_power, snapshot.runtime) == (80, False, 600)
+    assert snapshot.phase == 'on_battery'
+    assert snapshot.hosts[0].name == 'pc1'
+    assert snapshot.hosts[0].shutdowns == 1
+
+
+def test_close_marks_service_stopped(tmp_path):
+    path = str(tmp_path / 'status')
+    segment = StatusSegment(path, writable=True)
+    segment.publish()
+    assert read_status(path) is not None
+
+    segment.close()
+
+    assert read_status(path) is None
+
+
+def test_restart_does_not_truncate_mapped_file(tmp_path):
+    path = str(tmp_path / 'status')
+    previous = StatusSegment(path, writable=True)
+    previous.publish(phase='shut_down')
+    reader = StatusSegment(path)
+
+    current = StatusSegment(path, writable=True)
+    current.publish()
+
+    # O leitor antigo ainda vê o registro anterior, íntegro
+    assert reader.read().phase == 'shut_down'
+    assert read_status(path).phase == 'idle'
+    assert os.listdir(str(tmp_path)) == ['status']
+    reader.close()
+    previous.close()
+    current.close()
@@ -0,0 +1,112 @@
+"""
+Mede o tempo de inicialização dos pontos de entrada de linha de comando.
+
+Executa cada cenário várias vezes em um processo novo e exibe o menor tempo
+e a mediana, além dos módulos pesados (SSH, HTTP, SMTP, templates) que
+foram carregados apenas por importar main.py.
+
+Uso:
+    python tools/bench_startup.py [--runs 20] [--mac 00:00:00:00:00:00]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Constantes
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RUNS = 20
+# O MAC nulo não pertence a nenhum computador: o pacote é enviado, mas ninguém liga
+DEFAULT_MAC = "00:00:00:00:00:00"
+HEAVY_MODULES = (
+    "paramiko",
+    "requests",
+    "jinja2",
+    "smtplib",
+    "ssl",
+    "sqlite3",
+    "psutil",
+    "concurrent.futures",
+    "asyncio",
+)
+
+
+def time_command(command, runs):
+    """
+    Executa um comando várias vezes e mede a duração de cada execução.
+
+    Args:
+        command (list): Comando e argumentos.
+        runs (int): Número de execuções.
+
+    Returns:
+        list: Durações em milissegundos.
+    """
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            command,
+            cwd=REPO_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def loaded_heavy_modules():
+    """
+    Lista os módulos pesados carregados ao importar main.py.
+
+    Returns:
+        list: Nomes dos módulos carregados.
+    """
+    code = (
+        "import sys, main; "
+        "print(' '.join(m for m in {!r} if m in sys.modules))".format(HEAVY_MODULES)
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip())
+    return output.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da inicialização da linha de comando.')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Execuções por cenário')
+    parser.add_argument('--mac', default=DEFAULT_MAC, help='MAC usado no cenário wol')
+    args = parser.parse_args()
+
+    scenarios = [
+        ("python (interpretador)", [sys.executable, "-c", "pass"]),
+        ("import main", [sys.executable, "-c", "import main"]),
+        ("main.py --help", [sys.executable, "main.py", "--help"]),
+        ("main.py wol", [sys.executable, "main.py", "wol", args.mac]),
+    ]
+
+    print("{:<24} {:>10} {:>10}".format("Cenário", "mín (ms)", "mediana"))
+    for name, command in scenarios:
+        durations = time_command(command, args.runs)
+        print(
+            "{:<24} {:>10.1f} {:>10.1f}".format(
+                name, min(durations), statistics.median(durations)
+            )
+        )
+
+    heavy = ", ".join(loaded_heavy_modules()) or "nenhum"
+    print("\nMódulos pesados carregados por 'import main': {}".format(heavy))
+
+
+if __name__ == "__main__":
+    main()